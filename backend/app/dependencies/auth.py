@@ -1,7 +1,90 @@
-from fastapi import HTTPException, Request
-from typing import Callable
+from fastapi import Depends, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from typing import Any, Callable, Dict, Optional
+import hashlib
+import logging
+import os
+import time
+import jwt
 from ..schemas.user import User, UserRole
 from ..services.supabase import get_supabase_client
+from ..services.jwt_verifier import get_jwt_verifier, SigningKeyUnavailable
+from ..utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# "local" verifies the JWT signature in-process, "remote" asks the Supabase auth server
+AUTH_VERIFICATION_MODE = os.getenv("AUTH_VERIFICATION_MODE", "local")
+USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", "300"))  # seconds
+USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+
+# Verified users keyed by token hash, so raw tokens are never kept as keys
+user_cache = TTLCache(max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+def _token_ttl(claims: Dict[str, Any]) -> float:
+    """Cache a user no longer than the token itself is valid"""
+    expires_in = claims.get("exp", 0) - time.time()
+    return min(USER_CACHE_TTL, expires_in)
+
+
+def _role(app_metadata: Optional[Dict[str, Any]]) -> UserRole:
+    """Role from app_metadata, which only the service role can write.
+
+    user_metadata is editable by the user themselves (auth.updateUser), so
+    it must never grant privileges.
+    """
+    role = (app_metadata or {}).get("role")
+    return UserRole.ADMIN if role == UserRole.ADMIN.value else UserRole.USER
+
+
+async def _verify_locally(token: str) -> User:
+    claims = await get_jwt_verifier().decode(token)
+    metadata = claims.get("user_metadata") or {}
+    user = User(
+        id=claims["sub"],
+        email=claims.get("email", ""),
+        access_token=token,
+        role=_role(claims.get("app_metadata")),
+        metadata=metadata
+    )
+    user_cache.set(hashlib.sha256(token.encode()).hexdigest(), user, ttl=_token_ttl(claims))
+    return user
+
+
+async def _verify_remotely(token: str) -> User:
+    supabase = get_supabase_client()
+    response = await run_in_threadpool(supabase.auth.get_user, token)
+    if not response.user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    user = User(
+        id=response.user.id,
+        email=response.user.email,
+        access_token=token,
+        role=_role(response.user.app_metadata),
+        metadata=response.user.user_metadata
+    )
+    # The auth server already validated the token, we only need its expiry
+    claims = jwt.decode(token, options={"verify_signature": False})
+    user_cache.set(hashlib.sha256(token.encode()).hexdigest(), user, ttl=_token_ttl(claims))
+    return user
+
+
+async def resolve_user(token: str) -> User:
+    """Return the user a bearer token belongs to, raising if it is not valid"""
+    cached = user_cache.get(hashlib.sha256(token.encode()).hexdigest())
+    if cached:
+        return cached
+
+    if AUTH_VERIFICATION_MODE == "local":
+        try:
+            return await _verify_locally(token)
+        except SigningKeyUnavailable as e:
+            logger.warning(f"Local JWT verification unavailable, falling back to auth server: {str(e)}")
+
+    return await _verify_remotely(token)
+
 
 async def get_current_user(request: Request) -> User:
     """Get the current user from the session"""
@@ -13,30 +96,17 @@ async def get_current_user(request: Request) -> User:
 
         # Extract the token
         token = auth_header.split(" ")[1]
-        
-        # Get user from Supabase
-        supabase = get_supabase_client()
-        response = supabase.auth.get_user(token)
-        if not response.user:
-            raise HTTPException(status_code=401, detail="Not authenticated")
 
-        # Return user with access token
-        return User(
-            id=response.user.id,
-            email=response.user.email,
-            access_token=token,
-            role=response.user.user_metadata.get("role", UserRole.USER),
-            metadata=response.user.user_metadata
-        )
+        return await resolve_user(token)
     except Exception as e:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
 def require_role(required_role: UserRole) -> Callable:
-    async def role_checker(user: User = get_current_user) -> User:
+    async def role_checker(user: User = Depends(get_current_user)) -> User:
         if user.role != required_role:
             raise HTTPException(
                 status_code=403,
                 detail=f"Operation requires {required_role} role"
             )
         return user
-    return role_checker 
\ No newline at end of file
+    return role_checker
@@ -1,5 +1,6 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 import logging
 from datetime import datetime
 from dotenv import load_dotenv
@@ -8,6 +9,11 @@ load_dotenv()
 
 
 from .routers import content, interactions, topics, saved, recommendations, auth, user, badges, tts
+from .services.database import get_pool, close_database
+from .services.interactions import get_interaction_ingestor
+from .services.rate_limit_storage import close_rate_limit_storage
+from .services.http import get_http_client, close_http_client
+from .services.topics import get_topics_catalogue
 
 
 # Import middleware
@@ -17,8 +23,26 @@ from .utils.rate_limiter import rate_limit_middleware
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the shared database and outbound HTTP pools before serving requests
+    get_pool()
+    get_http_client()
+    get_interaction_ingestor().start()
+    try:
+        await get_topics_catalogue().reload()
+    except Exception as e:
+        # Not fatal: the first request that needs topics loads them
+        logger.error(f"Error loading topics catalogue at startup: {str(e)}")
+    yield
+    # Flush buffered interactions while the pool is still open
+    await get_interaction_ingestor().stop()
+    await close_rate_limit_storage()
+    await close_http_client()
+    await close_database()
+
 # Initialize FastAPI app
-app = FastAPI(title="MicroLearn API", version="1.0.0")
+app = FastAPI(title="MicroLearn API", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
 from ..dependencies.auth import get_current_user
 from ..services.supabase import get_supabase_client, get_supabase_admin_client
+from ..services.database import get_db_admin_client, get_db_user_client
+from starlette.concurrency import run_in_threadpool
 from ..schemas.user import UserCreate, UserProfile, UserResponse, UserSignIn
 from typing import Optional
 import logging
@@ -25,10 +27,11 @@ async def signup(user_data: UserCreate):
         
         supabase = get_supabase_client()
         supabase_admin = get_supabase_admin_client()
+        db_admin = get_db_admin_client()
         
         # Check if username is already taken before creating auth user
         try:
-            existing_username = supabase_admin.table("profiles").select("user_id").eq("full_name", username).execute()
+            existing_username = await db_admin.table("profiles").select("user_id").eq("full_name", username).execute()
             if existing_username.data and len(existing_username.data) > 0:
                 raise HTTPException(status_code=409, detail="This username is already taken. Please choose a different one.")
         except HTTPException as he:
@@ -39,7 +42,7 @@ async def signup(user_data: UserCreate):
         
         # Create auth user
         try:
-            auth_response = supabase.auth.sign_up({
+            auth_response = await run_in_threadpool(supabase.auth.sign_up, {
                 "email": user_data.email,
                 "password": user_data.password
             })
@@ -75,7 +78,7 @@ async def signup(user_data: UserCreate):
             logger.info(f"Attempting to create profile with data: {profile_data}")
             
             # Use admin client for profile creation
-            profile_response = supabase_admin.table("profiles").insert(profile_data).execute()
+            profile_response = await db_admin.table("profiles").insert(profile_data).execute()
             
             logger.info(f"Profile creation response: {profile_response}")
             
@@ -84,7 +87,7 @@ async def signup(user_data: UserCreate):
                 logger.error(f"Failed to create profile for user {user.id} - No data returned")
                 logger.error(f"Profile response: {profile_response}")
                 try:
-                    supabase_admin.auth.admin.delete_user(user.id)
+                    await run_in_threadpool(supabase_admin.auth.admin.delete_user, user.id)
                 except Exception as rollback_error:
                     logger.error(f"Failed to rollback auth user: {str(rollback_error)}")
                 raise HTTPException(status_code=400, detail="Failed to create user profile")
@@ -106,7 +109,7 @@ async def signup(user_data: UserCreate):
             if "unique" in error_str or "duplicate" in error_str or "already exists" in error_str:
                 logger.warning(f"Username '{username}' already taken during profile creation for user {user.id}")
                 try:
-                    supabase_admin.auth.admin.delete_user(user.id)
+                    await run_in_threadpool(supabase_admin.auth.admin.delete_user, user.id)
                 except Exception as rollback_error:
                     logger.error(f"Failed to rollback auth user: {str(rollback_error)}")
                 raise HTTPException(status_code=409, detail="This username is already taken. Please choose a different one.")
@@ -114,7 +117,7 @@ async def signup(user_data: UserCreate):
             # If profile creation fails, attempt to rollback auth user
             logger.error(f"Error creating profile, attempting to rollback auth user: {str(e)}")
             try:
-                supabase_admin.auth.admin.delete_user(user.id)
+                await run_in_threadpool(supabase_admin.auth.admin.delete_user, user.id)
             except Exception as rollback_error:
                 logger.error(f"Failed to rollback auth user: {str(rollback_error)}")
             raise HTTPException(status_code=400, detail=f"Failed to create user profile: {str(e)}")
@@ -131,7 +134,7 @@ async def signin(user_data: UserSignIn):
         supabase = get_supabase_client()
         
         try:
-            auth_response = supabase.auth.sign_in_with_password({
+            auth_response = await run_in_threadpool(supabase.auth.sign_in_with_password, {
                 "email": user_data.email,
                 "password": user_data.password
             })
@@ -153,10 +156,11 @@ async def signin(user_data: UserSignIn):
             raise HTTPException(status_code=401, detail="Failed to sign in")
             
         # Get user profile, create if doesn't exist
+        db = get_db_user_client(auth_response.session.access_token)
         try:
             # Try to get existing profile
             try:
-                profile_response = supabase.table("profiles").select("*").eq("user_id", auth_response.user.id).single().execute()
+                profile_response = await db.table("profiles").select("*").eq("user_id", auth_response.user.id).single().execute()
                 if profile_response.data:
                     return {
                         "id": auth_response.user.id,
@@ -167,7 +171,7 @@ async def signin(user_data: UserSignIn):
                 logger.info(f"Profile not found for user {auth_response.user.id}, creating new profile")
             
             # Profile doesn't exist, create it using admin client
-            supabase_admin = get_supabase_admin_client()
+            db_admin = get_db_admin_client()
             profile_data = {
                 "user_id": auth_response.user.id,
                 "email": auth_response.user.email,
@@ -178,7 +182,7 @@ async def signin(user_data: UserSignIn):
                 "last_active": "now()"
             }
             
-            create_response = supabase_admin.table("profiles").insert(profile_data).execute()
+            create_response = await db_admin.table("profiles").insert(profile_data).execute()
             
             if not create_response.data or len(create_response.data) == 0:
                 logger.error(f"Failed to create profile for existing user {auth_response.user.id}")
@@ -208,10 +212,9 @@ async def signin(user_data: UserSignIn):
 async def get_profile(user = Depends(get_current_user)):
     try:
         logger.info(f"Getting profile for user: {user.id}")
-        supabase = get_supabase_client()
+        supabase = get_db_user_client(user.access_token)
 
-        # Supabase client is synchronous; remove await
-        profile_response = supabase.table("profiles").select("*").eq("user_id", user.id).single().execute()
+        profile_response = await supabase.table("profiles").select("*").eq("user_id", user.id).single().execute()
 
         if not profile_response.data:
             logger.error(f"Profile not found for user: {user.id}")
@@ -229,9 +232,9 @@ async def get_profile(user = Depends(get_current_user)):
 @router.put("/profile/onboarding")
 async def complete_onboarding(user = Depends(get_current_user)):
     try:
-        supabase = get_supabase_client()
+        supabase = get_db_user_client(user.access_token)
 
-        response = supabase.table("profiles").update({
+        response = await supabase.table("profiles").update({
             "onboarding_completed": True
         }).eq("user_id", user.id).execute()
 
@@ -248,11 +251,8 @@ async def signout(user = Depends(get_current_user)):
     try:
         supabase = get_supabase_client()
         
-        # Ensure the client is authenticated with the user's token
-        supabase.postgrest.auth(user.access_token)
-        
-        # Sign out from Supabase (non-async)
-        supabase.auth.sign_out()
+        # Sign out from Supabase (the auth client is synchronous)
+        await run_in_threadpool(supabase.auth.sign_out)
         
         return {"message": "Signed out successfully"}
     except Exception as e:
@@ -1,11 +1,11 @@
 from fastapi import APIRouter, Depends
 from ..schemas.user import User
 from ..dependencies.auth import get_current_user
-from ..services.badges import check_and_award_badges
+from ..services.badges import evaluate_badges
 
 router = APIRouter(prefix="/api/check_badges", tags=["badges"])
 
 @router.post("")
 async def check_badges(user: User = Depends(get_current_user)):
-    new_badge = check_and_award_badges(user.id)
-    return {"new_badge": new_badge} 
\ No newline at end of file
+    new_badges = await evaluate_badges(user.id)
+    return {"new_badge": new_badges[0] if new_badges else None, "new_badges": new_badges}
\ No newline at end of file
@@ -1,82 +1,109 @@
 from fastapi import APIRouter, Depends, HTTPException
-from ..schemas.content import UserInteractionRequest
+from typing import List
+from ..schemas.content import UserInteractionRequest, InteractionBatchResult
 from ..schemas.user import User
 from ..dependencies.auth import get_current_user
-from ..services.supabase import get_supabase_client
-from ..services.badges import check_and_award_badges
+from ..services.counters import read_interaction_counts
+from ..services.interactions import (
+    CAPPED, RECORDED, get_interaction_ingestor, interaction_event, is_rejected,
+    write_interactions, write_interactions_isolating, award_interaction_badges
+)
+import logging
 
 router = APIRouter(prefix="/api/interactions", tags=["interactions"])
+logger = logging.getLogger(__name__)
 
-@router.post("")
+# Largest batch accepted by POST /api/interactions/batch
+MAX_BATCH_SIZE = 100
+
+@router.post("", status_code=202)
 async def record_interaction(
     interaction: UserInteractionRequest,
     user: User = Depends(get_current_user)
 ):
-    """Record user interaction with content"""
+    """Record user interaction with content.
+
+    The event is buffered and written in a batch shortly after; duplicates
+    beyond each type's cap are dropped at write time.
+    """
     try:
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.info(f"🎯 Recording interaction for user {user.id}: {interaction.interaction_type} on content {interaction.content_id} with value {interaction.interaction_value}")
-        
-        supabase = get_supabase_client()
-        
-        # Check if this exact interaction already exists (to prevent duplicates)
-        existing_response = supabase.table("user_interactions").select("id").eq(
-            "user_id", user.id
-        ).eq(
-            "content_id", interaction.content_id
-        ).eq(
-            "interaction_type", interaction.interaction_type
-        ).execute()
+        logger.info(f"🎯 Accepted interaction for user {user.id}: {interaction.interaction_type} on content {interaction.content_id} with value {interaction.interaction_value}")
         
-        # Handle different interaction types with appropriate duplicate prevention
-        if interaction.interaction_type in ["view", "skip", "partial", "interested", "engaged"]:
-            # For engagement interactions, allow multiple records but limit to prevent spam
-            if existing_response.data and len(existing_response.data) >= 3:
-                return {"message": f"{interaction.interaction_type.title()} interaction already recorded (limit reached)", "duplicate": True}
-        else:
-            # For other interactions (like, save, etc.), prevent exact duplicates
-            if existing_response.data:
+        event = interaction_event(user.id, str(interaction.content_id), interaction.interaction_type, interaction.interaction_value)
+        if not get_interaction_ingestor().submit(event):
+            # Buffer is full: apply backpressure by writing this one inline
+            logger.warning("Interaction buffer full, writing interaction synchronously")
+            status = (await write_interactions([event]))[0]
+            await award_interaction_badges([event], [status == RECORDED])
+            if status == CAPPED:
                 return {"message": "Interaction already recorded", "duplicate": True}
         
-        response = supabase.table("user_interactions").insert({
-            "user_id": user.id,
-            "content_id": interaction.content_id,
-            "interaction_type": interaction.interaction_type,
-            "interaction_value": interaction.interaction_value
-        }).execute()
-        
-        if response.data:
-            logger.info(f"✅ Successfully recorded interaction: {response.data[0]}")
-        else:
-            logger.error(f"❌ Failed to record interaction - no data returned")
-        
-        return {"data": response.data[0], "message": "Interaction recorded successfully"}
-        # Check and award badges
-        new_badge = check_and_award_badges(user.id)
+        return {"message": "Interaction accepted", "queued": True}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/batch")
+async def record_interactions_batch(
+    interactions: List[UserInteractionRequest],
+    user: User = Depends(get_current_user)
+):
+    """Record several interactions in one request and one insert.
+
+    Each item is checked against the per-type duplicate caps and the
+    response reports, in request order, whether it was recorded. If the
+    database rejects some items (e.g. an unknown content_id), the rest are
+    still written and those items are reported as rejected.
+    """
+    if len(interactions) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} interactions per batch")
+
+    try:
+        events = [
+            interaction_event(user.id, str(item.content_id), item.interaction_type, item.interaction_value)
+            for item in interactions
+        ]
+        try:
+            statuses = await write_interactions(events)
+        except Exception as e:
+            if not is_rejected(e):
+                raise
+            logger.warning(f"Database rejected an interaction batch from user {user.id}, isolating bad events: {str(e)}")
+            statuses = await write_interactions_isolating(events)
+        recorded = [status == RECORDED for status in statuses]
+        await award_interaction_badges(events, recorded)
+        results = [
+            InteractionBatchResult(
+                index=index,
+                content_id=str(item.content_id),
+                interaction_type=item.interaction_type,
+                recorded=status == RECORDED,
+                duplicate=status == CAPPED,
+                rejected=status is None
+            )
+            for index, (item, status) in enumerate(zip(interactions, statuses))
+        ]
+        logger.info(f"🎯 Recorded {sum(recorded)}/{len(events)} batched interactions for user {user.id}")
         
-        return {"data": response.data[0], "message": "Interaction recorded successfully", "new_badge": new_badge}
+        return {"data": results, "recorded_count": sum(recorded)}
     except Exception as e:
+        logger.error(f"Error recording interaction batch: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/stats")
 async def get_user_stats(user: User = Depends(get_current_user)):
     """Get user interaction statistics"""
     try:
-        supabase = get_supabase_client()
-        # Get user interactions
-        interactions_response = supabase.table("user_interactions").select("interaction_type").eq("user_id", user.id).execute()
-        
-        interactions = interactions_response.data
+        # Per-type counters are maintained on insert, no history scan needed
+        counts = await read_interaction_counts(user.id)
         stats = {
-            "total_interactions": len(interactions),
-            "likes_count": len([i for i in interactions if i["interaction_type"] == "like"]),
-            "saves_count": len([i for i in interactions if i["interaction_type"] == "save"]),
-            "views_count": len([i for i in interactions if i["interaction_type"] == "view"]),
-            "skip_count": len([i for i in interactions if i["interaction_type"] == "skip"]),
-            "partial_count": len([i for i in interactions if i["interaction_type"] == "partial"]),
-            "interested_count": len([i for i in interactions if i["interaction_type"] == "interested"]),
-            "engaged_count": len([i for i in interactions if i["interaction_type"] == "engaged"])
+            "total_interactions": sum(counts.values()),
+            "likes_count": counts.get("like", 0),
+            "saves_count": counts.get("save", 0),
+            "views_count": counts.get("view", 0),
+            "skip_count": counts.get("skip", 0),
+            "partial_count": counts.get("partial", 0),
+            "interested_count": counts.get("interested", 0),
+            "engaged_count": counts.get("engaged", 0)
         }
         
         return {"data": stats}
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from pydantic import BaseModel
 from ..schemas.user import User
 from ..dependencies.auth import get_current_user
-from ..services.supabase import get_supabase_client, get_supabase_admin_client
+from ..services.database import get_db_admin_client, get_db_user_client
+from ..services.loaders import SlideLoader, get_slide_loader
+from ..services.badges import refresh_badges
 import logging
 
 router = APIRouter(prefix="/api/saved", tags=["saved"])
@@ -12,14 +14,17 @@ class SaveContentRequest(BaseModel):
     content_id: str
 
 @router.get("")
-async def get_saved_content(user: User = Depends(get_current_user)):
+async def get_saved_content(
+    user: User = Depends(get_current_user),
+    slide_loader: SlideLoader = Depends(get_slide_loader)
+):
     """Get user's saved content"""
     try:
         logger.info(f"Getting saved content for auth user {user.id}")
-        supabase = get_supabase_client()
+        supabase = get_db_user_client(user.access_token)
         
         # First, get the saved content records for this user
-        saved_response = supabase.table("saved_contents").select("id, content_id, created_at").eq("user_id", user.id).order("created_at", desc=True).execute()
+        saved_response = await supabase.table("saved_contents").select("id, content_id, created_at").eq("user_id", user.id).order("created_at", desc=True).execute()
         
         if not saved_response.data:
             return {"data": []}
@@ -28,7 +33,7 @@ async def get_saved_content(user: User = Depends(get_current_user)):
         content_ids = [item["content_id"] for item in saved_response.data]
         
         # Get the actual content details from contents table
-        contents_response = supabase.table("contents").select("""
+        contents_response = await supabase.table("contents").select("""
             id,
             title,
             summary,
@@ -46,24 +51,7 @@ async def get_saved_content(user: User = Depends(get_current_user)):
             if content.get("content_type") == "carousel"
         ]
         
-        slides_map = {}
-        if carousel_content_ids:
-            # Use admin client to bypass RLS for carousel slides
-            supabase_admin = get_supabase_admin_client()
-            slides_response = supabase_admin.table("carousel_slides").select(
-                "content_id, id, image_url, slide_index"
-            ).in_("content_id", carousel_content_ids).order("slide_index").execute()
-            
-            # Group slides by content_id
-            for slide in slides_response.data:
-                content_id = slide["content_id"]
-                if content_id not in slides_map:
-                    slides_map[content_id] = []
-                slides_map[content_id].append({
-                    "id": slide["id"],
-                    "image_url": slide["image_url"],
-                    "slide_index": slide["slide_index"]
-                })
+        slides_map = await slide_loader.load_many(carousel_content_ids) if carousel_content_ids else {}
         
         # Combine saved_contents data with actual content details and slides
         result = []
@@ -90,15 +78,16 @@ async def get_saved_content(user: User = Depends(get_current_user)):
 @router.post("")
 async def save_content(
     request: SaveContentRequest,
+    background_tasks: BackgroundTasks,
     user: User = Depends(get_current_user)
 ):
     """Save content for user with max saves limit check"""
     try:
         logger.info(f"Saving content {request.content_id} for auth user {user.id}")
-        supabase_admin = get_supabase_admin_client()
+        supabase_admin = get_db_admin_client()
         
         # Get the user's max_saves from the profiles table
-        profile_response = supabase_admin.table("profiles").select("max_saves").eq("user_id", user.id).execute()
+        profile_response = await supabase_admin.table("profiles").select("max_saves").eq("user_id", user.id).execute()
         
         if not profile_response.data:
             logger.warning(f"No profile found for auth user {user.id}")
@@ -108,7 +97,7 @@ async def save_content(
         logger.info(f"Found max_saves {max_saves} for auth user {user.id}")
         
         # Check current number of saved content by this user using auth user ID
-        saved_count_response = supabase_admin.table("saved_contents").select("id", count="exact").eq("user_id", user.id).execute()
+        saved_count_response = await supabase_admin.table("saved_contents").select("id", count="exact").eq("user_id", user.id).execute()
         current_saved_count = saved_count_response.count or 0
         
         logger.info(f"User has {current_saved_count} saved content, max allowed: {max_saves}")
@@ -122,14 +111,14 @@ async def save_content(
             )
         
         # Check if content is already saved using auth user ID
-        existing_response = supabase_admin.table("saved_contents").select("id").eq("user_id", user.id).eq("content_id", request.content_id).execute()
+        existing_response = await supabase_admin.table("saved_contents").select("id").eq("user_id", user.id).eq("content_id", request.content_id).execute()
         
         if existing_response.data:
             logger.warning(f"Content {request.content_id} already saved by user {user.id}")
             raise HTTPException(status_code=409, detail="Content already saved")
         
         # Save the content using auth user ID
-        response = supabase_admin.table("saved_contents").insert({
+        response = await supabase_admin.table("saved_contents").insert({
             "user_id": user.id,
             "content_id": request.content_id
         }).execute()
@@ -138,6 +127,7 @@ async def save_content(
             raise HTTPException(status_code=500, detail="Failed to save content")
         
         logger.info(f"Successfully saved content {request.content_id} for user {user.id}")
+        background_tasks.add_task(refresh_badges, user.id, {"saved_contents"})
         return {
             "data": response.data[0], 
             "message": "Content saved successfully",
@@ -158,10 +148,10 @@ async def remove_saved_content(
     """Remove saved content"""
     try:
         logger.info(f"Removing saved content {saved_content_id} for auth user {user.id}")
-        supabase_admin = get_supabase_admin_client()
+        supabase_admin = get_db_admin_client()
         
         # Remove saved content using auth user ID
-        response = supabase_admin.table("saved_contents").delete().eq("id", saved_content_id).eq("user_id", user.id).execute()
+        response = await supabase_admin.table("saved_contents").delete().eq("id", saved_content_id).eq("user_id", user.id).execute()
         
         if not response.data:
             raise HTTPException(status_code=404, detail="Saved content not found")
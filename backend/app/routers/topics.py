@@ -1,39 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
 from typing import List
 import logging
 import traceback
-from ..schemas.user import User
+from ..schemas.user import User, UserRole
 from ..schemas.topics import UserTopicPreference, Topic
-from ..dependencies.auth import get_current_user
-from ..services.supabase import get_supabase_client, get_supabase_admin_client
+from ..dependencies.auth import get_current_user, require_role
+from ..services.database import get_db_admin_client, get_db_user_client
+from ..services.feed import refill_feed_queue
+from ..services.badges import refresh_badges
+from ..services.preferences import replace_topic_preferences
+from ..services.topics import get_topics_catalogue
 
 router = APIRouter(tags=["topics"])
 logger = logging.getLogger(__name__)
 
 @router.get("/api/topics")
-async def get_topics(user: User = Depends(get_current_user)):
-    """Get all available topics"""
+async def get_topics(request: Request, user: User = Depends(get_current_user)):
+    """Get all available topics.
+
+    Served from the in-process topics catalogue; clients revalidate with If-None-Match.
+    """
     try:
-        logger.info("Attempting to fetch topics from Supabase...")
-        supabase = get_supabase_client()
-        
-        # Ensure your supabase client is authenticated with the user's access token
-        supabase.postgrest.auth(user.access_token)  # ✅ Best for request-scoped auth
-        
-        # First check if we can access the table
-        count_response = supabase.table("topics").select("id").execute()
-        logger.info(f"Topics count response: {count_response}")
-        
-        # Get all topics
-        response = supabase.table("topics").select("*").execute()
-        logger.info(f"Raw Supabase response: {response}")
-        
-        if not response.data:
+        topics, etag = await get_topics_catalogue().get()
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "private, max-age=300"
+        }
+        if request.headers.get("If-None-Match") == etag:
+            return Response(status_code=304, headers=headers)
+
+        if not topics:
             logger.warning("No topics found in database")
-            return {"data": []}
-            
-        logger.info(f"Response data: {response.data}")
-        return {"data": response.data}
+        return JSONResponse({"data": topics}, headers=headers)
         
     except Exception as e:
         logger.error(f"Error fetching topics: {str(e)}")
@@ -44,14 +43,28 @@ async def get_topics(user: User = Depends(get_current_user)):
             detail=f"Failed to fetch topics: {str(e)}"
         )
 
+@router.post("/api/topics/refresh")
+async def refresh_topics(user: User = Depends(require_role(UserRole.ADMIN))):
+    """Reload the topics catalogue after topics were edited (admin only)"""
+    try:
+        await get_topics_catalogue().reload()
+        topics, etag = await get_topics_catalogue().get()
+        return {"message": "Topics catalogue reloaded", "count": len(topics), "etag": etag}
+    except Exception as e:
+        logger.error(f"Error reloading topics catalogue: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to reload topics: {str(e)}"
+        )
+
 @router.get("/api/user/preferences")
 async def get_user_preferences(user: User = Depends(get_current_user)):
     """Get user topic preferences"""
     try:
         logger.info(f"Getting preferences for auth user {user.id}")
-        supabase = get_supabase_client()
+        supabase = get_db_user_client(user.access_token)
                 
-        response = supabase.table("user_topic_preferences").select("""
+        response = await supabase.table("user_topic_preferences").select("""
             *,
             topics (
                 id,
@@ -69,6 +82,7 @@ async def get_user_preferences(user: User = Depends(get_current_user)):
 @router.post("/api/user/preferences")
 async def update_user_preferences(
     preferences: List[UserTopicPreference],
+    background_tasks: BackgroundTasks,
     user: User = Depends(get_current_user)
 ):
     """Update user's topic preferences"""
@@ -76,33 +90,18 @@ async def update_user_preferences(
         logger.info(f"Received preferences update request for auth user {user.id}")
         logger.info(f"Received preferences: {preferences}")
 
-        supabase_admin = get_supabase_admin_client()
-
-        # Delete existing preferences using admin client
-        delete_response = supabase_admin.table("user_topic_preferences").delete().eq("user_id", user.id).execute()
-        logger.info(f"Deleted existing preferences: {delete_response}")
-
-        # Insert new preferences using admin client
-        for pref in preferences:
-            logger.info(f"Processing preference: {pref}")
-            try:
-                response = supabase_admin.table("user_topic_preferences").insert({
-                    "user_id": user.id,
-                    "topic_id": pref.topic_id,
-                    "points": pref.points
-                }).execute()
-                logger.info(f"Insert response for topic {pref.topic_id}: {response}")
-            except Exception as e:
-                logger.error(f"Error updating preference for topic {pref.topic_id}: {str(e)}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Error updating preference: {str(e)}"
-                )
-
-        onboarding_response = supabase_admin.table("profiles").update({
-            "onboarding_completed": True
-        }).eq("user_id", user.id).execute()
-        logger.info(f"Onboarding response: {onboarding_response}")
+        # Preferences and the onboarding flag are replaced in one transaction
+        result = await replace_topic_preferences(
+            user.id,
+            [{"topic_id": pref.topic_id, "points": pref.points} for pref in preferences]
+        )
+        logger.info(f"Saved {result['preferences_saved']} preference(s) for user {user.id}")
+        if not result["onboarding_completed"]:
+            logger.warning(f"No profile to mark onboarded for user {user.id}")
+
+        # Rebuild the feed candidate queue for the new preferences
+        background_tasks.add_task(refill_feed_queue, user.id, reset=True)
+        background_tasks.add_task(refresh_badges, user.id, {"max_topic_points"})
 
         return {"message": "Preferences updated successfully"}
 
@@ -123,10 +122,10 @@ async def complete_onboarding(user: User = Depends(get_current_user)):
     try:
         logger.info(f"Marking onboarding complete for user {user.id}")
         
-        supabase_admin = get_supabase_admin_client()
+        supabase_admin = get_db_admin_client()
 
         # Update the user's profile to mark onboarding as complete
-        response = supabase_admin.table("profiles").update({
+        response = await supabase_admin.table("profiles").update({
             "onboarding_completed": True
         }).eq("user_id", user.id).execute()
         
@@ -1,36 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import StreamingResponse
-import httpx
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 import os
+import httpx
 import logging
-from typing import Optional, List
+from itertools import chain
+from typing import Optional
 from ..schemas.user import User
 from ..dependencies.auth import get_current_user
-import re
+from ..utils.text_segmenter import iter_segments
+from ..services.tts import (
+    ELEVENLABS_API_KEY, ELEVENLABS_VOICE_ID,
+    TTSProviderError, get_voices_catalogue, linked_chunk_audio, synthesize_speech
+)
 
 router = APIRouter(prefix="/api/tts", tags=["text-to-speech"])
 logger = logging.getLogger(__name__)
 
-# ElevenLabs configuration
-ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
-ELEVENLABS_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID", "iCrDUkL56s3C8sCRl7wb")  # Default voice ID
-ELEVENLABS_BASE_URL = "https://api.elevenlabs.io/v1"
-
-def split_text(text: str, max_length: int) -> List[str]:
-    # Split text into sentences
-    sentences = re.findall(r'[^.!?]+[.!?]+', text) or [text]
-    chunks = []
-    current = ''
-    for sentence in sentences:
-        if len(current) + len(sentence) <= max_length:
-            current += sentence + ' '
-        else:
-            if current.strip():
-                chunks.append(current.strip())
-            current = sentence + ' '
-    if current.strip():
-        chunks.append(current.strip())
-    return chunks
+TTS_CHUNK_LENGTH = 300  # hard limit per synthesized chunk, in characters
 
 @router.post("/generate")
 async def generate_tts(
@@ -38,7 +25,12 @@ async def generate_tts(
     voice_id: Optional[str] = None,
     user: User = Depends(get_current_user)
 ):
-    """Generate text-to-speech audio using ElevenLabs API, with chunking for long text"""
+    """Generate text-to-speech audio using ElevenLabs API, with chunking for long text.
+
+    Chunks are synthesized concurrently and streamed in order; the response
+    starts as soon as the first chunk is ready. Audio is cached on disk per
+    chunk, and single-chunk texts are answered straight from the cache.
+    """
     
     if not ELEVENLABS_API_KEY:
         raise HTTPException(
@@ -55,48 +47,55 @@ async def generate_tts(
     # Use provided voice_id or default
     target_voice_id = voice_id or ELEVENLABS_VOICE_ID
     
+    # Split text into chunks of at most 300 chars, lazily; peek at two to
+    # tell single-chunk texts apart
+    chunks = iter_segments(text, TTS_CHUNK_LENGTH)
+    first_chunk = next(chunks, None)
+    second_chunk = next(chunks, None)
+    if first_chunk is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Text has nothing to read"
+        )
+    
     try:
         logger.info(f"Generating TTS for user {user.id}, text length: {len(text)}")
         
-        # Split text into ~300-char chunks
-        chunks = split_text(text, 300)
-        logger.info(f"TTS text split into {len(chunks)} chunk(s)")
+        if second_chunk is None:
+            # Served from a private link, so eviction cannot remove the file mid-response
+            path = await linked_chunk_audio(target_voice_id, first_chunk)
+            return FileResponse(
+                path,
+                media_type="audio/mpeg",
+                headers={
+                    "Cache-Control": "public, max-age=3600"
+                },
+                background=BackgroundTask(os.unlink, path)
+            )
         
-        url = f"{ELEVENLABS_BASE_URL}/text-to-speech/{target_voice_id}"
-        headers = {
-            "Accept": "audio/mpeg",
-            "Content-Type": "application/json",
-            "xi-api-key": ELEVENLABS_API_KEY
-        }
+        segments = synthesize_speech(chain([first_chunk, second_chunk], chunks), target_voice_id)
+        # Wait for the first chunk so upstream errors still become error responses
+        try:
+            first_segment = await segments.__anext__()
+        except BaseException:
+            await segments.aclose()
+            raise
+        
+        async def audio_stream():
+            try:
+                yield first_segment
+                async for segment in segments:
+                    yield segment
+            except Exception as e:
+                # Headers are already sent, all we can do is end the stream
+                logger.error(f"TTS stream aborted: {str(e)}")
+            finally:
+                await segments.aclose()
         
-        audio_segments = []
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            for idx, chunk in enumerate(chunks):
-                payload = {
-                    "text": chunk,
-                    "voice_settings": {
-                        "stability": 0.5,
-                        "similarity_boost": 0.75
-                    }
-                }
-                response = await client.post(url, json=payload, headers=headers)
-                if response.status_code != 200:
-                    logger.error(f"ElevenLabs API error (chunk {idx+1}/{len(chunks)}): {response.status_code} - {response.text}")
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"TTS generation failed: {response.text}"
-                    )
-                audio_segments.append(response.content)
-        # Concatenate all audio segments
-        def audio_stream():
-            for segment in audio_segments:
-                yield segment
-        total_length = sum(len(seg) for seg in audio_segments)
         return StreamingResponse(
             audio_stream(),
             media_type="audio/mpeg",
             headers={
-                "Content-Length": str(total_length),
                 "Cache-Control": "public, max-age=3600"
             }
         )
@@ -107,6 +106,11 @@ async def generate_tts(
             status_code=504,
             detail="TTS generation timed out"
         )
+    except TTSProviderError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"TTS generation failed: {e.detail}"
+        )
     except Exception as e:
         logger.error(f"Error generating TTS: {str(e)}")
         raise HTTPException(
@@ -115,8 +119,11 @@ async def generate_tts(
         )
 
 @router.get("/voices")
-async def get_available_voices(user: User = Depends(get_current_user)):
-    """Get available voices from ElevenLabs"""
+async def get_available_voices(request: Request, user: User = Depends(get_current_user)):
+    """Get available voices from ElevenLabs.
+
+    Served from an in-process cache; clients revalidate with If-None-Match.
+    """
     
     if not ELEVENLABS_API_KEY:
         raise HTTPException(
@@ -125,23 +132,20 @@ async def get_available_voices(user: User = Depends(get_current_user)):
         )
     
     try:
-        url = f"{ELEVENLABS_BASE_URL}/voices"
+        voices, etag = await get_voices_catalogue().get()
         headers = {
-            "xi-api-key": ELEVENLABS_API_KEY
+            "ETag": etag,
+            "Cache-Control": "private, max-age=300"
         }
-        
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(url, headers=headers)
-            
-            if response.status_code != 200:
-                logger.error(f"ElevenLabs voices API error: {response.status_code}")
-                raise HTTPException(
-                    status_code=500,
-                    detail="Failed to fetch available voices"
-                )
-            
-            return response.json()
-            
+        if request.headers.get("If-None-Match") == etag:
+            return Response(status_code=304, headers=headers)
+        return JSONResponse(voices, headers=headers)
+    except TTSProviderError as e:
+        logger.error(f"ElevenLabs voices API error: {e.status_code}")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to fetch available voices"
+        )
     except Exception as e:
         logger.error(f"Error fetching voices: {str(e)}")
         raise HTTPException(
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException
 from pydantic import BaseModel
-from datetime import datetime, date, timedelta, timezone
+from datetime import datetime, date, timezone
 from typing import List, Dict, Any, Optional
 import logging
 from ..schemas.user import User
 from ..dependencies.auth import get_current_user
-from ..services.supabase import get_supabase_client
+from ..services.database import get_db_user_client
+from ..services.badges import refresh_badges
+from ..services.counters import read_counters, interaction_counter
+from ..services.coins import apply_coin_transaction, InsufficientCoinsError, ProfileNotFoundError
+from ..services.streaks import credit_daily_streak, read_daily_progress, DAILY_STREAK_THRESHOLD, STREAK_MILESTONE_DAYS
 
 router = APIRouter(prefix="/api/user", tags=["user"])
 logger = logging.getLogger(__name__)
@@ -13,6 +17,8 @@ logger = logging.getLogger(__name__)
 class CoinOperationRequest(BaseModel):
     amount: int
     reason: str
+    # Retries with the same key are applied once; the Idempotency-Key header works too
+    idempotency_key: Optional[str] = None
 
 class UpdateUsernameRequest(BaseModel):
     username: str
@@ -31,10 +37,10 @@ async def get_user_profile(user: User = Depends(get_current_user)):
     """Get comprehensive user profile information"""
     try:
         logger.info(f"Getting comprehensive profile for user: {user.id}")
-        supabase = get_supabase_client()
+        supabase = get_db_user_client(user.access_token)
 
         # Get user's profile from database
-        profile_response = supabase.table("profiles").select(
+        profile_response = await supabase.table("profiles").select(
             "user_id, email, full_name, avatar_url, streak_days, total_coins, onboarding_completed"
         ).eq("user_id", user.id).single().execute()
 
@@ -65,10 +71,10 @@ async def get_user_profile(user: User = Depends(get_current_user)):
 async def get_user_streak(user: User = Depends(get_current_user)):
     """Get user's streak data based on actual database streak_days field"""
     try:
-        supabase = get_supabase_client()
+        supabase = get_db_user_client(user.access_token)
         
         # Get user's profile with streak data
-        profile_response = supabase.table("profiles").select(
+        profile_response = await supabase.table("profiles").select(
             "streak_days, last_streak_date"
         ).eq("user_id", user.id).single().execute()
         
@@ -96,7 +102,7 @@ async def get_user_streak(user: User = Depends(get_current_user)):
         best_streak = current_streak
         
         # Check if milestone reached (every 7 days)
-        milestone_reached = current_streak > 0 and current_streak % 7 == 0 and today_completed
+        milestone_reached = current_streak > 0 and current_streak % STREAK_MILESTONE_DAYS == 0 and today_completed
         
         return {
             "current_streak": current_streak,
@@ -116,10 +122,10 @@ async def get_user_streak(user: User = Depends(get_current_user)):
 async def get_user_coins(user: User = Depends(get_current_user)):
     """Get user's current coin balance"""
     try:
-        supabase = get_supabase_client()
+        supabase = get_db_user_client(user.access_token)
         
         # Get user's coin balance from profile
-        profile_response = supabase.table("profiles").select("total_coins").eq("user_id", user.id).single().execute()
+        profile_response = await supabase.table("profiles").select("total_coins").eq("user_id", user.id).single().execute()
         
         if not profile_response.data:
             raise HTTPException(status_code=404, detail="User profile not found")
@@ -133,81 +139,74 @@ async def get_user_coins(user: User = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/coins/add")
-async def add_user_coins(request: CoinOperationRequest, user: User = Depends(get_current_user)):
+async def add_user_coins(
+    request: CoinOperationRequest,
+    user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """Add coins to user's balance (for rewards, etc.)"""
     try:
         if request.amount <= 0:
             raise HTTPException(status_code=400, detail="Amount must be positive")
         
-        supabase = get_supabase_client()
-        
-        # Get current coin balance
-        profile_response = supabase.table("profiles").select("total_coins").eq("user_id", user.id).single().execute()
-        
-        if not profile_response.data:
-            raise HTTPException(status_code=404, detail="User profile not found")
-        
-        current_coins = profile_response.data["total_coins"]
-        new_balance = current_coins + request.amount
-        
-        # Update coin balance
-        update_response = supabase.table("profiles").update({
-            "total_coins": new_balance
-        }).eq("user_id", user.id).execute()
-        
-        if not update_response.data:
-            raise HTTPException(status_code=500, detail="Failed to update coin balance")
+        transaction = await apply_coin_transaction(
+            user.id, request.amount, request.reason, request.idempotency_key or idempotency_key
+        )
         
-        logger.info(f"Added {request.amount} coins to user {user.id} for reason: {request.reason}. New balance: {new_balance}")
+        if transaction.applied:
+            logger.info(f"Added {request.amount} coins to user {user.id} for reason: {request.reason}. New balance: {transaction.balance}")
+            await refresh_badges(user.id, {"coins_earned"})
+        else:
+            logger.info(f"Coin addition for user {user.id} already applied, returning original result")
         
         return {
-            "coins": new_balance,
-            "added": request.amount,
-            "reason": request.reason
+            "coins": transaction.balance,
+            "added": transaction.amount,
+            "reason": request.reason,
+            "duplicate": not transaction.applied
         }
         
+    except HTTPException:
+        raise
+    except ProfileNotFoundError:
+        raise HTTPException(status_code=404, detail="User profile not found")
     except Exception as e:
         logger.error(f"Error adding user coins: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/coins/spend")
-async def spend_user_coins(request: CoinOperationRequest, user: User = Depends(get_current_user)):
+async def spend_user_coins(
+    request: CoinOperationRequest,
+    user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """Spend coins from user's balance (for marketplace purchases, etc.)"""
     try:
         if request.amount <= 0:
             raise HTTPException(status_code=400, detail="Amount must be positive")
         
-        supabase = get_supabase_client()
-        
-        # Get current coin balance
-        profile_response = supabase.table("profiles").select("total_coins").eq("user_id", user.id).single().execute()
-        
-        if not profile_response.data:
-            raise HTTPException(status_code=404, detail="User profile not found")
-        
-        current_coins = profile_response.data["total_coins"]
-        
-        if current_coins < request.amount:
-            raise HTTPException(status_code=400, detail="Insufficient coins")
-        
-        new_balance = current_coins - request.amount
-        
-        # Update coin balance
-        update_response = supabase.table("profiles").update({
-            "total_coins": new_balance
-        }).eq("user_id", user.id).execute()
-        
-        if not update_response.data:
-            raise HTTPException(status_code=500, detail="Failed to update coin balance")
+        transaction = await apply_coin_transaction(
+            user.id, -request.amount, request.reason, request.idempotency_key or idempotency_key
+        )
         
-        logger.info(f"Spent {request.amount} coins for user {user.id} for reason: {request.reason}. New balance: {new_balance}")
+        if transaction.applied:
+            logger.info(f"Spent {request.amount} coins for user {user.id} for reason: {request.reason}. New balance: {transaction.balance}")
+        else:
+            logger.info(f"Coin spend for user {user.id} already applied, returning original result")
         
         return {
-            "coins": new_balance,
-            "spent": request.amount,
-            "reason": request.reason
+            "coins": transaction.balance,
+            "spent": -transaction.amount,
+            "reason": request.reason,
+            "duplicate": not transaction.applied
         }
         
+    except HTTPException:
+        raise
+    except InsufficientCoinsError:
+        raise HTTPException(status_code=400, detail="Insufficient coins")
+    except ProfileNotFoundError:
+        raise HTTPException(status_code=404, detail="User profile not found")
     except Exception as e:
         logger.error(f"Error spending user coins: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -220,10 +219,10 @@ async def update_user_avatar(request: dict, user: User = Depends(get_current_use
         if not avatar_url:
             raise HTTPException(status_code=400, detail="Avatar URL is required")
         
-        supabase = get_supabase_client()
+        supabase = get_db_user_client(user.access_token)
         
         # Update avatar URL in profile
-        update_response = supabase.table("profiles").update({
+        update_response = await supabase.table("profiles").update({
             "avatar_url": avatar_url
         }).eq("user_id", user.id).execute()
         
@@ -257,11 +256,11 @@ async def update_username(request: UpdateUsernameRequest, user: User = Depends(g
         if len(username) > 50:
             raise HTTPException(status_code=400, detail="Username must be less than 50 characters")
         
-        supabase = get_supabase_client()
+        supabase = get_db_user_client(user.access_token)
         
         # Update username in profile
         try:
-            update_response = supabase.table("profiles").update({
+            update_response = await supabase.table("profiles").update({
                 "full_name": username
             }).eq("user_id", user.id).execute()
             
@@ -300,44 +299,23 @@ async def update_username(request: UpdateUsernameRequest, user: User = Depends(g
 async def get_daily_progress(user: User = Depends(get_current_user)):
     """Get user's daily content consumption progress"""
     try:
-        supabase = get_supabase_client()
-        
-        # Get today's date in UTC (to match Supabase timestamp storage)
-        today_utc = datetime.now(timezone.utc).date().isoformat()
-        logger.info(f"📅 Checking daily progress for user {user.id} on UTC date: {today_utc}")
-        
-        # Count unique content interactions for today (any type of interaction counts)
-        # Use UTC timezone to match how Supabase stores timestamps
-        interactions_response = supabase.table("user_interactions").select(
-            "content_id, interaction_type, created_at"
-        ).eq("user_id", user.id).gte("created_at", f"{today_utc}T00:00:00Z").execute()
-        
-        logger.info(f"🔍 Found {len(interactions_response.data) if interactions_response.data else 0} total interactions for user {user.id} today")
-        if interactions_response.data:
-            logger.info(f"📋 Sample interactions: {interactions_response.data[:3]}")
+        # Unique content pieces interacted with today (UTC), any interaction type counts
+        progress = await read_daily_progress(user.id)
+        today_utc = progress["day"]
+        unique_content_today = progress["unique_content_consumed"]
         
-        # Count unique content pieces interacted with today
-        unique_content_today = len(set([
-            interaction["content_id"] for interaction in interactions_response.data
-        ])) if interactions_response.data else 0
+        logger.info(f"📊 Unique content pieces consumed by user {user.id} on {today_utc}: {unique_content_today}")
         
-        logger.info(f"📊 Unique content pieces consumed today: {unique_content_today}")
-        
-        # Check if streak threshold is met (4 unique content pieces)
-        streak_threshold_met = unique_content_today >= 4
+        # Check if streak threshold is met
+        streak_threshold_met = unique_content_today >= DAILY_STREAK_THRESHOLD
         
         # Check if user has already been credited for today's streak
-        profile_response = supabase.table("profiles").select(
-            "streak_days, last_streak_date"
-        ).eq("user_id", user.id).single().execute()
-        
-        last_streak_date = profile_response.data.get("last_streak_date") if profile_response.data else None
-        already_credited_today = last_streak_date == today_utc
+        already_credited_today = progress["last_streak_date"] == today_utc
         
         return {
             "date": today_utc,
             "unique_content_consumed": unique_content_today,
-            "threshold_required": 4,
+            "threshold_required": DAILY_STREAK_THRESHOLD,
             "threshold_met": streak_threshold_met,
             "already_credited_today": already_credited_today,
             "can_earn_streak": streak_threshold_met and not already_credited_today
@@ -351,84 +329,39 @@ async def get_daily_progress(user: User = Depends(get_current_user)):
 async def update_daily_streak(user: User = Depends(get_current_user)):
     """Update user's streak when they complete daily content goal"""
     try:
-        supabase = get_supabase_client()
-        today_utc = datetime.now(timezone.utc).date().isoformat()
-        
-        # First check if user has met the daily threshold
-        progress_data = await get_daily_progress(user)
+        result = await credit_daily_streak(user.id)
+        status = result["status"]
         
-        if not progress_data["can_earn_streak"]:
-            if progress_data["already_credited_today"]:
-                return {
-                    "success": False,
-                    "message": "Streak already credited for today",
-                    "streak_days": progress_data.get("current_streak", 0)
-                }
-            else:
-                return {
-                    "success": False,
-                    "message": f"Need to consume {progress_data['threshold_required']} unique content pieces. Current: {progress_data['unique_content_consumed']}",
-                    "streak_days": 0
-                }
-        
-        # Get current profile data
-        profile_response = supabase.table("profiles").select(
-            "streak_days, last_streak_date"
-        ).eq("user_id", user.id).single().execute()
-        
-        if not profile_response.data:
-            raise HTTPException(status_code=404, detail="User profile not found")
-        
-        current_streak = profile_response.data.get("streak_days", 0)
-        last_streak_date = profile_response.data.get("last_streak_date")
-        
-        # Calculate new streak using UTC dates
-        yesterday_utc = (datetime.now(timezone.utc).date() - timedelta(days=1)).isoformat()
-        
-        if last_streak_date == yesterday_utc:
-            # Consecutive day - increment streak
-            new_streak = current_streak + 1
-        elif last_streak_date == today_utc:
-            # Already credited today (shouldn't happen due to check above)
+        if status == "already_credited":
             return {
                 "success": False,
                 "message": "Streak already credited for today",
-                "streak_days": current_streak
+                "streak_days": result["streak_days"]
+            }
+        if status == "threshold_not_met":
+            return {
+                "success": False,
+                "message": f"Need to consume {DAILY_STREAK_THRESHOLD} unique content pieces. Current: {result['unique_content_consumed']}",
+                "streak_days": 0
             }
-        else:
-            # Streak broken or first day - start new streak
-            new_streak = 1
-        
-        # Update profile with new streak
-        update_response = supabase.table("profiles").update({
-            "streak_days": new_streak,
-            "last_streak_date": today_utc
-        }).eq("user_id", user.id).execute()
-        
-        if not update_response.data:
-            raise HTTPException(status_code=500, detail="Failed to update streak")
-        
-        logger.info(f"Updated streak for user {user.id}: {current_streak} -> {new_streak}")
         
-        # Award coins for milestone streaks (every 7 days)
-        coins_earned = 0
-        if new_streak % 7 == 0:
-            coins_earned = 100
-            try:
-                await add_user_coins(CoinOperationRequest(amount=coins_earned, reason=f"7-day streak milestone (day {new_streak})"), user)
-                logger.info(f"Awarded {coins_earned} coins to user {user.id} for {new_streak}-day streak")
-            except Exception as coin_error:
-                logger.error(f"Failed to award streak coins: {coin_error}")
+        new_streak = result["streak_days"]
+        logger.info(f"Updated streak for user {user.id}: {result['previous_streak']} -> {new_streak}")
+        if result["coins_earned"]:
+            logger.info(f"Awarded {result['coins_earned']} coins to user {user.id} for {new_streak}-day streak")
         
         return {
             "success": True,
             "message": "Streak updated successfully!",
             "streak_days": new_streak,
-            "previous_streak": current_streak,
-            "coins_earned": coins_earned,
-            "milestone_reached": new_streak % 7 == 0
+            "previous_streak": result["previous_streak"],
+            "coins_earned": result["coins_earned"],
+            "milestone_reached": new_streak % STREAK_MILESTONE_DAYS == 0,
+            "new_badges": result["new_badges"]
         }
         
+    except ProfileNotFoundError:
+        raise HTTPException(status_code=404, detail="User profile not found")
     except Exception as e:
         logger.error(f"Error updating daily streak: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -437,9 +370,8 @@ async def update_daily_streak(user: User = Depends(get_current_user)):
 async def get_total_facts(user: User = Depends(get_current_user)):
     """Get the total number of facts the user has seen (view interactions)."""
     try:
-        supabase = get_supabase_client()
-        response = supabase.table("user_interactions").select("*", count="exact").eq("user_id", user.id).eq("interaction_type", "view").execute()
-        total_facts = response.count or 0
+        counters = await read_counters(user.id, [interaction_counter("view")])
+        total_facts = counters.get(interaction_counter("view"), 0)
         return {"total_facts": total_facts}
     except Exception as e:
         logger.error(f"Error fetching total facts for user {user.id}: {str(e)}")
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from typing import List, Optional
+from uuid import UUID
 
 class ContentRequest(BaseModel):
     title: str
@@ -12,6 +13,15 @@ class ContentRequest(BaseModel):
     video_url: Optional[str] = None  # Add video support for reels
 
 class UserInteractionRequest(BaseModel):
-    content_id: str
+    content_id: UUID
     interaction_type: str  # 'like', 'save', 'view', 'skip', 'partial', 'interested', 'engaged'
-    interaction_value: int 
\ No newline at end of file
+    interaction_value: int
+
+class InteractionBatchResult(BaseModel):
+    index: int
+    content_id: str
+    interaction_type: str
+    recorded: bool
+    duplicate: bool
+    # The database refused the event (e.g. unknown content_id); resending it won't help
+    rejected: bool = False
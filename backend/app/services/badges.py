@@ -1,21 +1,97 @@
-from .supabase import get_supabase_client
-from datetime import datetime
-
-def check_and_award_badges(user_id: str):
-    supabase = get_supabase_client()
-    # 1. Count views
-    view_count = supabase.table("user_interactions").select("*", count="exact").eq("user_id", user_id).eq("interaction_type", "view").execute().count
-    # 2. Get existing badges
-    existing_badges = supabase.table("user_badges").select("badge_id").eq("user_id", user_id).execute().data
-    existing_ids = {b['badge_id'] for b in existing_badges}
-    # 3. Award badge if criteria met
-    if view_count >= 2 and "baby_steps" not in existing_ids:
-        print(f"Inserting badge for user_id: {user_id}, badge_id: baby_steps")
-        response = supabase.table("user_badges").insert({
-            "user_id": user_id,
-            "badge_id": "baby_steps",
-            "earned_at": datetime.utcnow().isoformat()
-        }).execute()
-        print(f"Insert response: {response}")
-        return "baby_steps"
-    return None 
\ No newline at end of file
+import logging
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set
+from .database import get_db_admin_client
+from .counters import interaction_counter
+
+logger = logging.getLogger(__name__)
+
+
+class BadgeRule(NamedTuple):
+    """Award `badge_id` once the user's `counter` reaches `threshold`.
+
+    Counters live in the user_counters table and are kept up to date by
+    database triggers (see the badge_counters migration).
+    """
+    badge_id: str
+    counter: str
+    threshold: int
+
+
+BADGE_RULES: List[BadgeRule] = [
+    BadgeRule("baby_steps", interaction_counter("view"), 2),
+    BadgeRule("curious_cat", "distinct_facts", 10),
+    BadgeRule("daily_grind", "streak_days", 5),
+    BadgeRule("super_streak", "streak_days", 14),
+    BadgeRule("topic_master", "max_topic_points", 100),
+    BadgeRule("explorer", "distinct_topics", 5),
+    BadgeRule("first_like", interaction_counter("like"), 1),
+    BadgeRule("content_saver", "saved_contents", 3),
+    BadgeRule("coin_collector", "coins_earned", 500),
+]
+
+# Rules indexed by the counter that drives them
+_RULES_BY_COUNTER: Dict[str, List[BadgeRule]] = {}
+for _rule in BADGE_RULES:
+    _RULES_BY_COUNTER.setdefault(_rule.counter, []).append(_rule)
+
+
+def interaction_counters(interaction_type: str) -> Set[str]:
+    """Counters that recording an interaction of this type can change"""
+    return {interaction_counter(interaction_type), "distinct_facts", "distinct_topics"}
+
+
+def rules_for(counters: Optional[Iterable[str]] = None) -> List[BadgeRule]:
+    """Rules affected by changes to `counters`; all rules when None"""
+    if counters is None:
+        return list(BADGE_RULES)
+    return [rule for counter in set(counters) for rule in _RULES_BY_COUNTER.get(counter, [])]
+
+
+def badge_checks(user_id: str, counters: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+    """The award_badges() SQL function's input for the rules affected by `counters`"""
+    return [
+        {"user_id": user_id, "badge_id": rule.badge_id, "counter": rule.counter, "threshold": rule.threshold}
+        for rule in rules_for(counters)
+    ]
+
+
+async def award_badges(changes: Dict[str, Set[str]]) -> Dict[str, List[str]]:
+    """Evaluate the rules affected by each user's changed counters.
+
+    `changes` maps user id to the counters that changed for that user. All
+    users are checked in one round-trip; returns the newly awarded badge ids
+    per user.
+    """
+    checks = [check for user_id, counters in changes.items() for check in badge_checks(user_id, counters)]
+    if not checks:
+        return {}
+
+    db = get_db_admin_client()
+    response = await db.rpc("award_badges", {"p_checks": checks}).execute()
+
+    awarded: Dict[str, List[str]] = {}
+    for row in response.data or []:
+        awarded.setdefault(row["user_id"], []).append(row["badge_id"])
+    for user_id, badge_ids in awarded.items():
+        logger.info(f"🏅 Awarded badges {badge_ids} to user {user_id}")
+    return awarded
+
+
+async def evaluate_badges(user_id: str, counters: Optional[Iterable[str]] = None) -> List[str]:
+    """Award any badges the user now qualifies for; returns the new badge ids.
+
+    Only rules driven by `counters` are evaluated, or every rule when None.
+    """
+    rules = rules_for(counters)
+    if not rules:
+        return []
+    awarded = await award_badges({user_id: {rule.counter for rule in rules}})
+    return awarded.get(user_id, [])
+
+
+async def refresh_badges(user_id: str, counters: Optional[Iterable[str]] = None) -> None:
+    """evaluate_badges for use as a background task; failures are logged"""
+    try:
+        await evaluate_badges(user_id, counters)
+    except Exception as e:
+        logger.error(f"Error evaluating badges for user {user_id}: {str(e)}")
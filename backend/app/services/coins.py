@@ -0,0 +1,51 @@
+import logging
+from typing import NamedTuple, Optional
+from postgrest.exceptions import APIError
+from .database import get_db_admin_client
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientCoinsError(Exception):
+    pass
+
+
+class ProfileNotFoundError(Exception):
+    pass
+
+
+class CoinTransaction(NamedTuple):
+    balance: int
+    amount: int
+    applied: bool  # False when the idempotency key had already been used
+
+
+async def apply_coin_transaction(
+    user_id: str,
+    amount: int,
+    reason: str,
+    idempotency_key: Optional[str] = None
+) -> CoinTransaction:
+    """Add (positive amount) or spend (negative amount) coins in one round-trip.
+
+    The balance change and its coin_transactions ledger row are written
+    atomically. Raises InsufficientCoinsError when spending more than the
+    balance and ProfileNotFoundError when the user has no profile.
+    """
+    db = get_db_admin_client()
+    try:
+        response = await db.rpc("apply_coin_transaction", {
+            "p_user_id": user_id,
+            "p_amount": amount,
+            "p_reason": reason,
+            "p_idempotency_key": idempotency_key,
+        }).execute()
+    except APIError as e:
+        if e.message == "insufficient_coins":
+            raise InsufficientCoinsError() from e
+        if e.message == "profile_not_found":
+            raise ProfileNotFoundError() from e
+        raise
+
+    row = response.data[0]
+    return CoinTransaction(balance=row["balance"], amount=row["amount"], applied=row["applied"])
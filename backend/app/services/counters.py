@@ -0,0 +1,37 @@
+import logging
+from typing import Dict, Iterable, Optional
+from .database import get_db_admin_client
+
+logger = logging.getLogger(__name__)
+
+INTERACTION_COUNTER_PREFIX = "interaction:"
+
+
+def interaction_counter(interaction_type: str) -> str:
+    return f"{INTERACTION_COUNTER_PREFIX}{interaction_type}"
+
+
+async def read_counters(
+    user_id: str,
+    names: Optional[Iterable[str]] = None,
+    prefix: Optional[str] = None
+) -> Dict[str, int]:
+    """Read the user's counters from user_counters in one round-trip.
+
+    Selects the given counter names, or every counter starting with
+    `prefix`. Counters that were never incremented are absent.
+    """
+    db = get_db_admin_client()
+    query = db.table("user_counters").select("counter, value").eq("user_id", user_id)
+    if names is not None:
+        query = query.in_("counter", list(names))
+    if prefix is not None:
+        query = query.like("counter", f"{prefix}%")
+    response = await query.execute()
+    return {row["counter"]: row["value"] for row in response.data or []}
+
+
+async def read_interaction_counts(user_id: str) -> Dict[str, int]:
+    """Interactions recorded for the user, by interaction type"""
+    counters = await read_counters(user_id, prefix=INTERACTION_COUNTER_PREFIX)
+    return {name[len(INTERACTION_COUNTER_PREFIX):]: value for name, value in counters.items()}
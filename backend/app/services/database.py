@@ -0,0 +1,125 @@
+import os
+import logging
+from typing import Dict, Optional
+import httpx
+from postgrest import AsyncFilterRequestBuilder, AsyncPostgrestClient
+from .supabase import supabase_url, supabase_anon_key, supabase_service_key
+
+logger = logging.getLogger(__name__)
+
+# Connection pool configuration
+DB_POOL_SIZE = int(os.getenv("SUPABASE_DB_POOL_SIZE", "100"))  # max open connections
+DB_POOL_KEEPALIVE = int(os.getenv("SUPABASE_DB_POOL_KEEPALIVE", "20"))  # idle connections kept open
+DB_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_DB_KEEPALIVE_EXPIRY", "30"))  # seconds
+DB_TIMEOUT = float(os.getenv("SUPABASE_DB_TIMEOUT", "10"))  # seconds per request
+DB_CONNECT_TIMEOUT = float(os.getenv("SUPABASE_DB_CONNECT_TIMEOUT", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("SUPABASE_DB_POOL_TIMEOUT", "5"))  # wait for a free connection
+DB_HTTP2 = os.getenv("SUPABASE_DB_HTTP2", "true").lower() == "true"
+
+rest_url = f"{supabase_url.rstrip('/')}/rest/v1"
+
+_pool: Optional[httpx.AsyncClient] = None
+
+
+def _create_pool() -> httpx.AsyncClient:
+    logger.info(
+        f"Creating PostgREST connection pool: max_connections={DB_POOL_SIZE}, "
+        f"keepalive={DB_POOL_KEEPALIVE}, http2={DB_HTTP2}"
+    )
+    return httpx.AsyncClient(
+        base_url=rest_url,
+        headers={"Accept": "application/json", "Content-Type": "application/json"},
+        timeout=httpx.Timeout(DB_TIMEOUT, connect=DB_CONNECT_TIMEOUT, pool=DB_POOL_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=DB_POOL_SIZE,
+            max_keepalive_connections=DB_POOL_KEEPALIVE,
+            keepalive_expiry=DB_KEEPALIVE_EXPIRY,
+        ),
+        http2=DB_HTTP2,
+        follow_redirects=True,
+    )
+
+
+def get_pool() -> httpx.AsyncClient:
+    global _pool
+    if _pool is None or _pool.is_closed:
+        _pool = _create_pool()
+    return _pool
+
+
+async def close_database() -> None:
+    global _pool
+    if _pool is not None and not _pool.is_closed:
+        await _pool.aclose()
+        logger.info("PostgREST connection pool closed")
+    _pool = None
+
+
+class _PooledSession:
+    """Sends requests through the shared pool with this client's own headers"""
+
+    def __init__(self, headers: Dict[str, str]):
+        self.headers = httpx.Headers(headers)
+        self.auth = None
+
+    async def request(self, method: str, url: str, *, headers=None, **kwargs) -> httpx.Response:
+        merged = httpx.Headers(self.headers)
+        if headers:
+            merged.update(headers)
+        return await get_pool().request(method, url, headers=merged, **kwargs)
+
+    async def aclose(self) -> None:
+        # The pool outlives individual clients, see close_database()
+        pass
+
+
+class DatabaseClient(AsyncPostgrestClient):
+    """Async PostgREST client backed by the shared connection pool.
+
+    Query builders are the same as the sync supabase client's, but
+    `.execute()` must be awaited.
+    """
+
+    def __init__(self, api_key: str, access_token: Optional[str] = None):
+        self.session = _PooledSession({
+            "apikey": api_key,
+            "Authorization": f"Bearer {access_token or api_key}",
+        })
+
+    def rpc(self, func: str, params: dict) -> AsyncFilterRequestBuilder:
+        """Call a database function: `await db.rpc(name, params).execute()`.
+
+        AsyncPostgrestClient.rpc is itself a coroutine, which breaks the
+        builder chain; build the request directly instead.
+        """
+        return AsyncFilterRequestBuilder(
+            self.session, f"/rpc/{func}", "POST", httpx.Headers(), httpx.QueryParams(), json=params
+        )
+
+    def auth(self, token, **kwargs):
+        # Mutating a process-wide client would leak one user's RLS context
+        # into other requests; build a scoped client instead.
+        raise RuntimeError("Use get_db_user_client() for user-authenticated queries")
+
+
+db_client = DatabaseClient(supabase_anon_key)
+db_admin_client = DatabaseClient(supabase_service_key) if supabase_service_key else None
+
+
+def get_db_client() -> DatabaseClient:
+    return db_client
+
+
+def get_db_admin_client() -> DatabaseClient:
+    if not db_admin_client:
+        raise ValueError("Supabase admin client not initialized")
+    return db_admin_client
+
+
+def get_db_user_client(access_token: str) -> DatabaseClient:
+    """Request-scoped client that runs queries under the user's RLS context.
+
+    It only carries its own headers and shares the connection pool, so
+    creating one per request is cheap.
+    """
+    return DatabaseClient(supabase_anon_key, access_token=access_token)
@@ -0,0 +1,165 @@
+import os
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+from .database import get_db_admin_client
+from ..utils.cursor import encode_cursor, decode_cursor, keyset_position
+
+logger = logging.getLogger(__name__)
+
+# Topics with at least this many preference points count as "preferred"
+FEED_MIN_POINTS = 50
+# Recommendations use the preference score instead of points
+RECOMMENDATION_MIN_SCORE = 0.3
+
+FEED_PHASES = ("preferred", "general")
+
+# Per-user candidate queue (see refill_feed_queue / pop_feed_queue)
+FEED_QUEUE_SIZE = int(os.getenv("FEED_QUEUE_SIZE", "200"))
+FEED_QUEUE_LOW_WATERMARK = int(os.getenv("FEED_QUEUE_LOW_WATERMARK", "50"))
+QUEUE_CURSOR = encode_cursor("queue")
+
+# Users with a refill already running in this process
+_refills_in_flight: Set[str] = set()
+
+
+def _feed_position(cursor: Optional[str]) -> Tuple[str, Optional[str], Optional[str]]:
+    """Phase and keyset position held by a feed cursor; raises ValueError for a bad one"""
+    if not cursor:
+        return "preferred", None, None
+    phase, after_created_at, after_id = decode_cursor(cursor, 3)
+    if phase not in FEED_PHASES:
+        raise ValueError("Invalid cursor")
+    return (phase, *keyset_position(after_created_at, after_id))
+
+
+async def fetch_feed_page(
+    user_id: str,
+    limit: int,
+    cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Fetch one page of unseen content for the user in a single round-trip.
+
+    Preferred-topic content is served first, then general content the user
+    has not seen yet. Returns the page and the cursor for the next one, or
+    None when the feed is exhausted. Raises ValueError for a bad cursor.
+    """
+    phase, after_created_at, after_id = _feed_position(cursor)
+
+    db = get_db_admin_client()
+    response = await db.rpc("get_personalized_feed", {
+        "p_user_id": user_id,
+        "p_limit": limit,
+        "p_phase": phase,
+        "p_after_created_at": after_created_at,
+        "p_after_id": after_id,
+        "p_min_points": FEED_MIN_POINTS,
+    }).execute()
+
+    rows = list(response.data or [])
+    next_cursor = None
+    if len(rows) >= limit:
+        last = rows[-1]
+        next_cursor = encode_cursor(last["phase"], last["created_at"], last["id"])
+    return rows, next_cursor
+
+
+async def pop_feed_queue(user_id: str, limit: int) -> Tuple[List[Dict[str, Any]], int]:
+    """Pop the next queued candidates; returns them and how many are left"""
+    db = get_db_admin_client()
+    response = await db.rpc("pop_feed_queue", {
+        "p_user_id": user_id,
+        "p_limit": limit,
+    }).execute()
+
+    rows = list(response.data or [])
+    remaining = rows[0]["queue_remaining"] if rows else 0
+    return rows, remaining
+
+
+async def mark_feed_served(user_id: str, content_ids: List[str]) -> None:
+    """Record items served outside the queue so neither the queue nor the
+    computed feed hands them out again"""
+    if not content_ids:
+        return
+    db = get_db_admin_client()
+    await db.rpc("mark_feed_served", {
+        "p_user_id": user_id,
+        "p_content_ids": content_ids,
+    }).execute()
+
+
+async def refill_feed_queue(user_id: str, reset: bool = False) -> None:
+    """Top the user's candidate queue up to FEED_QUEUE_SIZE.
+
+    Meant to run as a background task; failures are logged, the feed falls
+    back to computing pages directly while the queue is empty.
+    """
+    if user_id in _refills_in_flight and not reset:
+        return
+    _refills_in_flight.add(user_id)
+    try:
+        db = get_db_admin_client()
+        response = await db.rpc("refill_feed_queue", {
+            "p_user_id": user_id,
+            "p_target_size": FEED_QUEUE_SIZE,
+            "p_min_points": FEED_MIN_POINTS,
+            "p_reset": reset,
+        }).execute()
+        logger.info(f"Refilled feed queue for user {user_id}: {response.data[0]['queued']} item(s) queued")
+    except Exception as e:
+        logger.error(f"Error refilling feed queue for user {user_id}: {str(e)}")
+    finally:
+        _refills_in_flight.discard(user_id)
+
+
+async def next_feed_page(
+    user_id: str,
+    limit: int,
+    cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str], bool]:
+    """Next page of the user's feed.
+
+    Pages come from the precomputed queue whenever it has items. While it is
+    cold or drained, pages are computed with keyset pagination (continuing
+    from a keyset cursor) and recorded as served, and the queue takes over
+    again once a refill has stocked it. Returns the page, the next cursor and
+    whether the queue needs a refill. Raises ValueError for a bad cursor.
+    """
+    if cursor == QUEUE_CURSOR:
+        cursor = None
+    # Before popping, so a bad cursor does not cost the user queued items
+    _feed_position(cursor)
+
+    rows, remaining = await pop_feed_queue(user_id, limit)
+    if rows:
+        return rows, QUEUE_CURSOR, remaining < FEED_QUEUE_LOW_WATERMARK
+
+    logger.info(f"Feed queue empty for user {user_id}, computing page directly")
+    rows, next_cursor = await fetch_feed_page(user_id, limit, cursor)
+    await mark_feed_served(user_id, [row["id"] for row in rows])
+    return rows, next_cursor, True
+
+async def fetch_recommendations_page(
+    user_id: str,
+    limit: int,
+    cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Newest content in the user's preferred topics, one keyset page at a time"""
+    before_created_at, before_id = None, None
+    if cursor:
+        before_created_at, before_id = keyset_position(*decode_cursor(cursor, 2))
+
+    db = get_db_admin_client()
+    response = await db.rpc("get_recommended_contents", {
+        "p_user_id": user_id,
+        "p_limit": limit,
+        "p_before_created_at": before_created_at,
+        "p_before_id": before_id,
+        "p_min_score": RECOMMENDATION_MIN_SCORE,
+    }).execute()
+
+    rows = list(response.data or [])
+    next_cursor = None
+    if len(rows) >= limit:
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return rows, next_cursor
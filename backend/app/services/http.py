@@ -0,0 +1,95 @@
+import os
+import random
+import asyncio
+import logging
+from typing import Any, Optional
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Outbound (third-party API) connection pool configuration
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))  # seconds
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))  # seconds per request
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_HTTP2 = os.getenv("HTTP_HTTP2", "true").lower() == "true"
+
+# Retries for rate-limited (429) and failing (5xx) upstream responses
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.25"))  # seconds
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "4"))
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """The application's shared outbound client, created on first use"""
+    global _client
+    if _client is None or _client.is_closed:
+        logger.info(f"Creating outbound HTTP client: max_connections={HTTP_MAX_CONNECTIONS}, http2={HTTP_HTTP2}")
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            http2=HTTP_HTTP2,
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _backoff(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    """Full-jitter exponential backoff, honouring a numeric Retry-After"""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), HTTP_BACKOFF_MAX)
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** attempt))
+
+
+async def request_with_retry(
+    method: str,
+    url: str,
+    *,
+    retries: int = HTTP_RETRIES,
+    concurrency: Optional[asyncio.Semaphore] = None,
+    **kwargs: Any
+) -> httpx.Response:
+    """Send a request on the shared client, retrying 429/5xx and transport errors.
+
+    Keyword arguments go to httpx.AsyncClient.request (json, headers,
+    timeout, ...). The last response is returned even if it is an error;
+    the last transport error is raised. If `concurrency` is given, each
+    attempt holds one of its slots, but backoff waits do not.
+    """
+    client = get_http_client()
+    attempt = 0
+    while True:
+        try:
+            if concurrency is not None:
+                async with concurrency:
+                    response = await client.request(method, url, **kwargs)
+            else:
+                response = await client.request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            if attempt >= retries:
+                raise
+            delay = _backoff(attempt)
+            logger.warning(f"{method} {url} failed ({type(e).__name__}), retrying in {delay:.2f}s")
+        else:
+            if response.status_code not in RETRY_STATUS_CODES or attempt >= retries:
+                return response
+            delay = _backoff(attempt, response)
+            logger.warning(f"{method} {url} returned {response.status_code}, retrying in {delay:.2f}s")
+        attempt += 1
+        await asyncio.sleep(delay)
@@ -0,0 +1,246 @@
+import os
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+from postgrest.exceptions import APIError
+from .database import get_db_admin_client
+from .badges import award_badges, interaction_counters
+from ..utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Engagement events may be recorded up to 3 times per content, everything else once
+ENGAGEMENT_TYPES = {"view", "skip", "partial", "interested", "engaged"}
+ENGAGEMENT_LIMIT = 3
+
+# Write-behind buffer configuration
+INGEST_FLUSH_INTERVAL = float(os.getenv("INTERACTIONS_FLUSH_INTERVAL_MS", "250")) / 1000
+INGEST_BATCH_SIZE = int(os.getenv("INTERACTIONS_BATCH_SIZE", "500"))
+INGEST_QUEUE_SIZE = int(os.getenv("INTERACTIONS_QUEUE_SIZE", "10000"))
+# Failed flushes are retried this many times, backing off from INGEST_RETRY_BACKOFF
+INGEST_RETRIES = int(os.getenv("INTERACTIONS_FLUSH_RETRIES", "3"))
+INGEST_RETRY_BACKOFF = float(os.getenv("INTERACTIONS_RETRY_BACKOFF_MS", "200")) / 1000
+
+InteractionKey = Tuple[str, str, str]
+
+# Per-event outcomes reported by ingest_interactions()
+RECORDED = "recorded"
+# The key already holds occurrence_limit rows
+CAPPED = "capped"
+# The slot was taken by a writer outside ingest_interactions()
+CONFLICT = "conflict"
+
+# Queued by stop() to tell the flusher to finish its batch and exit
+_STOP: Any = object()
+
+
+def is_rejected(error: Exception) -> bool:
+    """Whether the database refused the statement because of the data in it
+    (SQLSTATE class 22, data exception, or 23, integrity constraint)"""
+    return isinstance(error, APIError) and str(error.code or "")[:2] in ("22", "23")
+
+
+def occurrence_limit(interaction_type: str) -> int:
+    return ENGAGEMENT_LIMIT if interaction_type in ENGAGEMENT_TYPES else 1
+
+
+def interaction_event(user_id: str, content_id: str, interaction_type: str, interaction_value: int) -> Dict[str, Any]:
+    return {
+        "user_id": user_id,
+        "content_id": content_id,
+        "interaction_type": interaction_type,
+        "interaction_value": interaction_value
+    }
+
+
+async def write_interactions(events: List[Dict[str, Any]]) -> List[str]:
+    """Insert events in one statement; returns per event its status.
+
+    RECORDED if it was written, CAPPED if its key already reached its type's
+    cap (see occurrence_limit), CONFLICT if the slot was taken by a writer
+    outside ingest_interactions().
+    """
+    if not events:
+        return []
+    db = get_db_admin_client()
+    response = await db.rpc("ingest_interactions", {"p_events": events}).execute()
+    statuses = [CONFLICT] * len(events)
+    for row in response.data or []:
+        statuses[row["event_index"]] = row["status"]
+    return statuses
+
+
+async def write_interactions_isolating(events: List[Dict[str, Any]]) -> List[Optional[str]]:
+    """Write the events, splitting the batch around ones the database rejects.
+
+    Returns per event its status, or None if it was lost.
+    """
+    try:
+        return await write_interactions(events)
+    except Exception as e:
+        if not is_rejected(e):
+            # Not the data's fault (e.g. the database is unreachable), splitting won't help
+            logger.error(f"Error writing {len(events)} interaction(s), dropping them: {str(e)}")
+            return [None] * len(events)
+        if len(events) == 1:
+            logger.error(f"Dropping rejected interaction {events[0]}: {str(e)}")
+            return [None]
+    middle = len(events) // 2
+    return await write_interactions_isolating(events[:middle]) + await write_interactions_isolating(events[middle:])
+
+
+async def award_interaction_badges(events: List[Dict[str, Any]], recorded: List[bool]) -> None:
+    """Evaluate the badge rules affected by the recorded events, in one round-trip"""
+    changes: Dict[str, Set[str]] = {}
+    for event, was_recorded in zip(events, recorded):
+        if was_recorded:
+            changes.setdefault(event["user_id"], set()).update(interaction_counters(event["interaction_type"]))
+    if not changes:
+        return
+    try:
+        await award_badges(changes)
+    except Exception as e:
+        logger.error(f"Error awarding badges for {len(changes)} user(s): {str(e)}")
+
+
+class InteractionIngestor:
+    """Write-behind buffer for interaction events.
+
+    Requests enqueue events and return immediately; a background task flushes
+    them as one multi-row insert every INGEST_FLUSH_INTERVAL seconds or
+    INGEST_BATCH_SIZE events, whichever comes first. Events already known to
+    be over their cap are dropped in memory before they reach the database.
+
+    A failed flush is retried with backoff. If the database keeps rejecting
+    the statement, the batch is split in halves until the offending events
+    are isolated, so one bad event cannot discard everyone else's.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = INGEST_FLUSH_INTERVAL,
+        batch_size: int = INGEST_BATCH_SIZE,
+        max_queue_size: int = INGEST_QUEUE_SIZE,
+    ):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue: "asyncio.Queue[Any]" = asyncio.Queue(maxsize=max_queue_size)
+        # Recorded counts per (user, content, type) seen by this process
+        self._recorded = TTLCache(max_size=100_000, ttl=3600)
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher and write out everything still buffered"""
+        if self._task is not None and not self._task.done():
+            await self._queue.put(_STOP)
+            await self._task
+        self._task = None
+        # Events submitted after the stop signal
+        while not self._queue.empty():
+            batch = [event for event in self._drain(self.batch_size) if event is not _STOP]
+            await self._flush(batch)
+
+    def submit(self, event: Dict[str, Any]) -> bool:
+        """Buffer an event; returns False if the buffer is full"""
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def _drain(self, limit: int) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            event = await self._queue.get()
+            if event is _STOP:
+                break
+            batch = [event]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if event is _STOP:
+                    stopping = True
+                    break
+                batch.append(event)
+            await self._flush(batch)
+
+    def _dedupe(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        counts: Dict[InteractionKey, int] = {}
+        events = []
+        for event in batch:
+            key = (event["user_id"], event["content_id"], event["interaction_type"])
+            count = counts.get(key)
+            if count is None:
+                count = self._recorded.get(key, 0)
+            if count >= occurrence_limit(event["interaction_type"]):
+                continue
+            counts[key] = count + 1
+            events.append(event)
+        return events
+
+    async def _write_with_retry(self, events: List[Dict[str, Any]]) -> List[str]:
+        attempt = 0
+        while True:
+            try:
+                return await write_interactions(events)
+            except Exception as e:
+                # Rejected data fails the same way every time
+                if attempt >= INGEST_RETRIES or is_rejected(e):
+                    raise
+                delay = INGEST_RETRY_BACKOFF * 2 ** attempt
+                logger.warning(f"Error flushing {len(events)} interaction(s), retrying in {delay:.2f}s: {str(e)}")
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        events = self._dedupe(batch)
+        if not events:
+            return
+        try:
+            statuses: List[Optional[str]] = await self._write_with_retry(events)
+        except Exception as e:
+            if not is_rejected(e):
+                logger.error(f"Error flushing {len(events)} interaction(s), dropping them: {str(e)}")
+                return
+            logger.error(f"Database rejected a batch of {len(events)} interaction(s), isolating bad events: {str(e)}")
+            statuses = await write_interactions_isolating(events)
+
+        for event, status in zip(events, statuses):
+            key = (event["user_id"], event["content_id"], event["interaction_type"])
+            if status == RECORDED:
+                self._recorded.set(key, self._recorded.get(key, 0) + 1)
+            elif status == CAPPED:
+                # The database counted occurrence_limit rows for this key, remember that
+                self._recorded.set(key, occurrence_limit(event["interaction_type"]))
+        recorded = [status == RECORDED for status in statuses]
+        conflict_count = sum(1 for status in statuses if status == CONFLICT)
+        dropped_count = sum(1 for status in statuses if status is None)
+        logger.info(
+            f"Flushed {sum(recorded)}/{len(batch)} interaction(s) "
+            f"({len(batch) - len(events)} deduped in memory, {conflict_count} conflicting, {dropped_count} dropped)"
+        )
+        await award_interaction_badges(events, recorded)
+
+
+interaction_ingestor = InteractionIngestor()
+
+
+def get_interaction_ingestor() -> InteractionIngestor:
+    return interaction_ingestor
@@ -0,0 +1,135 @@
+import asyncio
+import os
+import time
+import logging
+from typing import Any, Dict, Optional
+import httpx
+import jwt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# JWT verification configuration
+supabase_url = os.getenv("SUPABASE_URL")
+supabase_jwt_secret = os.getenv("SUPABASE_JWT_SECRET")
+JWKS_REFRESH_INTERVAL = int(os.getenv("SUPABASE_JWKS_REFRESH_INTERVAL", "600"))  # seconds
+JWKS_MIN_REFETCH_INTERVAL = 30  # don't refetch more often than this on unknown key ids
+JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+JWT_LEEWAY = 10  # seconds of clock skew tolerated on exp/iat
+
+ASYMMETRIC_ALGORITHMS = {"RS256", "ES256", "EdDSA"}
+
+
+class TokenVerificationError(Exception):
+    """The token is malformed, expired or its signature does not match"""
+
+
+class SigningKeyUnavailable(Exception):
+    """The key needed to verify the token locally could not be obtained"""
+
+
+class JWTVerifier:
+    """Verifies Supabase access tokens locally.
+
+    Legacy projects sign tokens with the shared HS256 JWT secret, newer ones
+    with asymmetric keys published at the project's JWKS endpoint. JWKS keys
+    are cached and refetched periodically, or early when a token references a
+    key id we have not seen yet (key rotation).
+    """
+
+    def __init__(
+        self,
+        jwks_url: Optional[str],
+        secret: Optional[str] = None,
+        audience: str = JWT_AUDIENCE,
+        refresh_interval: int = JWKS_REFRESH_INTERVAL,
+    ):
+        self.jwks_url = jwks_url
+        self.secret = secret
+        self.audience = audience
+        self.refresh_interval = refresh_interval
+        self._keys: Dict[str, Any] = {}
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def decode(self, token: str) -> Dict[str, Any]:
+        """Verify the token signature and expiry and return its claims"""
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.PyJWTError as e:
+            raise TokenVerificationError(str(e)) from e
+
+        algorithm = header.get("alg")
+        if algorithm == "HS256":
+            if not self.secret:
+                raise SigningKeyUnavailable("SUPABASE_JWT_SECRET is not configured")
+            key = self.secret
+        elif algorithm in ASYMMETRIC_ALGORITHMS:
+            key = await self._get_signing_key(header.get("kid"))
+        else:
+            raise TokenVerificationError(f"Unsupported token algorithm: {algorithm}")
+
+        try:
+            return jwt.decode(
+                token,
+                key,
+                algorithms=[algorithm],
+                audience=self.audience,
+                leeway=JWT_LEEWAY,
+                options={"require": ["exp", "sub"]},
+            )
+        except jwt.PyJWTError as e:
+            raise TokenVerificationError(str(e)) from e
+
+    async def _get_signing_key(self, kid: Optional[str]) -> Any:
+        if not self.jwks_url:
+            raise SigningKeyUnavailable("No JWKS endpoint configured")
+
+        age = time.monotonic() - self._fetched_at
+        if kid in self._keys and age < self.refresh_interval:
+            return self._keys[kid]
+
+        async with self._lock:
+            # Another request may have refreshed the keys while we waited
+            age = time.monotonic() - self._fetched_at
+            stale = age >= self.refresh_interval
+            unknown_kid = kid not in self._keys and age >= JWKS_MIN_REFETCH_INTERVAL
+            if stale or unknown_kid:
+                await self._refresh_keys()
+
+        if kid not in self._keys:
+            raise SigningKeyUnavailable(f"Unknown signing key id: {kid}")
+        return self._keys[kid]
+
+    async def _refresh_keys(self) -> None:
+        try:
+            async with httpx.AsyncClient(timeout=5.0) as client:
+                response = await client.get(self.jwks_url)
+                response.raise_for_status()
+                jwks = response.json()
+        except Exception as e:
+            # Keep serving the keys we already have; the next call retries
+            logger.error(f"Error fetching JWKS from {self.jwks_url}: {str(e)}")
+            self._fetched_at = time.monotonic() - self.refresh_interval + JWKS_MIN_REFETCH_INTERVAL
+            return
+
+        keys = {}
+        for jwk in jwks.get("keys", []):
+            try:
+                keys[jwk.get("kid")] = jwt.PyJWK(jwk, jwk.get("alg")).key
+            except jwt.PyJWTError as e:
+                logger.warning(f"Skipping unusable JWKS key {jwk.get('kid')}: {str(e)}")
+
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+        logger.info(f"Loaded {len(keys)} JWT signing key(s) from JWKS")
+
+
+jwks_url = f"{supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json" if supabase_url else None
+jwt_verifier = JWTVerifier(jwks_url=jwks_url, secret=supabase_jwt_secret)
+
+
+def get_jwt_verifier() -> JWTVerifier:
+    return jwt_verifier
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Set
+from .database import DatabaseClient, get_db_admin_client
+
+logger = logging.getLogger(__name__)
+
+
+class SlideLoader:
+    """DataLoader-style batching for carousel slides.
+
+    Every `load()` issued in the same event-loop tick is collected and
+    resolved with a single `in_("content_id", ...)` query, and results are
+    cached for the lifetime of the loader. Create one per request (see
+    `get_slide_loader`) so the cache never serves stale slides.
+    """
+
+    def __init__(self, db: Optional[DatabaseClient] = None):
+        self._db = db
+        self._cache: Dict[str, "asyncio.Future[List[Dict[str, Any]]]"] = {}
+        self._pending: List[str] = []
+        self._tasks: Set["asyncio.Task[None]"] = set()
+
+    def load(self, content_id: str) -> "asyncio.Future[List[Dict[str, Any]]]":
+        """Slides for one content piece, ordered by slide_index"""
+        future = self._cache.get(content_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._cache[content_id] = future
+            if not self._pending:
+                loop.call_soon(self._schedule_dispatch)
+            self._pending.append(content_id)
+        return future
+
+    async def load_many(self, content_ids: Iterable[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Slides for several content pieces, keyed by content_id"""
+        content_ids = list(dict.fromkeys(content_ids))
+        results = await asyncio.gather(*(self.load(content_id) for content_id in content_ids))
+        return dict(zip(content_ids, results))
+
+    def _schedule_dispatch(self) -> None:
+        # Keep a reference so the batch task isn't garbage collected mid-flight
+        task = asyncio.ensure_future(self._dispatch())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self) -> None:
+        batch, self._pending = self._pending, []
+        try:
+            # Admin client bypasses RLS for carousel slides
+            db = self._db or get_db_admin_client()
+            response = await db.table("carousel_slides").select(
+                "content_id, id, image_url, slide_index"
+            ).in_("content_id", batch).order("slide_index").execute()
+        except Exception as e:
+            for content_id in batch:
+                # Drop failed keys so a later load can retry them
+                future = self._cache.pop(content_id)
+                # Its awaiting request may have been cancelled meanwhile
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # Group slides by content_id
+        slides_map: Dict[str, List[Dict[str, Any]]] = {content_id: [] for content_id in batch}
+        for slide in response.data or []:
+            slides_map.setdefault(slide["content_id"], []).append({
+                "id": slide["id"],
+                "image_url": slide["image_url"],
+                "slide_index": slide["slide_index"]
+            })
+        logger.info(f"🎠 Loaded slides for {len(batch)} carousel(s) in one query")
+
+        for content_id in batch:
+            future = self._cache[content_id]
+            if not future.done():
+                future.set_result(slides_map[content_id])
+
+
+def get_slide_loader() -> SlideLoader:
+    """FastAPI dependency: one loader (and cache) per request"""
+    return SlideLoader()
@@ -0,0 +1,26 @@
+import logging
+from typing import Any, Dict, List
+from .database import get_db_admin_client
+
+logger = logging.getLogger(__name__)
+
+
+async def replace_topic_preferences(
+    user_id: str,
+    preferences: List[Dict[str, Any]],
+    complete_onboarding: bool = True
+) -> Dict[str, Any]:
+    """Replace all of the user's topic preferences in one transactional round-trip.
+
+    `preferences` is a list of {"topic_id", "points"}. Also marks onboarding
+    as complete unless told otherwise. Returns the
+    replace_topic_preferences() row: preferences_saved and
+    onboarding_completed (False when the user has no profile).
+    """
+    db = get_db_admin_client()
+    response = await db.rpc("replace_topic_preferences", {
+        "p_user_id": user_id,
+        "p_preferences": preferences,
+        "p_complete_onboarding": complete_onboarding,
+    }).execute()
+    return response.data[0]
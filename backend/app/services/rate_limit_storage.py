@@ -0,0 +1,209 @@
+import os
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+from .database import get_db_admin_client
+
+logger = logging.getLogger(__name__)
+
+# "memory" (per process), "postgres" or "redis" (shared by every worker)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+# (key, limit) pairs checked together by one acquire() call
+KeyLimits = Sequence[Tuple[str, int]]
+
+
+def window_position(now: float, time_window: int) -> Tuple[int, float]:
+    """The fixed window `now` falls in and how much of the previous one still
+    overlaps the trailing time_window (1.0 at the window start, 0.0 at its end)"""
+    window = int(now // time_window)
+    overlap = ((window + 1) * time_window - now) / time_window
+    return window, overlap
+
+
+class RateLimitStorage(ABC):
+    """Where sliding-window counters live.
+
+    Each key has a count per fixed window of time_window seconds; usage over
+    the trailing window is estimated as previous * overlap + current.
+    """
+
+    @abstractmethod
+    async def acquire(self, limits: KeyLimits, time_window: int, cost: int, now: float) -> Tuple[bool, List[float]]:
+        """Atomically add `cost` to every key, unless that would take one over its limit.
+
+        Returns whether the request was allowed and each key's estimated
+        usage before it.
+        """
+
+    async def close(self) -> None:
+        pass
+
+
+class _WindowCounter:
+    """Request counts for the current and previous fixed window of one key"""
+
+    __slots__ = ("window", "current", "previous", "expires")
+
+    def __init__(self, window: int, time_window: int):
+        self.window = window
+        self.current = 0
+        self.previous = 0
+        self.expires = (window + 2) * time_window
+
+    def roll(self, window: int, time_window: int) -> None:
+        if window == self.window:
+            return
+        self.previous = self.current if window == self.window + 1 else 0
+        self.current = 0
+        self.window = window
+        self.expires = (window + 2) * time_window
+
+
+class MemoryRateLimitStorage(RateLimitStorage):
+    """Per-process counters with bounded memory.
+
+    A few numbers per key in a __slots__ object. At most max_keys keys are
+    tracked; the least recently seen are evicted first and keys idle for two
+    of their own windows (whose counts no longer matter) are dropped as they
+    reach the old end of the LRU order. Limiters with different time windows
+    can share one storage. Limits are per worker process.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._counters: "OrderedDict[str, _WindowCounter]" = OrderedDict()
+
+    def _counter(self, key: str, window: int, time_window: int, now: float) -> _WindowCounter:
+        counters = self._counters
+        counter = counters.get(key)
+        if counter is None:
+            counter = counters[key] = _WindowCounter(window, time_window)
+            if len(counters) > self.max_keys:
+                counters.popitem(last=False)
+        else:
+            counters.move_to_end(key)
+            counter.roll(window, time_window)
+
+        # Drop one idle key per call from the old end of the LRU order
+        oldest_key = next(iter(counters))
+        if counters[oldest_key].expires <= now:
+            del counters[oldest_key]
+        return counter
+
+    async def acquire(self, limits: KeyLimits, time_window: int, cost: int, now: float) -> Tuple[bool, List[float]]:
+        window, overlap = window_position(now, time_window)
+        counters = [self._counter(key, window, time_window, now) for key, _ in limits]
+        used = [counter.previous * overlap + counter.current for counter in counters]
+        allowed = all(usage + cost <= limit for usage, (_, limit) in zip(used, limits))
+        if allowed:
+            for counter in counters:
+                counter.current += cost
+        return allowed, used
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+
+class PostgresRateLimitStorage(RateLimitStorage):
+    """Counters in the rate_limit_counters table, shared by every worker.
+
+    One rate_limit_acquire() call per check; the function locks the keys'
+    rows so concurrent workers cannot both take the last slot.
+    """
+
+    async def acquire(self, limits: KeyLimits, time_window: int, cost: int, now: float) -> Tuple[bool, List[float]]:
+        db = get_db_admin_client()
+        response = await db.rpc("rate_limit_acquire", {
+            "p_keys": [key for key, _ in limits],
+            "p_limits": [limit for _, limit in limits],
+            "p_time_window": time_window,
+            "p_cost": cost,
+            "p_now": now,
+        }).execute()
+        row = response.data[0]
+        return row["allowed"], [float(usage) for usage in row["used"]]
+
+
+# Checks every key's estimate and only then increments, so a refused request
+# is not counted. KEYS are (current window, previous window) pairs per key;
+# ARGV is overlap, cost, expiry, then one limit per key.
+_REDIS_ACQUIRE_SCRIPT = """
+local overlap = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local expiry = tonumber(ARGV[3])
+local used = {}
+local allowed = 1
+for i = 1, #KEYS / 2 do
+    local current = tonumber(redis.call('GET', KEYS[2 * i - 1]) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[2 * i]) or '0')
+    local usage = previous * overlap + current
+    used[i] = tostring(usage)
+    if usage + cost > tonumber(ARGV[3 + i]) then
+        allowed = 0
+    end
+end
+if allowed == 1 then
+    for i = 1, #KEYS / 2 do
+        redis.call('INCRBY', KEYS[2 * i - 1], cost)
+        redis.call('EXPIRE', KEYS[2 * i - 1], expiry)
+    end
+end
+return {allowed, used}
+"""
+
+
+class RedisRateLimitStorage(RateLimitStorage):
+    """Counters in Redis (or any server speaking its protocol), shared by every worker.
+
+    One EVALSHA per check; counters expire after two windows. Requires the
+    optional `redis` package.
+    """
+
+    def __init__(self, url: str = RATE_LIMIT_REDIS_URL):
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package") from e
+        self._redis = redis_asyncio.from_url(url)
+        self._script = self._redis.register_script(_REDIS_ACQUIRE_SCRIPT)
+
+    async def acquire(self, limits: KeyLimits, time_window: int, cost: int, now: float) -> Tuple[bool, List[float]]:
+        window, overlap = window_position(now, time_window)
+        keys = []
+        for key, _ in limits:
+            keys.append(f"ratelimit:{key}:{window}")
+            keys.append(f"ratelimit:{key}:{window - 1}")
+        args = [overlap, cost, time_window * 2] + [limit for _, limit in limits]
+        allowed, used = await self._script(keys=keys, args=args)
+        return bool(allowed), [float(usage) for usage in used]
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+_storage: Optional[RateLimitStorage] = None
+
+
+def get_rate_limit_storage() -> RateLimitStorage:
+    """Storage selected by RATE_LIMIT_BACKEND, created on first use"""
+    global _storage
+    if _storage is None:
+        if RATE_LIMIT_BACKEND == "postgres":
+            _storage = PostgresRateLimitStorage()
+        elif RATE_LIMIT_BACKEND == "redis":
+            _storage = RedisRateLimitStorage()
+        else:
+            _storage = MemoryRateLimitStorage()
+        logger.info(f"Rate limit storage: {type(_storage).__name__}")
+    return _storage
+
+
+async def close_rate_limit_storage() -> None:
+    global _storage
+    if _storage is not None:
+        await _storage.close()
+        _storage = None
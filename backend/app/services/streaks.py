@@ -0,0 +1,48 @@
+import logging
+from typing import Any, Dict
+from postgrest.exceptions import APIError
+from .database import get_db_admin_client
+from .badges import badge_checks
+from .coins import ProfileNotFoundError
+
+logger = logging.getLogger(__name__)
+
+# Unique content pieces a user must consume in a UTC day to earn the streak
+DAILY_STREAK_THRESHOLD = 4
+# Every this many streak days the user earns STREAK_MILESTONE_COINS
+STREAK_MILESTONE_DAYS = 7
+STREAK_MILESTONE_COINS = 100
+
+
+async def credit_daily_streak(user_id: str) -> Dict[str, Any]:
+    """Credit today's streak in one transactional round-trip.
+
+    Returns the update_daily_streak() row: status is 'credited',
+    'already_credited' or 'threshold_not_met'. Retries on the same day
+    never credit twice. Raises ProfileNotFoundError without a profile.
+    """
+    db = get_db_admin_client()
+    try:
+        response = await db.rpc("update_daily_streak", {
+            "p_user_id": user_id,
+            "p_threshold": DAILY_STREAK_THRESHOLD,
+            "p_milestone_every": STREAK_MILESTONE_DAYS,
+            "p_milestone_coins": STREAK_MILESTONE_COINS,
+            "p_badge_checks": badge_checks(user_id, {"streak_days", "coins_earned"}),
+        }).execute()
+    except APIError as e:
+        if e.message == "profile_not_found":
+            raise ProfileNotFoundError() from e
+        raise
+    return response.data[0]
+
+
+async def read_daily_progress(user_id: str) -> Dict[str, Any]:
+    """Today's (UTC) distinct content count and the user's streak state.
+
+    The count is maintained per day on interaction insert, so this is a
+    single-row read no matter how many interactions the user has today.
+    """
+    db = get_db_admin_client()
+    response = await db.rpc("get_daily_progress", {"p_user_id": user_id}).execute()
+    return response.data[0]
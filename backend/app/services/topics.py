@@ -0,0 +1,99 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from .database import get_db_admin_client
+
+logger = logging.getLogger(__name__)
+
+# How often to ask the database whether topics changed (get_topics_version)
+TOPICS_VERSION_CHECK_INTERVAL = int(os.getenv("TOPICS_VERSION_CHECK_INTERVAL", "60"))  # seconds
+
+
+class TopicsCatalogue:
+    """In-process copy of the topics table.
+
+    Loaded once (at startup, or by the first request) and served from
+    memory. Every TOPICS_VERSION_CHECK_INTERVAL seconds a request triggers a
+    background check of get_topics_version() and the table is reloaded only
+    if it changed; admin writes call reload() to apply edits immediately.
+    """
+
+    def __init__(self, check_interval: float = TOPICS_VERSION_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._topics: Optional[List[Dict[str, Any]]] = None
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._etag: Optional[str] = None
+        self._version: Optional[str] = None
+        self._checked_at = 0.0
+        self._load_task: "Optional[asyncio.Task[None]]" = None
+        self._check_task: "Optional[asyncio.Task[None]]" = None
+
+    async def _load(self) -> None:
+        db = get_db_admin_client()
+        version_response = await db.rpc("get_topics_version", {}).execute()
+        response = await db.table("topics").select("*").order("name").execute()
+        topics = response.data or []
+        digest = hashlib.sha256(json.dumps(topics, sort_keys=True, default=str).encode()).hexdigest()
+        self._topics = topics
+        self._by_id = {str(topic["id"]): topic for topic in topics}
+        self._etag = f'"{digest[:32]}"'
+        self._version = version_response.data[0]["version"]
+        self._checked_at = time.monotonic()
+        logger.info(f"Loaded topics catalogue ({len(topics)} topics)")
+
+    def _start_load(self) -> "asyncio.Task[None]":
+        if self._load_task is None or self._load_task.done():
+            self._load_task = asyncio.create_task(self._load())
+
+            def _done(task: "asyncio.Task[None]") -> None:
+                if not task.cancelled() and task.exception() is not None:
+                    logger.error(f"Error loading topics catalogue: {task.exception()}")
+
+            self._load_task.add_done_callback(_done)
+        return self._load_task
+
+    async def _check_version(self) -> None:
+        try:
+            db = get_db_admin_client()
+            response = await db.rpc("get_topics_version", {}).execute()
+            if response.data[0]["version"] != self._version:
+                logger.info("Topics changed, reloading catalogue")
+                self._start_load()
+        except Exception as e:
+            logger.error(f"Error checking topics version: {str(e)}")
+
+    async def reload(self) -> None:
+        """Reload now, e.g. after an admin edited topics"""
+        # A load already in flight may have read the table before the edit
+        if self._load_task is not None and not self._load_task.done():
+            await asyncio.shield(self._load_task)
+        await asyncio.shield(self._start_load())
+
+    async def _ensure_fresh(self) -> None:
+        if self._topics is None:
+            await asyncio.shield(self._start_load())
+        elif time.monotonic() - self._checked_at > self.check_interval:
+            # Serve what we have; at most one check per interval
+            self._checked_at = time.monotonic()
+            self._check_task = asyncio.create_task(self._check_version())
+
+    async def get(self) -> Tuple[List[Dict[str, Any]], str]:
+        """All topics and their ETag"""
+        await self._ensure_fresh()
+        return self._topics, self._etag
+
+    async def by_id(self) -> Dict[str, Dict[str, Any]]:
+        """Topics keyed by id"""
+        await self._ensure_fresh()
+        return self._by_id
+
+
+topics_catalogue = TopicsCatalogue()
+
+
+def get_topics_catalogue() -> TopicsCatalogue:
+    return topics_catalogue
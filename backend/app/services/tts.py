@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from .http import request_with_retry
+from .tts_cache import audio_cache_key, get_audio_cache
+
+logger = logging.getLogger(__name__)
+
+# ElevenLabs configuration
+ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
+ELEVENLABS_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID", "iCrDUkL56s3C8sCRl7wb")  # Default voice ID
+ELEVENLABS_BASE_URL = os.getenv("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io/v1")  # override to point at a local fake
+
+VOICE_SETTINGS = {
+    "stability": 0.5,
+    "similarity_boost": 0.75
+}
+
+# Chunk requests in flight per request, counting the one being waited on
+TTS_PREFETCH_CHUNKS = max(1, int(os.getenv("TTS_PREFETCH_CHUNKS", "3")))
+# Cached audio is streamed from disk in blocks of this size
+AUDIO_BLOCK_SIZE = 64 * 1024
+# Upstream synthesis requests in flight across the whole process (retry waits excluded)
+TTS_MAX_CONCURRENCY = int(os.getenv("TTS_MAX_CONCURRENCY", "8"))
+
+# Voices list: fresh for VOICES_CACHE_TTL seconds, then served stale while a
+# background refresh runs, up to VOICES_STALE_TTL seconds old
+VOICES_CACHE_TTL = int(os.getenv("TTS_VOICES_CACHE_TTL", "3600"))
+VOICES_STALE_TTL = int(os.getenv("TTS_VOICES_STALE_TTL", "86400"))
+
+_upstream_slots = asyncio.Semaphore(TTS_MAX_CONCURRENCY)
+
+
+class TTSProviderError(Exception):
+    """The TTS provider rejected a request"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(f"{status_code} - {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+async def synthesize_chunk(voice_id: str, text: str) -> bytes:
+    """MP3 audio for one chunk of text"""
+    response = await request_with_retry(
+        "POST",
+        f"{ELEVENLABS_BASE_URL}/text-to-speech/{voice_id}",
+        concurrency=_upstream_slots,
+        json={"text": text, "voice_settings": VOICE_SETTINGS},
+        headers={
+            "Accept": "audio/mpeg",
+            "Content-Type": "application/json",
+            "xi-api-key": ELEVENLABS_API_KEY
+        }
+    )
+    if response.status_code != 200:
+        raise TTSProviderError(response.status_code, response.text)
+    return response.content
+
+
+async def fetch_voices() -> Dict[str, Any]:
+    """The provider's voices list"""
+    response = await request_with_retry(
+        "GET",
+        f"{ELEVENLABS_BASE_URL}/voices",
+        headers={"xi-api-key": ELEVENLABS_API_KEY}
+    )
+    if response.status_code != 200:
+        raise TTSProviderError(response.status_code, response.text)
+    return response.json()
+
+
+class VoicesCatalogue:
+    """In-process cache of the provider's voices list with stale-while-revalidate.
+
+    Only the very first request (or one after VOICES_STALE_TTL without a
+    successful refresh) waits for the provider; concurrent refreshes are
+    collapsed into one.
+    """
+
+    def __init__(self, ttl: float = VOICES_CACHE_TTL, stale_ttl: float = VOICES_STALE_TTL):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._voices: Optional[Dict[str, Any]] = None
+        self._etag: Optional[str] = None
+        self._fetched_at = 0.0
+        self._refresh_task: "Optional[asyncio.Task[None]]" = None
+
+    async def _refresh(self) -> None:
+        voices = await fetch_voices()
+        digest = hashlib.sha256(json.dumps(voices, sort_keys=True).encode()).hexdigest()
+        self._voices = voices
+        self._etag = f'"{digest[:32]}"'
+        self._fetched_at = time.monotonic()
+        logger.info(f"Refreshed TTS voices catalogue ({len(voices.get('voices', []))} voices)")
+
+    def _start_refresh(self) -> "asyncio.Task[None]":
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+
+            def _done(task: "asyncio.Task[None]") -> None:
+                if not task.cancelled() and task.exception() is not None:
+                    logger.error(f"Error refreshing TTS voices: {task.exception()}")
+
+            self._refresh_task.add_done_callback(_done)
+        return self._refresh_task
+
+    async def get(self) -> Tuple[Dict[str, Any], str]:
+        """The voices list and its ETag"""
+        age = time.monotonic() - self._fetched_at
+        if self._voices is None or age > self.stale_ttl:
+            await asyncio.shield(self._start_refresh())
+        elif age > self.ttl:
+            self._start_refresh()
+        return self._voices, self._etag
+
+
+voices_catalogue = VoicesCatalogue()
+
+
+def get_voices_catalogue() -> VoicesCatalogue:
+    return voices_catalogue
+
+
+async def linked_chunk_audio(voice_id: str, text: str) -> str:
+    """Path of a private hard link to the cached MP3 for one chunk, synthesizing
+    it on a miss; the caller deletes it when done"""
+    key = audio_cache_key(text, voice_id, VOICE_SETTINGS)
+
+    return await get_audio_cache().get_or_create_link(key, lambda: synthesize_chunk(voice_id, text))
+
+
+async def stream_file(path: str) -> AsyncIterator[bytes]:
+    """Yield a private link's contents in AUDIO_BLOCK_SIZE blocks, deleting the
+    link once it is open (the open file keeps the audio readable)"""
+    f = await asyncio.to_thread(open, path, "rb")
+    try:
+        os.unlink(path)
+        while True:
+            block = await asyncio.to_thread(f.read, AUDIO_BLOCK_SIZE)
+            if not block:
+                break
+            yield block
+    finally:
+        f.close()
+
+
+def _discard_links(tasks: "List[asyncio.Task[str]]") -> None:
+    """Cancel prefetches and delete the links of those that already finished"""
+    for task in tasks:
+        if task.done() and not task.cancelled() and task.exception() is None:
+            try:
+                os.unlink(task.result())
+            except FileNotFoundError:
+                pass
+        else:
+            task.cancel()
+
+
+async def synthesize_speech(chunks: Iterable[str], voice_id: str) -> AsyncIterator[bytes]:
+    """Yield the audio for each chunk, in order, as soon as it is ready.
+
+    Up to TTS_PREFETCH_CHUNKS chunks, counting the one being waited on, are
+    fetched concurrently (from the audio cache, or synthesized on a miss),
+    so time to first audio is about one chunk's latency. Finished chunks
+    wait as links to their cached files and are streamed from disk in
+    AUDIO_BLOCK_SIZE blocks, so no whole segment is held in memory.
+    `chunks` is consumed lazily, only as far as the prefetch window reaches.
+    Closing the generator early cancels the outstanding fetches.
+    """
+    chunk_iter = iter(chunks)
+    exhausted = False
+    pending: "List[asyncio.Task[str]]" = []
+    served = 0
+    try:
+        while True:
+            while not exhausted and len(pending) < TTS_PREFETCH_CHUNKS:
+                chunk = next(chunk_iter, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                pending.append(asyncio.create_task(linked_chunk_audio(voice_id, chunk)))
+            if not pending:
+                break
+            try:
+                path = await pending[0]
+            except TTSProviderError as e:
+                logger.error(f"ElevenLabs API error (chunk {served + 1}): {e.status_code} - {e.detail}")
+                raise
+            pending.pop(0)
+            served += 1
+            async for block in stream_file(path):
+                yield block
+    finally:
+        _discard_links(pending)
@@ -0,0 +1,199 @@
+import os
+import json
+import asyncio
+import hashlib
+import logging
+import tempfile
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "microlearn-tts-cache"))
+# Cap on the whole cache directory, shared by every worker using it
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_MB", "512")) * 1024 * 1024
+# Eviction brings the directory down to this fraction of the cap
+TTS_CACHE_LOW_WATERMARK = 0.9
+# Serving links and partial writes older than this were left behind by a
+# response or worker that died; anything younger may still be in use
+TTS_CACHE_ORPHAN_TTL = int(os.getenv("TTS_CACHE_ORPHAN_TTL", "3600"))
+
+
+def audio_cache_key(text: str, voice_id: str, voice_settings: Dict[str, Any]) -> str:
+    """Content address of a synthesized chunk; whitespace differences don't matter"""
+    normalized = " ".join(text.split())
+    raw = json.dumps([normalized, voice_id, voice_settings], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _stamp(path: str) -> None:
+    """Set the file's mtime, the cache's recency, from the precise clock
+    (the kernel's own timestamps only advance every few milliseconds)"""
+    now = time.time_ns()
+    os.utime(path, ns=(now, now))
+
+
+class AudioFileCache:
+    """Content-addressed MP3 files on local disk with a total size cap.
+
+    The directory is the source of truth, so several workers can share it:
+    a worker finds entries written by the others and hits refresh the
+    file's mtime. Each worker keeps a running total from its last scan plus
+    what it wrote since; once that passes max_bytes the directory is scanned
+    and files are evicted least recently used first down to
+    TTS_CACHE_LOW_WATERMARK of the cap, so the whole cache exceeds the cap
+    by at most the headroom per worker between scans. Concurrent
+    misses for the same key in one worker share one producer call, which runs
+    to completion even if the request that started it goes away. Callers
+    that serve a file after awaiting something else take a hard link to it
+    (get_or_create_link), so eviction cannot pull it from under them.
+    """
+
+    def __init__(self, directory: str = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._total_bytes = 0  # directory size at the last scan plus this worker's writes since
+        self._evicting = False
+        self._inflight: Dict[str, "asyncio.Task[str]"] = {}
+        self._loaded = False
+        self._load_lock: Optional[asyncio.Lock] = None
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.mp3")
+
+    def _scan(self) -> List[Tuple[int, str, int]]:
+        """(mtime, key, size) of every cached file, oldest first.
+
+        Also deletes serving links and partial writes older than
+        TTS_CACHE_ORPHAN_TTL.
+        """
+        orphaned_before = time.time_ns() - TTS_CACHE_ORPHAN_TTL * 1_000_000_000
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                    if name.endswith((".serving", ".tmp")):
+                        # A link's mtime is its entry's last use, so never before the link was made
+                        if stat.st_mtime_ns < orphaned_before:
+                            os.unlink(path)
+                        continue
+                except FileNotFoundError:
+                    # Removed by another worker during the walk
+                    continue
+                if name.endswith(".mp3"):
+                    entries.append((stat.st_mtime_ns, name[:-4], stat.st_size))
+        entries.sort()
+        return entries
+
+    async def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            if self._loaded:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            entries = await asyncio.to_thread(self._scan)
+            self._total_bytes = sum(size for _, _, size in entries)
+            self._loaded = True
+            logger.info(f"TTS cache: {len(entries)} file(s), {self._total_bytes // 1024} KiB in {self.directory}")
+
+    def _write(self, key: str, data: bytes) -> str:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file and rename, so readers never see partial audio
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            _stamp(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return path
+
+    def _evict(self) -> int:
+        """Delete the oldest files until the directory is down to the low
+        watermark; returns its size after"""
+        entries = self._scan()
+        total = sum(size for _, _, size in entries)
+        target = self.max_bytes * TTS_CACHE_LOW_WATERMARK
+        # The newest file always stays, even if it alone exceeds the cap
+        for _, key, size in entries[:-1]:
+            if total <= target:
+                break
+            try:
+                os.unlink(self.path(key))
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+    async def _fill(self, key: str, produce: Callable[[], Awaitable[bytes]]) -> str:
+        data = await produce()
+        path = await asyncio.to_thread(self._write, key, data)
+        self._total_bytes += len(data)
+        if self._total_bytes > self.max_bytes and not self._evicting:
+            self._evicting = True
+            try:
+                self._total_bytes = await asyncio.to_thread(self._evict)
+            finally:
+                self._evicting = False
+        return path
+
+    def _touch(self, key: str) -> bool:
+        """Mark the file for `key` as recently used; False if it is not on disk"""
+        try:
+            _stamp(self.path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _link(self, path: str) -> str:
+        link_path = f"{path}.{uuid.uuid4().hex}.serving"
+        os.link(path, link_path)
+        return link_path
+
+    async def get_or_create(self, key: str, produce: Callable[[], Awaitable[bytes]]) -> str:
+        """Path of the cached file for `key`, calling `produce` for its bytes on a miss"""
+        await self._ensure_loaded()
+        if self._touch(key):
+            return self.path(key)
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fill(key, produce))
+            self._inflight[key] = task
+
+            def _done(finished: "asyncio.Task[str]") -> None:
+                self._inflight.pop(key, None)
+                if not finished.cancelled() and finished.exception() is not None:
+                    logger.error(f"TTS cache fill failed for {key}: {finished.exception()}")
+
+            task.add_done_callback(_done)
+        # Shielded so one caller giving up does not cancel the shared fill
+        return await asyncio.shield(task)
+
+    async def get_or_create_link(self, key: str, produce: Callable[[], Awaitable[bytes]]) -> str:
+        """Like get_or_create, but returns a private hard link to the file.
+
+        The link keeps the audio readable after the entry is evicted; the
+        caller must unlink it when done.
+        """
+        try:
+            return self._link(await self.get_or_create(key, produce))
+        except FileNotFoundError:
+            # Evicted between lookup and link; fetch it once more
+            return self._link(await self.get_or_create(key, produce))
+
+
+audio_cache = AudioFileCache()
+
+
+def get_audio_cache() -> AudioFileCache:
+    return audio_cache
@@ -0,0 +1,38 @@
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+
+def encode_cursor(*parts: Any) -> str:
+    """Opaque, URL-safe pagination token for a keyset position"""
+    raw = json.dumps(list(parts), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, size: Optional[int] = None) -> List[Any]:
+    """Reverse of encode_cursor; raises ValueError for malformed tokens.
+
+    When `size` is given the token must hold exactly that many parts.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        parts = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(parts, list) or not parts or (size is not None and len(parts) != size):
+        raise ValueError("Invalid cursor")
+    return parts
+
+
+def keyset_position(created_at: Any, row_id: Any) -> Tuple[str, str]:
+    """Check a decoded (created_at, id) keyset position; raises ValueError
+    unless it is an ISO timestamp and a UUID"""
+    if not isinstance(created_at, str) or not isinstance(row_id, str):
+        raise ValueError("Invalid cursor")
+    try:
+        return datetime.fromisoformat(created_at).isoformat(), str(uuid.UUID(row_id))
+    except ValueError as e:
+        raise ValueError("Invalid cursor") from e
@@ -1,109 +1,165 @@
-from collections import defaultdict
+import hashlib
+import math
 import time
-from typing import Dict, Optional
-from fastapi import Request, HTTPException
+from typing import List, NamedTuple, Optional, Tuple
+from fastapi import Request
 from fastapi.responses import JSONResponse
 import logging
+from ..services.rate_limit_storage import RateLimitStorage, get_rate_limit_storage
+from ..dependencies.auth import user_cache
+from ..services.jwt_verifier import get_jwt_verifier
+from .cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Hashes of bearer tokens that failed verification, so repeated bad tokens
+# cost one lookup instead of a signature check (or JWKS refetch) each
+invalid_token_cache = TTLCache(max_size=10000, ttl=300)
+
+# Authenticated traffic from one IP may reach this many times rate_limit in
+# total, generous enough for many users behind a carrier NAT
+AUTHENTICATED_IP_FACTOR = 10
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float  # seconds until the current window ends
+
+
 class RateLimiter:
-    def __init__(self, rate_limit: int = 100, time_window: int = 60):
+    """Sliding-window-counter limits for one group of endpoints.
+
+    Counters live in the configured RateLimitStorage (RATE_LIMIT_BACKEND),
+    so with a shared backend the limits hold across all workers.
+    """
+
+    def __init__(self, name: str, rate_limit: int = 100, time_window: int = 60, storage: Optional[RateLimitStorage] = None):
+        self.name = name
         self.rate_limit = rate_limit
         self.time_window = time_window
-        self.requests: Dict[str, list] = defaultdict(list)
-        self.user_requests: Dict[str, list] = defaultdict(list)
-    
-    def is_rate_limited(self, client_id: str, user_id: Optional[str] = None) -> bool:
-        now = time.time()
-        
-        # Clean old requests for client
-        self.requests[client_id] = [req_time for req_time in self.requests[client_id] 
-                                  if now - req_time < self.time_window]
-        
-        # Check client-based rate limit
-        if len(self.requests[client_id]) >= self.rate_limit:
-            logger.warning(f"Rate limit exceeded for client {client_id}")
-            return True
-        
-        # If user is authenticated, apply user-specific limits
-        if user_id:
-            # Clean old requests for user
-            self.user_requests[user_id] = [req_time for req_time in self.user_requests[user_id] 
-                                         if now - req_time < self.time_window]
-            
-            # Higher limit for authenticated users
-            user_limit = self.rate_limit * 2
-            if len(self.user_requests[user_id]) >= user_limit:
-                logger.warning(f"User rate limit exceeded for user {user_id}")
-                return True
-            
-            # Add request to user tracking
-            self.user_requests[user_id].append(now)
-        
-        # Add request to client tracking
-        self.requests[client_id].append(now)
-        return False
-    
-    def get_remaining_requests(self, client_id: str, user_id: Optional[str] = None) -> int:
+        self._storage = storage
+
+    @property
+    def storage(self) -> RateLimitStorage:
+        return self._storage if self._storage is not None else get_rate_limit_storage()
+
+    async def check(self, client_id: str, user_id: Optional[str] = None, cost: int = 1) -> RateLimitResult:
+        """Count a request of the given cost, unless it would exceed a limit.
+
+        Authenticated users get twice rate_limit per time_window, keyed on
+        their user id so users sharing an IP (carrier NAT) do not share a
+        budget, within an outer bound of AUTHENTICATED_IP_FACTOR times
+        rate_limit for all authenticated traffic from the IP, so tokens
+        minted for many accounts cannot multiply one client's budget.
+        Anonymous clients get rate_limit per IP. One storage call.
+        """
         now = time.time()
-        
-        # Clean old requests
-        self.requests[client_id] = [req_time for req_time in self.requests[client_id] 
-                                  if now - req_time < self.time_window]
-        
+        reset_after = (int(now // self.time_window) + 1) * self.time_window - now
+
         if user_id:
-            self.user_requests[user_id] = [req_time for req_time in self.user_requests[user_id] 
-                                         if now - req_time < self.time_window]
-            user_limit = self.rate_limit * 2
-            return max(0, user_limit - len(self.user_requests[user_id]))
-        
-        return max(0, self.rate_limit - len(self.requests[client_id]))
+            # Higher limit for authenticated users, still bounded per IP
+            limits = [
+                (f"{self.name}:authenticated:{client_id}", self.rate_limit * AUTHENTICATED_IP_FACTOR),
+                (f"{self.name}:user:{user_id}", self.rate_limit * 2),
+            ]
+        else:
+            limits = [(f"{self.name}:client:{client_id}", self.rate_limit)]
+
+        try:
+            allowed, used = await self.storage.acquire(limits, self.time_window, cost, now)
+        except Exception as e:
+            # Fail open: an unavailable limiter backend must not take the API down
+            logger.error(f"Rate limit storage error, allowing request: {str(e)}")
+            return RateLimitResult(True, limits[-1][1], limits[-1][1], reset_after)
+
+        if not allowed:
+            logger.warning(f"Rate limit exceeded for {'user ' + user_id if user_id else 'client ' + client_id}")
+        # Report against the key that is closest to its limit
+        spent = cost if allowed else 0
+        remaining, limit = min((limit - usage - spent, limit) for usage, (_, limit) in zip(used, limits))
+        return RateLimitResult(allowed, limit, max(0, math.floor(remaining)), reset_after)
 
 # Different rate limiters for different endpoints
-rate_limiter = RateLimiter(rate_limit=100, time_window=60)  # General API
-auth_rate_limiter = RateLimiter(rate_limit=10, time_window=300)  # Auth endpoints (5 min window)
-content_rate_limiter = RateLimiter(rate_limit=200, time_window=60)  # Content endpoints
+rate_limiter = RateLimiter("general", rate_limit=100, time_window=60)  # General API
+auth_rate_limiter = RateLimiter("auth", rate_limit=10, time_window=300)  # Auth endpoints (5 min window)
+content_rate_limiter = RateLimiter("content", rate_limit=200, time_window=60)  # Content endpoints
+
+# Requests count as this many units against their limiter; everything else costs 1
+ROUTE_COSTS: List[Tuple[str, str, int]] = [
+    ("POST", "/api/tts/generate", 20),  # speech synthesis for a whole fact
+    ("POST", "/api/interactions/batch", 5),  # up to MAX_BATCH_SIZE events
+]
+
+
+def route_cost(method: str, path: str) -> int:
+    for route_method, prefix, cost in ROUTE_COSTS:
+        if method == route_method and path.startswith(prefix):
+            return cost
+    return 1
+
+
+async def _request_user_id(request: Request) -> Optional[str]:
+    """Verified user id of the request's bearer token, or None.
+
+    Runs before any limit applies, so it never calls the auth server: a
+    user already verified by get_current_user comes from its cache, other
+    tokens are checked locally only. Tokens that fail are remembered and
+    limited per IP; the route itself still authenticates as usual.
+    """
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return None
+    token = auth_header.split(" ")[1]
+    token_hash = hashlib.sha256(token.encode()).hexdigest()
+
+    cached = user_cache.get(token_hash)
+    if cached:
+        return cached.id
+    if invalid_token_cache.get(token_hash):
+        return None
+    try:
+        claims = await get_jwt_verifier().decode(token)
+    except Exception:
+        invalid_token_cache.set(token_hash, True)
+        return None
+    return claims["sub"]
 
 async def rate_limit_middleware(request: Request, call_next):
     client_id = request.client.host if request.client else "unknown"
-    
-    # Extract user ID from auth header if available
-    user_id = None
-    auth_header = request.headers.get("Authorization")
-    if auth_header and auth_header.startswith("Bearer "):
-        # You could decode the JWT here to get user_id
-        # For now, we'll use a simple approach
-        user_id = request.headers.get("X-User-ID")  # If you add this header
-    
+
+    # Per-user limits are keyed on the verified token subject
+    user_id = await _request_user_id(request)
+
     # Choose appropriate rate limiter based on endpoint
     limiter = rate_limiter
     if request.url.path.startswith("/api/auth"):
         limiter = auth_rate_limiter
     elif request.url.path.startswith("/api/contents") or request.url.path.startswith("/api/interactions"):
         limiter = content_rate_limiter
-    
-    if limiter.is_rate_limited(client_id, user_id):
-        remaining = limiter.get_remaining_requests(client_id, user_id)
+
+    result = await limiter.check(client_id, user_id, cost=route_cost(request.method, request.url.path))
+    if not result.allowed:
+        retry_after = math.ceil(result.reset_after)
         return JSONResponse(
             status_code=429,
             content={
                 "detail": "Too many requests. Please try again later.",
-                "remaining_requests": remaining,
-                "reset_time": limiter.time_window
+                "remaining_requests": result.remaining,
+                "reset_time": retry_after
             },
             headers={
-                "Retry-After": str(limiter.time_window),
-                "X-RateLimit-Remaining": str(remaining),
-                "X-RateLimit-Reset": str(int(time.time()) + limiter.time_window)
+                "Retry-After": str(retry_after),
+                "X-RateLimit-Remaining": str(result.remaining),
+                "X-RateLimit-Reset": str(int(time.time()) + retry_after)
             }
         )
-    
+
     response = await call_next(request)
-    
+
     # Add rate limit headers to response
-    remaining = limiter.get_remaining_requests(client_id, user_id)
-    response.headers["X-RateLimit-Remaining"] = str(remaining)
-    response.headers["X-RateLimit-Limit"] = str(limiter.rate_limit)
-    
-    return response
\ No newline at end of file
+    response.headers["X-RateLimit-Remaining"] = str(result.remaining)
+    response.headers["X-RateLimit-Limit"] = str(result.limit)
+
+    return response
@@ -0,0 +1,58 @@
+import re
+from typing import Iterator, List
+
+# A sentence is text up to and including its terminal punctuation (or the end).
+# Punctuation before the first word (an opening "...") belongs to the first
+# sentence, and text that is nothing but punctuation is a sentence of its own.
+_SENTENCE = re.compile(r"[.!?]*[^.!?]+(?:[.!?]+|$)|[.!?]+")
+# Within an over-long sentence, break after clause punctuation
+_CLAUSE = re.compile(r"[,;:]*[^,;:]+(?:[,;:]+|$)|[,;:]+")
+
+
+def _pieces(text: str, max_length: int) -> Iterator[str]:
+    """Sentences of `text`, each no longer than max_length.
+
+    Longer sentences are broken into clauses, longer clauses into words and
+    longer words into max_length slices.
+    """
+    for sentence_match in _SENTENCE.finditer(text):
+        sentence = sentence_match.group().strip()
+        if len(sentence) <= max_length:
+            if sentence:
+                yield sentence
+            continue
+        for clause_match in _CLAUSE.finditer(sentence):
+            clause = clause_match.group().strip()
+            if len(clause) <= max_length:
+                if clause:
+                    yield clause
+                continue
+            for word in clause.split():
+                if len(word) <= max_length:
+                    yield word
+                else:
+                    for start in range(0, len(word), max_length):
+                        yield word[start:start + max_length]
+
+
+def iter_segments(text: str, max_length: int = 300) -> Iterator[str]:
+    """Split text into segments of at most max_length characters, lazily.
+
+    Whole sentences are packed together while they fit; sentences that do
+    not fit on their own fall back to clause, word and finally character
+    boundaries. Runs in linear time: each segment is joined once from its
+    pieces rather than grown by repeated concatenation.
+    """
+    parts: List[str] = []
+    length = 0
+    for piece in _pieces(text, max_length):
+        added = len(piece) + 1 if parts else len(piece)
+        if parts and length + added > max_length:
+            yield " ".join(parts)
+            parts = []
+            added = len(piece)
+            length = 0
+        parts.append(piece)
+        length += added
+    if parts:
+        yield " ".join(parts)
@@ -0,0 +1,36 @@
+"""Per-request cost of RateLimiter.check (in-memory storage) as the number of distinct clients grows.
+
+Run from the backend directory:  python bench_rate_limiter.py
+"""
+import asyncio
+import logging
+import random
+import time
+from app.services.rate_limit_storage import MemoryRateLimitStorage
+from app.utils.rate_limiter import RateLimiter
+
+REQUESTS = 200_000
+CLIENT_COUNTS = [100, 1_000, 10_000, 100_000]
+
+
+async def bench(distinct_clients: int) -> float:
+    limiter = RateLimiter("bench", rate_limit=200, time_window=60, storage=MemoryRateLimitStorage())
+    clients = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(distinct_clients)]
+    # Warm up so every client has state, then measure a random mix
+    for client_id in clients:
+        await limiter.check(client_id)
+    picks = [random.choice(clients) for _ in range(REQUESTS)]
+
+    start = time.perf_counter()
+    for client_id in picks:
+        await limiter.check(client_id)
+    elapsed = time.perf_counter() - start
+    return elapsed / REQUESTS * 1e9
+
+
+if __name__ == "__main__":
+    # Rejections log a warning each; keep that out of the measurement
+    logging.disable(logging.WARNING)
+    print(f"{'clients':>10}  {'ns/request':>10}")
+    for count in CLIENT_COUNTS:
+        print(f"{count:>10}  {asyncio.run(bench(count)):>10.0f}")
@@ -0,0 +1,75 @@
+"""Throughput of the TTS text segmenter on long inputs, against the previous split_text.
+
+Run from the backend directory:  python bench_text_segmenter.py
+"""
+import random
+import re
+import time
+from typing import Callable, List
+from app.utils.text_segmenter import iter_segments
+
+MAX_LENGTH = 300
+SIZES_KB = [100, 400, 1_600]
+ROUNDS = 5
+
+WORDS = ("the quick brown fox jumps over lazy dog while curious learners read short "
+         "facts about science history and space every single day").split()
+
+
+def legacy_split_text(text: str, max_length: int) -> List[str]:
+    """The segmenter previously in routers/tts.py, kept here as a baseline"""
+    sentences = re.findall(r'[^.!?]+[.!?]+', text) or [text]
+    chunks = []
+    current = ''
+    for sentence in sentences:
+        if len(current) + len(sentence) <= max_length:
+            current += sentence + ' '
+        else:
+            if current.strip():
+                chunks.append(current.strip())
+            current = sentence + ' '
+    if current.strip():
+        chunks.append(current.strip())
+    return chunks
+
+
+def make_text(size: int, rng: random.Random) -> str:
+    """Mostly ordinary sentences, with some run-on ones and a few unbroken tokens"""
+    parts = []
+    total = 0
+    while total < size:
+        kind = rng.random()
+        if kind < 0.9:
+            sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 30))) + rng.choice(".!?")
+        elif kind < 0.99:
+            clauses = (" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 20))) for _ in range(rng.randint(5, 15)))
+            sentence = ", ".join(clauses)
+        else:
+            sentence = "x" * rng.randint(400, 1_000)
+        parts.append(sentence)
+        total += len(sentence) + 1
+    return " ".join(parts)[:size]
+
+
+def bench(split: Callable[[str, int], List[str]], text: str) -> float:
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        split(text, MAX_LENGTH)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    rng = random.Random(0)
+    print(f"{'input':>8}  {'segments':>8}  {'longest':>7}  {'ms':>7}  {'MB/s':>6}  {'legacy ms':>9}  {'legacy longest':>14}")
+    for size_kb in SIZES_KB:
+        text = make_text(size_kb * 1024, rng)
+        segments = list(iter_segments(text, MAX_LENGTH))
+        legacy = legacy_split_text(text, MAX_LENGTH)
+        elapsed = bench(lambda t, n: list(iter_segments(t, n)), text)
+        legacy_elapsed = bench(legacy_split_text, text)
+        print(
+            f"{size_kb:>6}KB  {len(segments):>8}  {max(map(len, segments)):>7}  {elapsed * 1e3:>7.1f}  "
+            f"{len(text) / elapsed / 1e6:>6.1f}  {legacy_elapsed * 1e3:>9.1f}  {max(map(len, legacy)):>14}"
+        )
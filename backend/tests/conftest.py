@@ -0,0 +1,7 @@
+import os
+
+# app.services.supabase refuses to import without these; tests never reach the server.
+# supabase's create_client only accepts JWT-shaped keys.
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_ANON_KEY", "a.b.c")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "a.b.c")
@@ -0,0 +1,128 @@
+import asyncio
+import pytest
+from app.services.rate_limit_storage import MemoryRateLimitStorage, RateLimitStorage, RedisRateLimitStorage
+
+WINDOW = 60
+# Start of a window: the previous one still overlaps completely
+START = 10 * WINDOW
+
+
+def memory_storage():
+    return MemoryRateLimitStorage()
+
+
+def redis_storage():
+    # Runs the real Lua script, on fakeredis's embedded interpreter
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    import redis.asyncio
+
+    server = fakeredis.FakeServer()
+    original = redis.asyncio.from_url
+    redis.asyncio.from_url = lambda url: fakeredis.FakeAsyncRedis(server=server)
+    try:
+        return RedisRateLimitStorage("redis://fake")
+    finally:
+        redis.asyncio.from_url = original
+
+
+@pytest.fixture(params=[memory_storage, redis_storage], ids=["memory", "redis"])
+def make_storage(request):
+    return request.param
+
+
+def run(make_storage, scenario):
+    async def main():
+        storage = make_storage()
+        try:
+            return await scenario(storage)
+        finally:
+            await storage.close()
+
+    return asyncio.run(main())
+
+
+def test_storage_is_abstract():
+    with pytest.raises(TypeError):
+        RateLimitStorage()
+
+
+def test_counts_up_to_the_limit(make_storage):
+    async def scenario(storage):
+        return [await storage.acquire([("k", 3)], WINDOW, 1, START + i) for i in range(5)]
+
+    results = run(make_storage, scenario)
+
+    assert results == [(True, [0.0]), (True, [1.0]), (True, [2.0]), (False, [3.0]), (False, [3.0])]
+
+
+def test_previous_window_counts_by_overlap(make_storage):
+    async def scenario(storage):
+        for _ in range(4):
+            await storage.acquire([("k", 10)], WINDOW, 1, START)
+        # A quarter into the next window, three quarters of the previous one still count
+        first = await storage.acquire([("k", 10)], WINDOW, 1, START + WINDOW + WINDOW / 4)
+        # Halfway through it
+        second = await storage.acquire([("k", 10)], WINDOW, 1, START + WINDOW + WINDOW / 2)
+        return first, second
+
+    first, second = run(make_storage, scenario)
+
+    assert first == (True, [3.0])
+    assert second == (True, [3.0])
+
+
+def test_refused_request_takes_nothing_from_any_key(make_storage):
+    async def scenario(storage):
+        await storage.acquire([("full", 1)], WINDOW, 1, START)
+        refused = await storage.acquire([("open", 5), ("full", 1)], WINDOW, 1, START)
+        after = await storage.acquire([("open", 5)], WINDOW, 1, START)
+        return refused, after
+
+    refused, after = run(make_storage, scenario)
+
+    assert refused == (False, [0.0, 1.0])
+    assert after == (True, [0.0])
+
+
+def test_counts_expire_after_two_windows(make_storage):
+    async def scenario(storage):
+        for _ in range(3):
+            await storage.acquire([("k", 3)], WINDOW, 1, START)
+        return await storage.acquire([("k", 3)], WINDOW, 1, START + 2 * WINDOW)
+
+    assert run(make_storage, scenario) == (True, [0.0])
+
+
+def test_memory_drops_idle_keys():
+    async def scenario(storage):
+        await storage.acquire([("idle", 3)], WINDOW, 1, START)
+        await storage.acquire([("busy", 3)], WINDOW, 1, START + 2 * WINDOW)
+        return len(storage)
+
+    assert run(memory_storage, scenario) == 1
+
+
+def test_memory_keeps_longer_windows_alive_among_shorter_ones():
+    long_window = 5 * WINDOW
+
+    async def scenario(storage):
+        results = []
+        for i in range(4):
+            now = START + i
+            results.append(await storage.acquire([("auth", 2)], long_window, 1, now))
+            # Another client's request on a shorter window runs the idle-key eviction
+            await storage.acquire([(f"general:{i}", 3)], WINDOW, 1, now)
+        return results
+
+    results = run(memory_storage, scenario)
+
+    assert [allowed for allowed, _ in results] == [True, True, False, False]
+
+
+def test_redis_keys_expire_after_two_windows():
+    async def scenario(storage):
+        await storage.acquire([("k", 3)], WINDOW, 1, START)
+        return await storage._redis.ttl(f"ratelimit:k:{START // WINDOW}")
+
+    assert run(redis_storage, scenario) == 2 * WINDOW
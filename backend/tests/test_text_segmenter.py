@@ -0,0 +1,28 @@
+import pytest
+from app.utils.text_segmenter import iter_segments
+
+
+def test_packs_sentences_up_to_the_limit():
+    text = "One two. Three four. Five six."
+
+    assert list(iter_segments(text, 20)) == ["One two. Three four.", "Five six."]
+
+
+def test_splits_long_sentences_at_clauses_then_words():
+    assert list(iter_segments("alpha, beta; gamma delta", 12)) == ["alpha, beta;", "gamma delta"]
+    assert list(iter_segments("abcdefghij", 4)) == ["abcd", "efgh", "ij"]
+
+
+@pytest.mark.parametrize("text", [
+    "...and then it ended.",
+    "?! Really.",
+    "... — ok",
+    ",,, hi there",
+    "...",
+])
+@pytest.mark.parametrize("max_length", [300, 5])
+def test_keeps_leading_punctuation(text, max_length):
+    segments = list(iter_segments(text, max_length))
+
+    assert all(len(segment) <= max_length for segment in segments)
+    assert "".join(segments).replace(" ", "") == text.replace(" ", "")
@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import asyncio
+import httpx
+import pytest
+from app.services import http, tts, tts_cache
+from app.services.tts_cache import AudioFileCache
+
+AUDIO_BYTES = 100
+
+
+class FakeTTSServer:
+    """Stands in for ElevenLabs: answers every synthesis with fixed-size audio"""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        text = json.loads(request.read())["text"]
+        return httpx.Response(200, content=text.encode().ljust(AUDIO_BYTES, b"\0"))
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeTTSServer()
+    monkeypatch.setattr(http, "_client", httpx.AsyncClient(transport=httpx.MockTransport(server)))
+    monkeypatch.setattr(tts, "ELEVENLABS_API_KEY", "test-key")
+    return server
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    # Room for two chunks
+    cache = AudioFileCache(str(tmp_path), max_bytes=2 * AUDIO_BYTES + AUDIO_BYTES // 2)
+    monkeypatch.setattr(tts_cache, "audio_cache", cache)
+    return cache
+
+
+async def chunk_audio(voice_id: str, text: str) -> bytes:
+    return b"".join([block async for block in tts.synthesize_speech([text], voice_id)])
+
+
+def serving_links(cache: AudioFileCache):
+    return [name for _, _, files in os.walk(cache.directory) for name in files if name.endswith(".serving")]
+
+
+def test_concurrent_misses_share_one_upstream_request(server, cache):
+    async def main():
+        return await asyncio.gather(*(chunk_audio("voice", "Hello there.") for _ in range(5)))
+
+    results = asyncio.run(main())
+
+    assert len(server.requests) == 1
+    assert all(audio == results[0] for audio in results)
+    assert len(results[0]) == AUDIO_BYTES
+    assert serving_links(cache) == []
+
+
+def test_hits_are_served_without_upstream_requests(server, cache):
+    async def main():
+        await chunk_audio("voice", "Hello there.")
+        await chunk_audio("voice", "Hello   there.")
+
+    asyncio.run(main())
+
+    assert len(server.requests) == 1
+
+
+def test_least_recently_used_entry_is_evicted(server, cache):
+    async def main():
+        await chunk_audio("voice", "first")
+        await chunk_audio("voice", "second")
+        # Touch "first", so "second" is now the oldest
+        await chunk_audio("voice", "first")
+        await chunk_audio("voice", "third")
+
+    asyncio.run(main())
+
+    assert len(server.requests) == 3
+    key = lambda text: tts_cache.audio_cache_key(text, "voice", tts.VOICE_SETTINGS)
+    assert not os.path.exists(cache.path(key("second")))
+    assert os.path.exists(cache.path(key("first")))
+    assert os.path.exists(cache.path(key("third")))
+    assert cache._total_bytes <= cache.max_bytes
+
+    asyncio.run(chunk_audio("voice", "second"))
+
+    assert len(server.requests) == 4
+
+
+def test_chunks_stream_in_order_within_the_prefetch_window(server, cache, monkeypatch):
+    monkeypatch.setattr(tts, "TTS_PREFETCH_CHUNKS", 2)
+    cache.max_bytes = 10 * AUDIO_BYTES
+    texts = [f"chunk {i}" for i in range(6)]
+
+    async def main():
+        return b"".join([block async for block in tts.synthesize_speech(texts, "voice")])
+
+    audio = asyncio.run(main())
+
+    assert audio == b"".join(text.encode().ljust(AUDIO_BYTES, b"\0") for text in texts)
+    assert server.max_in_flight == 2
+    assert serving_links(cache) == []
+
+
+def test_closing_the_stream_early_leaves_no_links(server, cache):
+    cache.max_bytes = 10 * AUDIO_BYTES
+
+    async def main():
+        segments = tts.synthesize_speech([f"chunk {i}" for i in range(6)], "voice")
+        await segments.__anext__()
+        # Let the prefetched chunks finish, so they hold links
+        await asyncio.sleep(0.2)
+        await segments.aclose()
+
+    asyncio.run(main())
+
+    assert serving_links(cache) == []
+
+
+def test_link_outlives_eviction(server, cache):
+    async def main():
+        path = await tts.linked_chunk_audio("voice", "first")
+        await chunk_audio("voice", "second")
+        await chunk_audio("voice", "third")
+        return path
+
+    path = asyncio.run(main())
+
+    key = tts_cache.audio_cache_key("first", "voice", tts.VOICE_SETTINGS)
+    assert not os.path.exists(cache.path(key))
+    with open(path, "rb") as f:
+        assert f.read().rstrip(b"\0") == b"first"
+    os.unlink(path)
+
+
+def test_workers_sharing_a_directory_share_entries_and_the_cap(tmp_path):
+    # Two processes' caches over one directory, each with room for two chunks
+    workers = [AudioFileCache(str(tmp_path), max_bytes=2 * AUDIO_BYTES + AUDIO_BYTES // 2) for _ in range(2)]
+    produced = []
+
+    def producer(text):
+        async def produce():
+            produced.append(text)
+            return text.encode().ljust(AUDIO_BYTES, b"\0")
+        return produce
+
+    def directory_bytes():
+        return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(tmp_path) for name in files)
+
+    async def main():
+        await workers[0].get_or_create("first", producer("first"))
+        await workers[1].get_or_create("second", producer("second"))
+        # Written by the other worker, so not produced again
+        await workers[1].get_or_create("first", producer("first"))
+        await workers[0].get_or_create("third", producer("third"))
+        # Each worker only counts its own writes between scans
+        assert directory_bytes() == 3 * AUDIO_BYTES
+        # Worker 0 passes the cap; its scan sees the other worker's file too
+        await workers[0].get_or_create("fourth", producer("fourth"))
+
+    asyncio.run(main())
+
+    assert produced == ["first", "second", "third", "fourth"]
+    assert directory_bytes() <= workers[0].max_bytes * tts_cache.TTS_CACHE_LOW_WATERMARK
+    assert not os.path.exists(workers[0].path("second"))
+    assert not os.path.exists(workers[0].path("first"))
+
+
+def test_only_old_orphans_are_reaped(tmp_path):
+    cache = AudioFileCache(str(tmp_path))
+    old = time.time() - 2 * tts_cache.TTS_CACHE_ORPHAN_TTL
+    paths = {}
+    for name in ["old.serving", "old.tmp", "new.serving", "new.tmp"]:
+        paths[name] = tmp_path / name
+        paths[name].write_bytes(b"audio")
+        if name.startswith("old"):
+            os.utime(paths[name], (old, old))
+
+    asyncio.run(cache.get_or_create("key", lambda: asyncio.sleep(0, b"audio")))
+
+    assert sorted(path.name for path in tmp_path.iterdir() if path.is_file()) == ["new.serving", "new.tmp"]
@@ -329,6 +329,7 @@ export default function IndexScreen() {
     hasMore,
     isInitialized,
     trackInteraction,
+    flushInteractions,
   } = useInfiniteContent();
 
   // Pause all videos when screen loses focus
@@ -387,7 +388,11 @@ export default function IndexScreen() {
 
       // Track content consumption for daily streak system
       try {
-        const trackingResult = await trackContentInteraction(contentId);
+        // Buffered interactions are sent before the streak is checked
+        const trackingResult = await trackContentInteraction(
+          contentId,
+          flushInteractions
+        );
         console.log('🎯 Daily tracking result:', trackingResult);
 
         // Set notification when streak is earned or threshold reached
@@ -425,6 +430,7 @@ export default function IndexScreen() {
     },
     [
       trackInteraction,
+      flushInteractions,
       trackContentInteraction,
       fetchStreakData,
       setStreakNotification,
@@ -22,7 +22,13 @@ interface DailyContentStore {
   
   // Actions - now accept optional userId
   initializeDaily: (userId?: string) => Promise<void>;
-  trackContentInteraction: (contentId: string, userId?: string) => Promise<{
+  // beforeStreakUpdate runs right before the server is asked to credit the
+  // streak, e.g. to send buffered interactions it counts
+  trackContentInteraction: (
+    contentId: string,
+    userId?: string,
+    beforeStreakUpdate?: () => Promise<void>
+  ) => Promise<{
     thresholdReached: boolean;
     streakEarned: boolean;
     isNewThreshold: boolean;
@@ -99,7 +105,11 @@ const useDailyContentStore = create<DailyContentStore>((set, get) => ({
     }
   },
 
-  trackContentInteraction: async (contentId: string, userId?: string) => {
+  trackContentInteraction: async (
+    contentId: string,
+    userId?: string,
+    beforeStreakUpdate?: () => Promise<void>
+  ) => {
     if (!userId) {
       console.warn('🚨 No user ID provided for tracking content interaction');
       return {
@@ -181,6 +191,10 @@ const useDailyContentStore = create<DailyContentStore>((set, get) => ({
       set({ isCheckingStreak: true });
       
       try {
+        // The server counts today's interactions, make sure it has them all
+        if (beforeStreakUpdate) {
+          await beforeStreakUpdate();
+        }
         const streakResponse = await apiClient.updateDailyStreak() as StreakUpdateResponse;
         console.log('🎉 Streak update response:', streakResponse);
         
@@ -255,9 +269,12 @@ export const useDailyContentTracker = () => {
     return store.initializeDaily(userId);
   }, [store.initializeDaily, userId]);
   
-  const trackContentInteraction = useCallback(async (contentId: string) => {
+  const trackContentInteraction = useCallback(async (
+    contentId: string,
+    beforeStreakUpdate?: () => Promise<void>
+  ) => {
     console.log(`📱 trackContentInteraction called for content: ${contentId}, user: ${userId}`);
-    const result = await store.trackContentInteraction(contentId, userId);
+    const result = await store.trackContentInteraction(contentId, userId, beforeStreakUpdate);
     console.log(`🎯 Tracking result:`, result);
     
     // Return just the streakEarned boolean for backward compatibility
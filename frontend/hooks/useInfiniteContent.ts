@@ -32,6 +32,7 @@ interface UseInfiniteContentReturn {
   loadMoreContent: () => Promise<void>;
   resetContent: () => void;
   trackInteraction: (contentId: string, interactionType: string, interactionValue?: number) => Promise<void>;
+  flushInteractions: () => Promise<void>;
   isLoading: boolean;
   error: string | null;
   hasMore: boolean;
@@ -43,6 +44,15 @@ interface UseInfiniteContentReturn {
 const CACHE_KEY = 'cached_content';
 const CACHE_EXPIRY_KEY = 'cache_expiry';
 const CACHE_DURATION = 5 * 60 * 1000; // 5 minutes
+// Interactions are sent in batches: after this delay or once this many are pending
+const INTERACTION_FLUSH_DELAY = 2000;
+const INTERACTION_BATCH_SIZE = 20;
+
+interface PendingInteraction {
+  content_id: string;
+  interaction_type: string;
+  interaction_value: number;
+}
 
 export const useInfiniteContent = (): UseInfiniteContentReturn => {
   const [content, setContent] = useState<Fact[]>([]);
@@ -52,9 +62,14 @@ export const useInfiniteContent = (): UseInfiniteContentReturn => {
   
   // Use refs for values that don't need to trigger re-renders
   const seenContentIds = useRef<Set<string>>(new Set());
-  const currentOffset = useRef(0);
+  // Opaque keyset cursor from the last page; null means "start of feed"
+  const nextCursor = useRef<string | null>(null);
+  const duplicatePages = useRef(0);
   const isInitialized = useRef(false);
   const lastRequestTime = useRef(0);
+  const pendingInteractions = useRef<PendingInteraction[]>([]);
+  const interactionFlushTimer = useRef<ReturnType<typeof setTimeout> | null>(null);
+  const interactionFlushChain = useRef<Promise<void>>(Promise.resolve());
   
   // Configuration
   const batchSize = 5; // Optimized batch size
@@ -116,7 +131,7 @@ export const useInfiniteContent = (): UseInfiniteContentReturn => {
       hasMore, 
       timeSinceLastRequest, 
       minRequestInterval,
-      currentOffset: currentOffset.current,
+      nextCursor: nextCursor.current,
       contentLength: content.length 
     });
     
@@ -125,7 +140,7 @@ export const useInfiniteContent = (): UseInfiniteContentReturn => {
       return;
     }
 
-    console.log(`🚀 Loading more content: offset=${currentOffset.current}, batchSize=${batchSize}`);
+    console.log(`🚀 Loading more content: cursor=${nextCursor.current}, batchSize=${batchSize}`);
     setIsLoading(true);
     setError(null);
     lastRequestTime.current = now;
@@ -138,12 +153,11 @@ export const useInfiniteContent = (): UseInfiniteContentReturn => {
 
     try {
       // Try cache first for initial load
-      if (currentOffset.current === 0 && content.length === 0) {
+      if (nextCursor.current === null && content.length === 0) {
         const cachedContent = await loadFromCache();
         if (cachedContent && cachedContent.length > 0) {
           setContent(cachedContent);
           cachedContent.forEach(item => seenContentIds.current.add(item.id));
-          currentOffset.current = cachedContent.length;
           isInitialized.current = true;
           setIsLoading(false);
           clearTimeout(loadingTimeout);
@@ -151,9 +165,10 @@ export const useInfiniteContent = (): UseInfiniteContentReturn => {
         }
       }
 
-      const response = await apiClient.getContents(batchSize, currentOffset.current) as {
+      const response = await apiClient.getContents(batchSize, nextCursor.current) as {
         data: Fact[];
         count: number;
+        next_cursor: string | null;
       };
 
       console.log(`📦 Received ${response.data?.length || 0} items from API`);
@@ -164,6 +179,8 @@ export const useInfiniteContent = (): UseInfiniteContentReturn => {
         return;
       }
 
+      nextCursor.current = response.next_cursor ?? null;
+
       // Filter out content we've already seen in this session
       const newContent = response.data.filter(
         (item: Fact) => !seenContentIds.current.has(item.id)
@@ -180,16 +197,17 @@ export const useInfiniteContent = (): UseInfiniteContentReturn => {
 
       if (enhancedContent.length === 0) {
         // All items were duplicates, try next batch
-        currentOffset.current += batchSize;
+        duplicatePages.current += 1;
         console.log('All items were duplicates, trying next batch');
         // Recursively load more (but prevent infinite loops)
-        if (currentOffset.current < 100) { // Safety limit
+        if (nextCursor.current && duplicatePages.current < 20) { // Safety limit
           await loadMoreContent();
         } else {
           setHasMore(false);
         }
         return;
       }
+      duplicatePages.current = 0;
 
       // Update content and tracking
       setContent(prev => {
@@ -206,7 +224,6 @@ export const useInfiniteContent = (): UseInfiniteContentReturn => {
 
       // Track seen content
       enhancedContent.forEach(item => seenContentIds.current.add(item.id));
-      currentOffset.current += batchSize;
 
       // Mark as initialized after first successful load
       if (!isInitialized.current) {
@@ -215,8 +232,8 @@ export const useInfiniteContent = (): UseInfiniteContentReturn => {
       }
 
       // Check if we should stop loading more - be more conservative
-      if (enhancedContent.length === 0) {
-        console.log('⚠️ No new content after deduplication, assuming no more content');
+      if (!nextCursor.current) {
+        console.log('🏁 Reached the end of the feed');
         setHasMore(false);
       } else if (enhancedContent.length < Math.floor(batchSize / 2)) {
         console.log(`⚠️ Received significantly less than batch size (${enhancedContent.length}/${batchSize}), might be running out of content`);
@@ -242,7 +259,8 @@ export const useInfiniteContent = (): UseInfiniteContentReturn => {
     console.log('Resetting content system');
     setContent([]);
     seenContentIds.current.clear();
-    currentOffset.current = 0;
+    nextCursor.current = null;
+    duplicatePages.current = 0;
     setHasMore(true);
     setError(null);
     setIsLoading(false);
@@ -258,19 +276,54 @@ export const useInfiniteContent = (): UseInfiniteContentReturn => {
     await loadMoreContent();
   }, [clearCache, resetContent, loadMoreContent]);
 
+  const flushInteractions = useCallback(async () => {
+    if (interactionFlushTimer.current) {
+      clearTimeout(interactionFlushTimer.current);
+      interactionFlushTimer.current = null;
+    }
+    const batch = pendingInteractions.current;
+    pendingInteractions.current = [];
+
+    // Chained after earlier flushes, so awaiting this one means everything
+    // tracked so far has reached the server
+    const send = interactionFlushChain.current.then(async () => {
+      if (batch.length === 0) return;
+      try {
+        await apiClient.recordInteractionsBatch(batch);
+        console.log(`Tracked ${batch.length} interactions`);
+      } catch (error) {
+        console.error('Error tracking interactions:', error);
+        // Don't throw error to avoid disrupting user experience
+      }
+    });
+    interactionFlushChain.current = send;
+    await send;
+  }, []);
+
   const trackInteraction = useCallback(async (
     contentId: string, 
     interactionType: string, 
     interactionValue: number = 1
   ) => {
-    try {
-      await apiClient.recordInteraction(contentId, interactionType, interactionValue);
-      console.log(`Tracked interaction: ${interactionType} for content ${contentId}`);
-    } catch (error) {
-      console.error('Error tracking interaction:', error);
-      // Don't throw error to avoid disrupting user experience
+    pendingInteractions.current.push({
+      content_id: contentId,
+      interaction_type: interactionType,
+      interaction_value: interactionValue,
+    });
+
+    if (pendingInteractions.current.length >= INTERACTION_BATCH_SIZE) {
+      await flushInteractions();
+    } else if (!interactionFlushTimer.current) {
+      interactionFlushTimer.current = setTimeout(flushInteractions, INTERACTION_FLUSH_DELAY);
     }
-  }, []);
+  }, [flushInteractions]);
+
+  // Send whatever is still pending when the feed unmounts
+  useEffect(() => {
+    return () => {
+      flushInteractions();
+    };
+  }, [flushInteractions]);
 
   // Auto-load initial content when hook is first used
   useEffect(() => {
@@ -285,6 +338,7 @@ export const useInfiniteContent = (): UseInfiniteContentReturn => {
     loadMoreContent,
     resetContent,
     trackInteraction,
+    flushInteractions,
     isLoading,
     error,
     hasMore,
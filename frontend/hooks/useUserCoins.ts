@@ -6,10 +6,23 @@ interface UserCoinsState {
   isLoading: boolean;
   error: string | null;
   fetchCoins: () => Promise<void>;
-  addCoins: (amount: number, reason: string) => Promise<void>;
-  spendCoins: (amount: number, reason: string) => Promise<void>;
+  addCoins: (amount: number, reason: string, idempotencyKey?: string) => Promise<void>;
+  spendCoins: (amount: number, reason: string, idempotencyKey?: string) => Promise<void>;
 }
 
+// One key per user action: the API client's retries resend the same request
+// body, so a retried add or spend is applied only once. Callers that retry an
+// action themselves pass the key they used the first time.
+export const newIdempotencyKey = (): string => {
+  if (typeof globalThis.crypto?.randomUUID === 'function') {
+    return globalThis.crypto.randomUUID();
+  }
+  return 'xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx'.replace(/[xy]/g, (c) => {
+    const r = (Math.random() * 16) | 0;
+    return (c === 'x' ? r : (r & 0x3) | 0x8).toString(16);
+  });
+};
+
 const useUserCoinsStore = create<UserCoinsState>((set, get) => ({
   coins: 0,
   isLoading: false,
@@ -26,10 +39,10 @@ const useUserCoinsStore = create<UserCoinsState>((set, get) => ({
     }
   },
 
-  addCoins: async (amount: number, reason: string) => {
+  addCoins: async (amount: number, reason: string, idempotencyKey = newIdempotencyKey()) => {
     try {
       set({ isLoading: true, error: null });
-      const response = await apiClient.addUserCoins(amount, reason) as { coins: number };
+      const response = await apiClient.addUserCoins(amount, reason, idempotencyKey) as { coins: number };
       set({ coins: response.coins, isLoading: false });
     } catch (error) {
       console.error('Error adding coins:', error);
@@ -37,10 +50,10 @@ const useUserCoinsStore = create<UserCoinsState>((set, get) => ({
     }
   },
 
-  spendCoins: async (amount: number, reason: string) => {
+  spendCoins: async (amount: number, reason: string, idempotencyKey = newIdempotencyKey()) => {
     try {
       set({ isLoading: true, error: null });
-      const response = await apiClient.spendUserCoins(amount, reason) as { coins: number };
+      const response = await apiClient.spendUserCoins(amount, reason, idempotencyKey) as { coins: number };
       set({ coins: response.coins, isLoading: false });
     } catch (error) {
       console.error('Error spending coins:', error);
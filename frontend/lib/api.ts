@@ -1,6 +1,6 @@
 import { supabase } from './supabase';
 import Constants from 'expo-constants';
-import axios, { AxiosInstance } from 'axios';
+import axios, { AxiosInstance, AxiosResponse } from 'axios';
 import { Platform } from 'react-native';
 
 // Determine API URL from Expo config
@@ -64,6 +64,7 @@ class ApiClient {
   private readonly timeout = 10000; // Increased timeout
   private readonly maxRetries = 3;
   private axiosInstance: AxiosInstance;
+  private voicesCache: { etag: string; data: any } | null = null;
 
   constructor() {
     this.baseUrl = API_URL;
@@ -204,12 +205,15 @@ class ApiClient {
   }
 
   // ✅ Content-related methods
-  async getContents(limit = 20, offset = 0, topicId?: string) {
+  async getContents(limit = 20, cursor?: string | null, topicId?: string) {
     const params = new URLSearchParams({
       limit: limit.toString(),
-      offset: offset.toString(),
     });
 
+    if (cursor) {
+      params.append('cursor', cursor);
+    }
+
     if (topicId) {
       params.append('topic_id', topicId);
     }
@@ -233,6 +237,20 @@ class ApiClient {
     }
   }
 
+  async recordInteractionsBatch(
+    interactions: { content_id: string; interaction_type: string; interaction_value: number }[]
+  ) {
+    console.log(`🎯 API Client: Recording ${interactions.length} interactions in one batch`);
+    try {
+      const result = await this.post('/api/interactions/batch', interactions);
+      console.log(`✅ API Client: Interaction batch recorded:`, result);
+      return result;
+    } catch (error) {
+      console.error(`❌ API Client: Failed to record interaction batch:`, error);
+      throw error;
+    }
+  }
+
   async getUserStats() {
     return this.get('/api/interactions/stats');
   }
@@ -265,16 +283,21 @@ class ApiClient {
     return this.get('/api/user/coins');
   }
 
-  async addUserCoins(amount: number, reason: string) {
-    return this.post('/api/user/coins/add', { amount, reason });
+  // Retrying with the same idempotencyKey applies the operation only once
+  async addUserCoins(amount: number, reason: string, idempotencyKey?: string) {
+    return this.post('/api/user/coins/add', { amount, reason, idempotency_key: idempotencyKey });
   }
 
-  async spendUserCoins(amount: number, reason: string) {
-    return this.post('/api/user/coins/spend', { amount, reason });
+  async spendUserCoins(amount: number, reason: string, idempotencyKey?: string) {
+    return this.post('/api/user/coins/spend', { amount, reason, idempotency_key: idempotencyKey });
   }
 
-  async getRecommendations(limit = 10) {
-    return this.get(`/api/recommendations?limit=${limit}`);
+  async getRecommendations(limit = 10, cursor?: string | null) {
+    const params = new URLSearchParams({ limit: limit.toString() });
+    if (cursor) {
+      params.append('cursor', cursor);
+    }
+    return this.get(`/api/recommendations?${params}`);
   }
 
   async createContent(content: {
@@ -337,7 +360,23 @@ class ApiClient {
   }
 
   async getAvailableVoices(): Promise<any> {
-    return this.get('/api/tts/voices');
+    // Revalidate with the ETag from the last response; a 304 reuses the cached list.
+    // The whole response goes through handleRequest for its error mapping.
+    const response = await this.handleRequest<AxiosResponse>(
+      this.axiosInstance
+        .get('/api/tts/voices', {
+          headers: this.voicesCache ? { 'If-None-Match': this.voicesCache.etag } : undefined,
+          validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+        })
+        .then((fullResponse) => ({ data: fullResponse }))
+    );
+
+    if (response.status === 304 && this.voicesCache) {
+      return this.voicesCache.data;
+    }
+    const etag = response.headers['etag'];
+    this.voicesCache = etag ? { etag, data: response.data } : null;
+    return response.data;
   }
 
   // ✅ Streak-related methods  
@@ -0,0 +1,77 @@
+-- Personalized feed in a single query.
+-- Replaces the four sequential round-trips in GET /api/contents (preferences,
+-- interacted ids, topic content ids, contents) and the unbounded IN / NOT IN
+-- id lists built in Python.
+
+-- Anti-join against a user's interactions
+CREATE INDEX IF NOT EXISTS idx_user_interactions_user_content
+ON user_interactions(user_id, content_id);
+
+-- Topic lookups by content for the preferred-topics semi-join
+CREATE INDEX IF NOT EXISTS idx_content_topics_content_topic
+ON content_topics(content_id, topic_id);
+
+CREATE OR REPLACE FUNCTION get_personalized_feed(
+    p_user_id UUID,
+    p_limit INTEGER DEFAULT 20,
+    p_offset INTEGER DEFAULT 0,
+    p_min_points INTEGER DEFAULT 50
+)
+RETURNS TABLE (
+    id UUID,
+    title TEXT,
+    summary TEXT,
+    content_type TEXT,
+    media_url TEXT,
+    source_url TEXT,
+    created_at TIMESTAMP WITH TIME ZONE
+)
+LANGUAGE sql
+STABLE
+AS $$
+    WITH unseen AS (
+        SELECT c.*
+        FROM contents c
+        WHERE NOT EXISTS (
+            SELECT 1 FROM user_interactions ui
+            WHERE ui.user_id = p_user_id AND ui.content_id = c.id
+        )
+    ),
+    preferred_unseen AS (
+        SELECT u.*
+        FROM unseen u
+        WHERE EXISTS (
+            SELECT 1
+            FROM content_topics ct
+            JOIN user_topic_preferences utp ON utp.topic_id = ct.topic_id
+            WHERE ct.content_id = u.id
+              AND utp.user_id = p_user_id
+              AND utp.points >= p_min_points
+        )
+    ),
+    -- Fall back to general content only when no fresh preferred content is left
+    candidates AS (
+        SELECT * FROM preferred_unseen
+        UNION ALL
+        SELECT * FROM unseen
+        WHERE NOT EXISTS (SELECT 1 FROM preferred_unseen)
+    )
+    SELECT
+        c.id::uuid,
+        c.title::text,
+        c.summary::text,
+        c.content_type::text,
+        c.media_url::text,
+        c.source_url::text,
+        c.created_at::timestamptz
+    FROM candidates c
+    ORDER BY c.created_at ASC
+    LIMIT p_limit
+    OFFSET p_offset;
+$$;
+
+COMMENT ON FUNCTION get_personalized_feed IS 'One page of unseen content for a user, preferred topics first';
+
+-- Only the backend (service role) may read another user's feed
+REVOKE EXECUTE ON FUNCTION get_personalized_feed(UUID, INTEGER, INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION get_personalized_feed(UUID, INTEGER, INTEGER, INTEGER) TO service_role;
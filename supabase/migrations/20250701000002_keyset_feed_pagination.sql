@@ -0,0 +1,141 @@
+-- Keyset (cursor) pagination for the feed and recommendations.
+-- OFFSET pagination got slower with every page and skipped or repeated items
+-- whenever new interactions changed the excluded set between pages. Pages now
+-- resume strictly after the last (created_at, id) the client received.
+
+CREATE INDEX IF NOT EXISTS idx_contents_created_id
+ON contents(created_at, id);
+
+DROP FUNCTION IF EXISTS get_personalized_feed(UUID, INTEGER, INTEGER, INTEGER);
+
+-- The feed walks preferred-topic content first ('preferred' phase) and then
+-- the remaining unseen content ('general' phase). The phase is part of the
+-- cursor so a page can cross from one to the other.
+CREATE OR REPLACE FUNCTION get_personalized_feed(
+    p_user_id UUID,
+    p_limit INTEGER DEFAULT 20,
+    p_phase TEXT DEFAULT 'preferred',
+    p_after_created_at TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    p_after_id UUID DEFAULT NULL,
+    p_min_points INTEGER DEFAULT 50
+)
+RETURNS TABLE (
+    id UUID,
+    title TEXT,
+    summary TEXT,
+    content_type TEXT,
+    media_url TEXT,
+    source_url TEXT,
+    created_at TIMESTAMP WITH TIME ZONE,
+    phase TEXT
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_returned INTEGER := 0;
+BEGIN
+    IF p_phase = 'preferred' THEN
+        RETURN QUERY
+        SELECT c.id::uuid, c.title::text, c.summary::text, c.content_type::text,
+               c.media_url::text, c.source_url::text, c.created_at::timestamptz,
+               'preferred'::text
+        FROM contents c
+        WHERE EXISTS (
+                SELECT 1
+                FROM content_topics ct
+                JOIN user_topic_preferences utp ON utp.topic_id = ct.topic_id
+                WHERE ct.content_id = c.id
+                  AND utp.user_id = p_user_id
+                  AND utp.points >= p_min_points
+            )
+          AND NOT EXISTS (
+                SELECT 1 FROM user_interactions ui
+                WHERE ui.user_id = p_user_id AND ui.content_id = c.id
+            )
+          AND (p_after_created_at IS NULL OR (c.created_at, c.id) > (p_after_created_at, p_after_id))
+        ORDER BY c.created_at, c.id
+        LIMIT p_limit;
+
+        GET DIAGNOSTICS v_returned = ROW_COUNT;
+        IF v_returned >= p_limit THEN
+            RETURN;
+        END IF;
+
+        -- Preferred content is exhausted, continue with general content from the start
+        p_after_created_at := NULL;
+        p_after_id := NULL;
+    END IF;
+
+    RETURN QUERY
+    SELECT c.id::uuid, c.title::text, c.summary::text, c.content_type::text,
+           c.media_url::text, c.source_url::text, c.created_at::timestamptz,
+           'general'::text
+    FROM contents c
+    WHERE NOT EXISTS (
+            SELECT 1
+            FROM content_topics ct
+            JOIN user_topic_preferences utp ON utp.topic_id = ct.topic_id
+            WHERE ct.content_id = c.id
+              AND utp.user_id = p_user_id
+              AND utp.points >= p_min_points
+        )
+      AND NOT EXISTS (
+            SELECT 1 FROM user_interactions ui
+            WHERE ui.user_id = p_user_id AND ui.content_id = c.id
+        )
+      AND (p_after_created_at IS NULL OR (c.created_at, c.id) > (p_after_created_at, p_after_id))
+    ORDER BY c.created_at, c.id
+    LIMIT p_limit - v_returned;
+END;
+$$;
+
+COMMENT ON FUNCTION get_personalized_feed IS 'One keyset page of unseen content for a user, preferred topics first';
+
+REVOKE EXECUTE ON FUNCTION get_personalized_feed(UUID, INTEGER, TEXT, TIMESTAMP WITH TIME ZONE, UUID, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION get_personalized_feed(UUID, INTEGER, TEXT, TIMESTAMP WITH TIME ZONE, UUID, INTEGER) TO service_role;
+
+-- Recommendations: newest content in the user's preferred topics (or newest
+-- overall when they have none), paged backwards from the cursor.
+CREATE OR REPLACE FUNCTION get_recommended_contents(
+    p_user_id UUID,
+    p_limit INTEGER DEFAULT 10,
+    p_before_created_at TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    p_before_id UUID DEFAULT NULL,
+    p_min_score DOUBLE PRECISION DEFAULT 0.3
+)
+RETURNS TABLE (
+    id UUID,
+    title TEXT,
+    summary TEXT,
+    content_type TEXT,
+    media_url TEXT,
+    source_url TEXT,
+    created_at TIMESTAMP WITH TIME ZONE
+)
+LANGUAGE sql
+STABLE
+AS $$
+    WITH preferred_contents AS (
+        SELECT DISTINCT ct.content_id
+        FROM content_topics ct
+        JOIN user_topic_preferences utp ON utp.topic_id = ct.topic_id
+        WHERE utp.user_id = p_user_id
+          AND utp.preference_score > p_min_score
+    )
+    SELECT c.id::uuid, c.title::text, c.summary::text, c.content_type::text,
+           c.media_url::text, c.source_url::text, c.created_at::timestamptz
+    FROM contents c
+    WHERE (
+            NOT EXISTS (SELECT 1 FROM preferred_contents)
+            OR c.id IN (SELECT content_id FROM preferred_contents)
+        )
+      AND (p_before_created_at IS NULL OR (c.created_at, c.id) < (p_before_created_at, p_before_id))
+    ORDER BY c.created_at DESC, c.id DESC
+    LIMIT p_limit;
+$$;
+
+COMMENT ON FUNCTION get_recommended_contents IS 'One keyset page of recommended content, newest first';
+
+REVOKE EXECUTE ON FUNCTION get_recommended_contents(UUID, INTEGER, TIMESTAMP WITH TIME ZONE, UUID, DOUBLE PRECISION) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION get_recommended_contents(UUID, INTEGER, TIMESTAMP WITH TIME ZONE, UUID, DOUBLE PRECISION) TO service_role;
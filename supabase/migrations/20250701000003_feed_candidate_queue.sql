@@ -0,0 +1,287 @@
+-- Precomputed per-user feed candidate queue.
+-- The backend refills it in the background (after preference changes or when
+-- it runs low) and GET /api/contents just pops the next page, so feed latency
+-- no longer depends on catalogue size or interaction history length. While a
+-- queue is cold or drained the API computes pages with get_personalized_feed()
+-- and records them as served here, so the queue and the computed feed never
+-- hand out the same item twice.
+
+CREATE TABLE IF NOT EXISTS user_feed_queue (
+    user_id UUID NOT NULL,
+    content_id UUID NOT NULL REFERENCES contents(id) ON DELETE CASCADE,
+    position BIGINT NOT NULL,
+    served_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (user_id, content_id)
+);
+
+COMMENT ON TABLE user_feed_queue IS 'Ordered feed candidates per user, popped by GET /api/contents';
+COMMENT ON COLUMN user_feed_queue.position IS 'Serving order within the user''s queue';
+COMMENT ON COLUMN user_feed_queue.served_at IS 'When the item was handed to the client; NULL while still queued';
+
+CREATE INDEX IF NOT EXISTS idx_user_feed_queue_next
+ON user_feed_queue(user_id, position)
+WHERE served_at IS NULL;
+
+-- Only the backend (service role) touches the queue
+ALTER TABLE user_feed_queue ENABLE ROW LEVEL SECURITY;
+
+-- Top the queue up to p_target_size candidates: preferred-topic content first,
+-- then general content, never anything the user interacted with or was
+-- already served recently. p_reset discards unserved items first (used when
+-- preferences change). Returns one row with the number of unserved items queued.
+CREATE OR REPLACE FUNCTION refill_feed_queue(
+    p_user_id UUID,
+    p_target_size INTEGER DEFAULT 200,
+    p_min_points INTEGER DEFAULT 50,
+    p_reset BOOLEAN DEFAULT FALSE,
+    p_served_retention INTERVAL DEFAULT INTERVAL '1 day'
+)
+RETURNS TABLE (
+    queued INTEGER
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_queued INTEGER;
+    v_last_position BIGINT;
+    v_added INTEGER;
+BEGIN
+    -- One refill per user at a time
+    PERFORM pg_advisory_xact_lock(hashtext('user_feed_queue:' || p_user_id::text));
+
+    -- Forget items served long ago so unseen content can come around again,
+    -- and anything the user has interacted with since it was queued
+    DELETE FROM user_feed_queue q
+    WHERE q.user_id = p_user_id
+      AND (
+            (p_reset AND q.served_at IS NULL)
+            OR q.served_at < NOW() - p_served_retention
+            OR EXISTS (
+                SELECT 1 FROM user_interactions ui
+                WHERE ui.user_id = p_user_id AND ui.content_id = q.content_id
+            )
+        );
+
+    SELECT COUNT(*) FILTER (WHERE q.served_at IS NULL), COALESCE(MAX(q.position), 0)
+    INTO v_queued, v_last_position
+    FROM user_feed_queue q
+    WHERE q.user_id = p_user_id;
+
+    IF v_queued >= p_target_size THEN
+        RETURN QUERY SELECT v_queued;
+        RETURN;
+    END IF;
+
+    INSERT INTO user_feed_queue (user_id, content_id, position)
+    SELECT p_user_id, candidate.id,
+           v_last_position + ROW_NUMBER() OVER (
+               ORDER BY candidate.preferred DESC, candidate.created_at, candidate.id
+           )
+    FROM (
+        SELECT c.id, c.created_at,
+               EXISTS (
+                   SELECT 1
+                   FROM content_topics ct
+                   JOIN user_topic_preferences utp ON utp.topic_id = ct.topic_id
+                   WHERE ct.content_id = c.id
+                     AND utp.user_id = p_user_id
+                     AND utp.points >= p_min_points
+               ) AS preferred
+        FROM contents c
+        WHERE NOT EXISTS (
+                SELECT 1 FROM user_interactions ui
+                WHERE ui.user_id = p_user_id AND ui.content_id = c.id
+            )
+          AND NOT EXISTS (
+                SELECT 1 FROM user_feed_queue q
+                WHERE q.user_id = p_user_id AND q.content_id = c.id
+            )
+        ORDER BY preferred DESC, c.created_at, c.id
+        LIMIT p_target_size - v_queued
+    ) candidate;
+
+    GET DIAGNOSTICS v_added = ROW_COUNT;
+    RETURN QUERY SELECT v_queued + v_added;
+END;
+$$;
+
+-- Hand out the next p_limit queued items and mark them served. Each row also
+-- carries how many unserved items are left so the caller knows when to refill.
+CREATE OR REPLACE FUNCTION pop_feed_queue(
+    p_user_id UUID,
+    p_limit INTEGER DEFAULT 20
+)
+RETURNS TABLE (
+    id UUID,
+    title TEXT,
+    summary TEXT,
+    content_type TEXT,
+    media_url TEXT,
+    source_url TEXT,
+    created_at TIMESTAMP WITH TIME ZONE,
+    queue_remaining INTEGER
+)
+LANGUAGE sql
+AS $$
+    WITH next_items AS (
+        SELECT q.content_id, q.position
+        FROM user_feed_queue q
+        WHERE q.user_id = p_user_id
+          AND q.served_at IS NULL
+          AND NOT EXISTS (
+                SELECT 1 FROM user_interactions ui
+                WHERE ui.user_id = p_user_id AND ui.content_id = q.content_id
+            )
+        ORDER BY q.position
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    ),
+    served AS (
+        UPDATE user_feed_queue q
+        SET served_at = NOW()
+        FROM next_items n
+        WHERE q.user_id = p_user_id AND q.content_id = n.content_id
+        RETURNING q.content_id, q.position
+    ),
+    remaining AS (
+        -- The snapshot still sees the popped rows as unserved
+        SELECT (COUNT(*) - (SELECT COUNT(*) FROM served))::integer AS n
+        FROM user_feed_queue q
+        WHERE q.user_id = p_user_id AND q.served_at IS NULL
+    )
+    SELECT c.id::uuid, c.title::text, c.summary::text, c.content_type::text,
+           c.media_url::text, c.source_url::text, c.created_at::timestamptz,
+           (SELECT n FROM remaining)
+    FROM served s
+    JOIN contents c ON c.id = s.content_id
+    ORDER BY s.position;
+$$;
+
+-- The computed feed: same definition, also skipping anything already served
+-- from the queue (its interactions may still be buffered in the backend)
+CREATE OR REPLACE FUNCTION get_personalized_feed(
+    p_user_id UUID,
+    p_limit INTEGER DEFAULT 20,
+    p_phase TEXT DEFAULT 'preferred',
+    p_after_created_at TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    p_after_id UUID DEFAULT NULL,
+    p_min_points INTEGER DEFAULT 50
+)
+RETURNS TABLE (
+    id UUID,
+    title TEXT,
+    summary TEXT,
+    content_type TEXT,
+    media_url TEXT,
+    source_url TEXT,
+    created_at TIMESTAMP WITH TIME ZONE,
+    phase TEXT
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_returned INTEGER := 0;
+BEGIN
+    IF p_phase = 'preferred' THEN
+        RETURN QUERY
+        SELECT c.id::uuid, c.title::text, c.summary::text, c.content_type::text,
+               c.media_url::text, c.source_url::text, c.created_at::timestamptz,
+               'preferred'::text
+        FROM contents c
+        WHERE EXISTS (
+                SELECT 1
+                FROM content_topics ct
+                JOIN user_topic_preferences utp ON utp.topic_id = ct.topic_id
+                WHERE ct.content_id = c.id
+                  AND utp.user_id = p_user_id
+                  AND utp.points >= p_min_points
+            )
+          AND NOT EXISTS (
+                SELECT 1 FROM user_interactions ui
+                WHERE ui.user_id = p_user_id AND ui.content_id = c.id
+            )
+          AND NOT EXISTS (
+                SELECT 1 FROM user_feed_queue q
+                WHERE q.user_id = p_user_id AND q.content_id = c.id AND q.served_at IS NOT NULL
+            )
+          AND (p_after_created_at IS NULL OR (c.created_at, c.id) > (p_after_created_at, p_after_id))
+        ORDER BY c.created_at, c.id
+        LIMIT p_limit;
+
+        GET DIAGNOSTICS v_returned = ROW_COUNT;
+        IF v_returned >= p_limit THEN
+            RETURN;
+        END IF;
+
+        -- Preferred content is exhausted, continue with general content from the start
+        p_after_created_at := NULL;
+        p_after_id := NULL;
+    END IF;
+
+    RETURN QUERY
+    SELECT c.id::uuid, c.title::text, c.summary::text, c.content_type::text,
+           c.media_url::text, c.source_url::text, c.created_at::timestamptz,
+           'general'::text
+    FROM contents c
+    WHERE NOT EXISTS (
+            SELECT 1
+            FROM content_topics ct
+            JOIN user_topic_preferences utp ON utp.topic_id = ct.topic_id
+            WHERE ct.content_id = c.id
+              AND utp.user_id = p_user_id
+              AND utp.points >= p_min_points
+        )
+      AND NOT EXISTS (
+            SELECT 1 FROM user_interactions ui
+            WHERE ui.user_id = p_user_id AND ui.content_id = c.id
+        )
+      AND NOT EXISTS (
+            SELECT 1 FROM user_feed_queue q
+            WHERE q.user_id = p_user_id AND q.content_id = c.id AND q.served_at IS NOT NULL
+        )
+      AND (p_after_created_at IS NULL OR (c.created_at, c.id) > (p_after_created_at, p_after_id))
+    ORDER BY c.created_at, c.id
+    LIMIT p_limit - v_returned;
+END;
+$$;
+
+COMMENT ON FUNCTION get_personalized_feed IS 'One keyset page of unseen content for a user, preferred topics first';
+
+-- Record items served outside the queue, so refill_feed_queue() does not
+-- queue them and get_personalized_feed() does not return them again.
+-- Returns how many items were marked.
+CREATE OR REPLACE FUNCTION mark_feed_served(
+    p_user_id UUID,
+    p_content_ids UUID[]
+)
+RETURNS TABLE (
+    marked INTEGER
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_marked INTEGER;
+BEGIN
+    -- Position only orders unserved items, served ones never use it
+    INSERT INTO user_feed_queue (user_id, content_id, position, served_at)
+    SELECT p_user_id, ids.content_id, 0, NOW()
+    FROM unnest(p_content_ids) AS ids(content_id)
+    ON CONFLICT (user_id, content_id) DO UPDATE
+    SET served_at = NOW()
+    WHERE user_feed_queue.served_at IS NULL;
+
+    GET DIAGNOSTICS v_marked = ROW_COUNT;
+    RETURN QUERY SELECT v_marked;
+END;
+$$;
+
+COMMENT ON FUNCTION mark_feed_served IS 'Record content served to a user outside the feed queue';
+
+REVOKE EXECUTE ON FUNCTION refill_feed_queue(UUID, INTEGER, INTEGER, BOOLEAN, INTERVAL) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION refill_feed_queue(UUID, INTEGER, INTEGER, BOOLEAN, INTERVAL) TO service_role;
+REVOKE EXECUTE ON FUNCTION pop_feed_queue(UUID, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION pop_feed_queue(UUID, INTEGER) TO service_role;
+REVOKE EXECUTE ON FUNCTION mark_feed_served(UUID, UUID[]) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION mark_feed_served(UUID, UUID[]) TO service_role;
@@ -0,0 +1,260 @@
+-- Incrementally maintained per-user seen-content set.
+-- user_interactions holds up to three rows per (content, engagement type), so
+-- the feed's "already seen" anti-join scanned many rows per content piece.
+-- user_seen_contents keeps exactly one row per content the user has
+-- interacted with, written by a trigger as interactions are recorded, and the
+-- feed functions probe its primary key instead.
+
+CREATE TABLE IF NOT EXISTS user_seen_contents (
+    user_id UUID NOT NULL,
+    content_id UUID NOT NULL REFERENCES contents(id) ON DELETE CASCADE,
+    first_seen_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (user_id, content_id)
+);
+
+COMMENT ON TABLE user_seen_contents IS 'One row per content a user has interacted with, maintained from user_interactions';
+
+-- Only the backend (service role) reads the set
+ALTER TABLE user_seen_contents ENABLE ROW LEVEL SECURITY;
+
+CREATE OR REPLACE FUNCTION track_seen_content()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    INSERT INTO user_seen_contents (user_id, content_id, first_seen_at)
+    VALUES (NEW.user_id, NEW.content_id, COALESCE(NEW.created_at, NOW()))
+    ON CONFLICT (user_id, content_id) DO NOTHING;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_user_interactions_track_seen ON user_interactions;
+CREATE TRIGGER trg_user_interactions_track_seen
+AFTER INSERT ON user_interactions
+FOR EACH ROW
+EXECUTE FUNCTION track_seen_content();
+
+-- Backfill from existing history
+INSERT INTO user_seen_contents (user_id, content_id, first_seen_at)
+SELECT user_id, content_id, MIN(created_at)
+FROM user_interactions
+GROUP BY user_id, content_id
+ON CONFLICT (user_id, content_id) DO NOTHING;
+
+-- Feed functions: same definitions, anti-join against the seen set
+
+CREATE OR REPLACE FUNCTION get_personalized_feed(
+    p_user_id UUID,
+    p_limit INTEGER DEFAULT 20,
+    p_phase TEXT DEFAULT 'preferred',
+    p_after_created_at TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    p_after_id UUID DEFAULT NULL,
+    p_min_points INTEGER DEFAULT 50
+)
+RETURNS TABLE (
+    id UUID,
+    title TEXT,
+    summary TEXT,
+    content_type TEXT,
+    media_url TEXT,
+    source_url TEXT,
+    created_at TIMESTAMP WITH TIME ZONE,
+    phase TEXT
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_returned INTEGER := 0;
+BEGIN
+    IF p_phase = 'preferred' THEN
+        RETURN QUERY
+        SELECT c.id::uuid, c.title::text, c.summary::text, c.content_type::text,
+               c.media_url::text, c.source_url::text, c.created_at::timestamptz,
+               'preferred'::text
+        FROM contents c
+        WHERE EXISTS (
+                SELECT 1
+                FROM content_topics ct
+                JOIN user_topic_preferences utp ON utp.topic_id = ct.topic_id
+                WHERE ct.content_id = c.id
+                  AND utp.user_id = p_user_id
+                  AND utp.points >= p_min_points
+            )
+          AND NOT EXISTS (
+                SELECT 1 FROM user_seen_contents s
+                WHERE s.user_id = p_user_id AND s.content_id = c.id
+            )
+          AND NOT EXISTS (
+                SELECT 1 FROM user_feed_queue q
+                WHERE q.user_id = p_user_id AND q.content_id = c.id AND q.served_at IS NOT NULL
+            )
+          AND (p_after_created_at IS NULL OR (c.created_at, c.id) > (p_after_created_at, p_after_id))
+        ORDER BY c.created_at, c.id
+        LIMIT p_limit;
+
+        GET DIAGNOSTICS v_returned = ROW_COUNT;
+        IF v_returned >= p_limit THEN
+            RETURN;
+        END IF;
+
+        -- Preferred content is exhausted, continue with general content from the start
+        p_after_created_at := NULL;
+        p_after_id := NULL;
+    END IF;
+
+    RETURN QUERY
+    SELECT c.id::uuid, c.title::text, c.summary::text, c.content_type::text,
+           c.media_url::text, c.source_url::text, c.created_at::timestamptz,
+           'general'::text
+    FROM contents c
+    WHERE NOT EXISTS (
+            SELECT 1
+            FROM content_topics ct
+            JOIN user_topic_preferences utp ON utp.topic_id = ct.topic_id
+            WHERE ct.content_id = c.id
+              AND utp.user_id = p_user_id
+              AND utp.points >= p_min_points
+        )
+      AND NOT EXISTS (
+            SELECT 1 FROM user_seen_contents s
+            WHERE s.user_id = p_user_id AND s.content_id = c.id
+        )
+      AND NOT EXISTS (
+            SELECT 1 FROM user_feed_queue q
+            WHERE q.user_id = p_user_id AND q.content_id = c.id AND q.served_at IS NOT NULL
+        )
+      AND (p_after_created_at IS NULL OR (c.created_at, c.id) > (p_after_created_at, p_after_id))
+    ORDER BY c.created_at, c.id
+    LIMIT p_limit - v_returned;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION refill_feed_queue(
+    p_user_id UUID,
+    p_target_size INTEGER DEFAULT 200,
+    p_min_points INTEGER DEFAULT 50,
+    p_reset BOOLEAN DEFAULT FALSE,
+    p_served_retention INTERVAL DEFAULT INTERVAL '1 day'
+)
+RETURNS TABLE (
+    queued INTEGER
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_queued INTEGER;
+    v_last_position BIGINT;
+    v_added INTEGER;
+BEGIN
+    -- One refill per user at a time
+    PERFORM pg_advisory_xact_lock(hashtext('user_feed_queue:' || p_user_id::text));
+
+    -- Forget items served long ago so unseen content can come around again,
+    -- and anything the user has interacted with since it was queued
+    DELETE FROM user_feed_queue q
+    WHERE q.user_id = p_user_id
+      AND (
+            (p_reset AND q.served_at IS NULL)
+            OR q.served_at < NOW() - p_served_retention
+            OR EXISTS (
+                SELECT 1 FROM user_seen_contents s
+                WHERE s.user_id = p_user_id AND s.content_id = q.content_id
+            )
+        );
+
+    SELECT COUNT(*) FILTER (WHERE q.served_at IS NULL), COALESCE(MAX(q.position), 0)
+    INTO v_queued, v_last_position
+    FROM user_feed_queue q
+    WHERE q.user_id = p_user_id;
+
+    IF v_queued >= p_target_size THEN
+        RETURN QUERY SELECT v_queued;
+        RETURN;
+    END IF;
+
+    INSERT INTO user_feed_queue (user_id, content_id, position)
+    SELECT p_user_id, candidate.id,
+           v_last_position + ROW_NUMBER() OVER (
+               ORDER BY candidate.preferred DESC, candidate.created_at, candidate.id
+           )
+    FROM (
+        SELECT c.id, c.created_at,
+               EXISTS (
+                   SELECT 1
+                   FROM content_topics ct
+                   JOIN user_topic_preferences utp ON utp.topic_id = ct.topic_id
+                   WHERE ct.content_id = c.id
+                     AND utp.user_id = p_user_id
+                     AND utp.points >= p_min_points
+               ) AS preferred
+        FROM contents c
+        WHERE NOT EXISTS (
+                SELECT 1 FROM user_seen_contents s
+                WHERE s.user_id = p_user_id AND s.content_id = c.id
+            )
+          AND NOT EXISTS (
+                SELECT 1 FROM user_feed_queue q
+                WHERE q.user_id = p_user_id AND q.content_id = c.id
+            )
+        ORDER BY preferred DESC, c.created_at, c.id
+        LIMIT p_target_size - v_queued
+    ) candidate;
+
+    GET DIAGNOSTICS v_added = ROW_COUNT;
+    RETURN QUERY SELECT v_queued + v_added;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION pop_feed_queue(
+    p_user_id UUID,
+    p_limit INTEGER DEFAULT 20
+)
+RETURNS TABLE (
+    id UUID,
+    title TEXT,
+    summary TEXT,
+    content_type TEXT,
+    media_url TEXT,
+    source_url TEXT,
+    created_at TIMESTAMP WITH TIME ZONE,
+    queue_remaining INTEGER
+)
+LANGUAGE sql
+AS $$
+    WITH next_items AS (
+        SELECT q.content_id, q.position
+        FROM user_feed_queue q
+        WHERE q.user_id = p_user_id
+          AND q.served_at IS NULL
+          AND NOT EXISTS (
+                SELECT 1 FROM user_seen_contents s
+                WHERE s.user_id = p_user_id AND s.content_id = q.content_id
+            )
+        ORDER BY q.position
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    ),
+    served AS (
+        UPDATE user_feed_queue q
+        SET served_at = NOW()
+        FROM next_items n
+        WHERE q.user_id = p_user_id AND q.content_id = n.content_id
+        RETURNING q.content_id, q.position
+    ),
+    remaining AS (
+        -- The snapshot still sees the popped rows as unserved
+        SELECT (COUNT(*) - (SELECT COUNT(*) FROM served))::integer AS n
+        FROM user_feed_queue q
+        WHERE q.user_id = p_user_id AND q.served_at IS NULL
+    )
+    SELECT c.id::uuid, c.title::text, c.summary::text, c.content_type::text,
+           c.media_url::text, c.source_url::text, c.created_at::timestamptz,
+           (SELECT n FROM remaining)
+    FROM served s
+    JOIN contents c ON c.id = s.content_id
+    ORDER BY s.position;
+$$;
@@ -0,0 +1,116 @@
+-- Batched interaction ingestion.
+-- The API used to SELECT for duplicates and INSERT one row per event. Events
+-- are now buffered by the backend and written in multi-row batches through
+-- ingest_interactions(), with the per-type caps (3 rows for engagement
+-- events, 1 for everything else) enforced by a unique constraint.
+
+ALTER TABLE user_interactions
+ADD COLUMN IF NOT EXISTS occurrence SMALLINT NOT NULL DEFAULT 1;
+
+COMMENT ON COLUMN user_interactions.occurrence IS '1-based count of this interaction type for the user and content, capped per type';
+
+-- Number existing rows so the unique constraint can be added
+UPDATE user_interactions ui
+SET occurrence = numbered.occurrence
+FROM (
+    SELECT id, ROW_NUMBER() OVER (
+        PARTITION BY user_id, content_id, interaction_type
+        ORDER BY created_at, id
+    ) AS occurrence
+    FROM user_interactions
+) numbered
+WHERE ui.id = numbered.id
+  AND ui.occurrence IS DISTINCT FROM numbered.occurrence;
+
+ALTER TABLE user_interactions
+ADD CONSTRAINT user_interactions_occurrence_key
+UNIQUE (user_id, content_id, interaction_type, occurrence);
+
+-- Insert a batch of events in one statement. p_events is a JSON array of
+-- {user_id, content_id, interaction_type, interaction_value}. Returns one row
+-- per event (by 0-based array index) with its status: 'recorded', 'capped'
+-- (the key already has its type's limit of rows) or 'conflict' (the slot was
+-- taken by a writer outside this function). A transaction-scoped advisory
+-- lock per (user, content, type) serialises concurrent batches, so two of
+-- them cannot number the same key alike and lose an event that was under
+-- its cap.
+CREATE OR REPLACE FUNCTION ingest_interactions(p_events JSONB)
+RETURNS TABLE (
+    event_index INTEGER,
+    status TEXT
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_lock BIGINT;
+BEGIN
+    -- In a fixed order so concurrent batches cannot deadlock
+    FOR v_lock IN
+        SELECT DISTINCT hashtextextended(
+                   (e.value->>'user_id') || ':' || (e.value->>'content_id') || ':' || (e.value->>'interaction_type'),
+                   0
+               )
+        FROM jsonb_array_elements(p_events) AS e(value)
+        ORDER BY 1
+    LOOP
+        PERFORM pg_advisory_xact_lock(v_lock);
+    END LOOP;
+
+    -- Runs after the locks are held, so it sees every row written by a
+    -- batch that held them before
+    RETURN QUERY
+    WITH events AS (
+        SELECT (e.ordinality - 1)::integer AS idx,
+               (e.value->>'user_id')::uuid AS user_id,
+               (e.value->>'content_id')::uuid AS content_id,
+               e.value->>'interaction_type' AS interaction_type,
+               (e.value->>'interaction_value')::integer AS interaction_value
+        FROM jsonb_array_elements(p_events) WITH ORDINALITY AS e(value, ordinality)
+    ),
+    numbered AS (
+        SELECT ev.*,
+               COALESCE((
+                   SELECT MAX(ui.occurrence)
+                   FROM user_interactions ui
+                   WHERE ui.user_id = ev.user_id
+                     AND ui.content_id = ev.content_id
+                     AND ui.interaction_type = ev.interaction_type
+               ), 0) + ROW_NUMBER() OVER (
+                   PARTITION BY ev.user_id, ev.content_id, ev.interaction_type
+                   ORDER BY ev.idx
+               ) AS occurrence,
+               CASE
+                   WHEN ev.interaction_type IN ('view', 'skip', 'partial', 'interested', 'engaged') THEN 3
+                   ELSE 1
+               END AS occurrence_limit
+        FROM events ev
+    ),
+    inserted AS (
+        INSERT INTO user_interactions (user_id, content_id, interaction_type, interaction_value, occurrence)
+        SELECT n.user_id, n.content_id, n.interaction_type, n.interaction_value, n.occurrence
+        FROM numbered n
+        WHERE n.occurrence <= n.occurrence_limit
+        -- Only a writer bypassing this function can still take the slot
+        ON CONFLICT (user_id, content_id, interaction_type, occurrence) DO NOTHING
+        RETURNING user_id, content_id, interaction_type, occurrence
+    )
+    SELECT n.idx,
+           CASE
+               WHEN i.user_id IS NOT NULL THEN 'recorded'
+               WHEN n.occurrence > n.occurrence_limit THEN 'capped'
+               ELSE 'conflict'
+           END
+    FROM numbered n
+    LEFT JOIN inserted i
+        ON i.user_id = n.user_id
+       AND i.content_id = n.content_id
+       AND i.interaction_type = n.interaction_type
+       AND i.occurrence = n.occurrence
+    ORDER BY n.idx;
+END;
+$$;
+
+COMMENT ON FUNCTION ingest_interactions IS 'Multi-row insert of interaction events with per-type duplicate caps, serialised per key';
+
+REVOKE EXECUTE ON FUNCTION ingest_interactions(JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION ingest_interactions(JSONB) TO service_role;
@@ -0,0 +1,251 @@
+-- Incrementally maintained per-user counters for badge rules.
+-- Badge checks used to count a user's whole interaction history on every
+-- call. Triggers now keep one small counter row per (user, counter) up to
+-- date as the underlying data is written, and the backend's badge rules
+-- (services/badges.py) compare those counters against thresholds.
+--
+-- Counters:
+--   interaction:<type>  interactions recorded, per interaction type
+--   distinct_facts      distinct contents interacted with
+--   distinct_topics     distinct topics of those contents
+--   saved_contents      contents ever saved
+--   streak_days         longest daily streak reached
+--   max_topic_points    highest preference points in any topic
+--   coins_earned        coins ever added to the balance
+
+CREATE TABLE IF NOT EXISTS user_counters (
+    user_id UUID NOT NULL,
+    counter TEXT NOT NULL,
+    value BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (user_id, counter)
+);
+
+COMMENT ON TABLE user_counters IS 'Per-user counters maintained by triggers, read by badge rules';
+
+-- Only the backend (service role) reads the counters
+ALTER TABLE user_counters ENABLE ROW LEVEL SECURITY;
+
+CREATE TABLE IF NOT EXISTS user_seen_topics (
+    user_id UUID NOT NULL,
+    topic_id UUID NOT NULL,
+    first_seen_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (user_id, topic_id)
+);
+
+COMMENT ON TABLE user_seen_topics IS 'One row per topic a user has seen content from, maintained from user_seen_contents';
+
+ALTER TABLE user_seen_topics ENABLE ROW LEVEL SECURITY;
+
+-- Badges are awarded with ON CONFLICT DO NOTHING, drop any duplicates first
+DELETE FROM user_badges ub
+USING user_badges dup
+WHERE ub.user_id = dup.user_id
+  AND ub.badge_id = dup.badge_id
+  AND ub.ctid > dup.ctid;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_user_badges_user_badge
+ON user_badges(user_id, badge_id);
+
+CREATE OR REPLACE FUNCTION bump_user_counter(p_user_id UUID, p_counter TEXT, p_delta BIGINT)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO user_counters (user_id, counter, value)
+    VALUES (p_user_id, p_counter, p_delta)
+    ON CONFLICT (user_id, counter)
+    DO UPDATE SET value = user_counters.value + EXCLUDED.value, updated_at = NOW();
+$$;
+
+-- Like bump_user_counter but keeps the maximum value seen
+CREATE OR REPLACE FUNCTION raise_user_counter(p_user_id UUID, p_counter TEXT, p_value BIGINT)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO user_counters (user_id, counter, value)
+    VALUES (p_user_id, p_counter, p_value)
+    ON CONFLICT (user_id, counter)
+    DO UPDATE SET value = EXCLUDED.value, updated_at = NOW()
+    WHERE user_counters.value < EXCLUDED.value;
+$$;
+
+CREATE OR REPLACE FUNCTION count_user_interaction()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    PERFORM bump_user_counter(NEW.user_id, 'interaction:' || NEW.interaction_type, 1);
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_user_interactions_count ON user_interactions;
+CREATE TRIGGER trg_user_interactions_count
+AFTER INSERT ON user_interactions
+FOR EACH ROW
+EXECUTE FUNCTION count_user_interaction();
+
+CREATE OR REPLACE FUNCTION count_seen_content()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_new_topics INTEGER;
+BEGIN
+    PERFORM bump_user_counter(NEW.user_id, 'distinct_facts', 1);
+
+    INSERT INTO user_seen_topics (user_id, topic_id, first_seen_at)
+    SELECT NEW.user_id, ct.topic_id, NEW.first_seen_at
+    FROM content_topics ct
+    WHERE ct.content_id = NEW.content_id
+    ON CONFLICT (user_id, topic_id) DO NOTHING;
+
+    GET DIAGNOSTICS v_new_topics = ROW_COUNT;
+    IF v_new_topics > 0 THEN
+        PERFORM bump_user_counter(NEW.user_id, 'distinct_topics', v_new_topics);
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_user_seen_contents_count ON user_seen_contents;
+CREATE TRIGGER trg_user_seen_contents_count
+AFTER INSERT ON user_seen_contents
+FOR EACH ROW
+EXECUTE FUNCTION count_seen_content();
+
+CREATE OR REPLACE FUNCTION count_saved_content()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    PERFORM bump_user_counter(NEW.user_id, 'saved_contents', 1);
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_saved_contents_count ON saved_contents;
+CREATE TRIGGER trg_saved_contents_count
+AFTER INSERT ON saved_contents
+FOR EACH ROW
+EXECUTE FUNCTION count_saved_content();
+
+CREATE OR REPLACE FUNCTION count_topic_points()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    PERFORM raise_user_counter(NEW.user_id, 'max_topic_points', NEW.points);
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_user_topic_preferences_count ON user_topic_preferences;
+CREATE TRIGGER trg_user_topic_preferences_count
+AFTER INSERT OR UPDATE OF points ON user_topic_preferences
+FOR EACH ROW
+EXECUTE FUNCTION count_topic_points();
+
+CREATE OR REPLACE FUNCTION count_profile_progress()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    IF NEW.streak_days IS DISTINCT FROM OLD.streak_days THEN
+        PERFORM raise_user_counter(NEW.user_id, 'streak_days', NEW.streak_days);
+    END IF;
+    IF NEW.total_coins > OLD.total_coins THEN
+        PERFORM bump_user_counter(NEW.user_id, 'coins_earned', NEW.total_coins - OLD.total_coins);
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_profiles_count ON profiles;
+CREATE TRIGGER trg_profiles_count
+AFTER UPDATE OF streak_days, total_coins ON profiles
+FOR EACH ROW
+EXECUTE FUNCTION count_profile_progress();
+
+-- Backfill from existing data
+
+INSERT INTO user_seen_topics (user_id, topic_id, first_seen_at)
+SELECT s.user_id, ct.topic_id, MIN(s.first_seen_at)
+FROM user_seen_contents s
+JOIN content_topics ct ON ct.content_id = s.content_id
+GROUP BY s.user_id, ct.topic_id
+ON CONFLICT (user_id, topic_id) DO NOTHING;
+
+INSERT INTO user_counters (user_id, counter, value)
+SELECT user_id, 'interaction:' || interaction_type, COUNT(*)
+FROM user_interactions
+GROUP BY user_id, interaction_type
+UNION ALL
+SELECT user_id, 'distinct_facts', COUNT(*)
+FROM user_seen_contents
+GROUP BY user_id
+UNION ALL
+SELECT user_id, 'distinct_topics', COUNT(*)
+FROM user_seen_topics
+GROUP BY user_id
+UNION ALL
+SELECT user_id, 'saved_contents', COUNT(*)
+FROM saved_contents
+GROUP BY user_id
+UNION ALL
+SELECT user_id, 'max_topic_points', MAX(points)
+FROM user_topic_preferences
+GROUP BY user_id
+UNION ALL
+SELECT user_id, 'streak_days', streak_days
+FROM profiles
+WHERE streak_days > 0
+UNION ALL
+-- Spending was never recorded, the current balance is the best lower bound
+SELECT user_id, 'coins_earned', total_coins
+FROM profiles
+WHERE total_coins > 0
+ON CONFLICT (user_id, counter) DO UPDATE SET value = EXCLUDED.value, updated_at = NOW();
+
+-- Award every badge whose counter reached its threshold. p_checks is a JSON
+-- array of {user_id, badge_id, counter, threshold}; returns only the badges
+-- that were newly awarded.
+CREATE OR REPLACE FUNCTION award_badges(p_checks JSONB)
+RETURNS TABLE (
+    user_id UUID,
+    badge_id TEXT
+)
+LANGUAGE sql
+AS $$
+    WITH checks AS (
+        SELECT (c.value->>'user_id')::uuid AS user_id,
+               c.value->>'badge_id' AS badge_id,
+               c.value->>'counter' AS counter,
+               (c.value->>'threshold')::bigint AS threshold
+        FROM jsonb_array_elements(p_checks) AS c(value)
+    )
+    INSERT INTO user_badges (user_id, badge_id, earned_at)
+    SELECT DISTINCT ch.user_id, ch.badge_id, NOW()
+    FROM checks ch
+    JOIN user_counters uc ON uc.user_id = ch.user_id AND uc.counter = ch.counter
+    WHERE uc.value >= ch.threshold
+    ON CONFLICT (user_id, badge_id) DO NOTHING
+    RETURNING user_badges.user_id::uuid, user_badges.badge_id::text;
+$$;
+
+COMMENT ON FUNCTION award_badges IS 'Idempotently award badges whose counter thresholds are met';
+
+REVOKE EXECUTE ON FUNCTION bump_user_counter(UUID, TEXT, BIGINT) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION raise_user_counter(UUID, TEXT, BIGINT) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION award_badges(JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION award_badges(JSONB) TO service_role;
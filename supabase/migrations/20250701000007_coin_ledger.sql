@@ -0,0 +1,91 @@
+-- Append-only coin ledger.
+-- Coin operations used to read profiles.total_coins and write back the new
+-- balance, losing updates under concurrent requests. apply_coin_transaction()
+-- now records the operation and moves the balance in one transaction, with
+-- an optional per-user idempotency key so retried requests apply only once.
+
+CREATE TABLE IF NOT EXISTS coin_transactions (
+    id BIGSERIAL PRIMARY KEY,
+    user_id UUID NOT NULL,
+    amount INTEGER NOT NULL CHECK (amount <> 0),
+    balance_after INTEGER,
+    reason TEXT NOT NULL,
+    idempotency_key TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    CONSTRAINT coin_transactions_idempotency_key UNIQUE (user_id, idempotency_key)
+);
+
+COMMENT ON TABLE coin_transactions IS 'Every change to profiles.total_coins; positive amounts add, negative spend';
+COMMENT ON COLUMN coin_transactions.idempotency_key IS 'Client or server supplied key; an operation with a key already used by the user is not applied again';
+
+CREATE INDEX IF NOT EXISTS idx_coin_transactions_user_created
+ON coin_transactions(user_id, created_at DESC);
+
+ALTER TABLE coin_transactions ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their own coin transactions"
+ON coin_transactions FOR SELECT
+USING (auth.uid() = user_id);
+
+-- Add (positive p_amount) or spend (negative p_amount) coins. Spending more
+-- than the balance raises 'insufficient_coins' and a missing profile raises
+-- 'profile_not_found'. Returns the balance after the operation and whether
+-- it was applied now (FALSE when p_idempotency_key was already used, in
+-- which case the original operation's balance and amount are returned).
+CREATE OR REPLACE FUNCTION apply_coin_transaction(
+    p_user_id UUID,
+    p_amount INTEGER,
+    p_reason TEXT,
+    p_idempotency_key TEXT DEFAULT NULL
+)
+RETURNS TABLE (
+    balance INTEGER,
+    amount INTEGER,
+    applied BOOLEAN
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_transaction_id BIGINT;
+    v_balance INTEGER;
+BEGIN
+    -- Claim the idempotency key first; a concurrent request with the same
+    -- key waits here and then sees the conflict
+    INSERT INTO coin_transactions (user_id, amount, reason, idempotency_key)
+    VALUES (p_user_id, p_amount, p_reason, p_idempotency_key)
+    ON CONFLICT ON CONSTRAINT coin_transactions_idempotency_key DO NOTHING
+    RETURNING id INTO v_transaction_id;
+
+    IF v_transaction_id IS NULL THEN
+        RETURN QUERY
+        SELECT t.balance_after, t.amount, FALSE
+        FROM coin_transactions t
+        WHERE t.user_id = p_user_id AND t.idempotency_key = p_idempotency_key;
+        RETURN;
+    END IF;
+
+    UPDATE profiles p
+    SET total_coins = COALESCE(p.total_coins, 0) + p_amount
+    WHERE p.user_id = p_user_id
+      AND COALESCE(p.total_coins, 0) + p_amount >= 0
+    RETURNING p.total_coins INTO v_balance;
+
+    IF NOT FOUND THEN
+        IF NOT EXISTS (SELECT 1 FROM profiles p WHERE p.user_id = p_user_id) THEN
+            RAISE EXCEPTION 'profile_not_found';
+        END IF;
+        RAISE EXCEPTION 'insufficient_coins';
+    END IF;
+
+    UPDATE coin_transactions t
+    SET balance_after = v_balance
+    WHERE t.id = v_transaction_id;
+
+    RETURN QUERY SELECT v_balance, p_amount, TRUE;
+END;
+$$;
+
+COMMENT ON FUNCTION apply_coin_transaction IS 'Atomically add or spend coins and record the operation in coin_transactions';
+
+REVOKE EXECUTE ON FUNCTION apply_coin_transaction(UUID, INTEGER, TEXT, TEXT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION apply_coin_transaction(UUID, INTEGER, TEXT, TEXT) TO service_role;
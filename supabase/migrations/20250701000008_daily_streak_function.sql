@@ -0,0 +1,97 @@
+-- Transactional daily streak update.
+-- POST /api/user/streak/update used to check today's progress, read the
+-- profile, write the new streak and then add milestone coins with separate
+-- round-trips, so a retried request could credit the same day twice.
+-- update_daily_streak() does all of it in one transaction with the profile
+-- row locked, awards milestone coins through the coin ledger with a per-day
+-- idempotency key and evaluates the badge checks passed in by the backend.
+
+CREATE OR REPLACE FUNCTION update_daily_streak(
+    p_user_id UUID,
+    p_threshold INTEGER DEFAULT 4,
+    p_milestone_every INTEGER DEFAULT 7,
+    p_milestone_coins INTEGER DEFAULT 100,
+    p_badge_checks JSONB DEFAULT '[]'::jsonb
+)
+RETURNS TABLE (
+    status TEXT,
+    streak_days INTEGER,
+    previous_streak INTEGER,
+    unique_content_consumed INTEGER,
+    coins_earned INTEGER,
+    new_badges TEXT[]
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_today DATE := (NOW() AT TIME ZONE 'utc')::date;
+    v_streak INTEGER;
+    v_last_date DATE;
+    v_consumed INTEGER;
+    v_new_streak INTEGER;
+    v_coins INTEGER := 0;
+    v_applied BOOLEAN;
+    v_badges TEXT[];
+BEGIN
+    -- Serialises concurrent updates (client retries) for the same user
+    SELECT COALESCE(p.streak_days, 0), p.last_streak_date::date
+    INTO v_streak, v_last_date
+    FROM profiles p
+    WHERE p.user_id = p_user_id
+    FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'profile_not_found';
+    END IF;
+
+    SELECT COUNT(DISTINCT ui.content_id)::integer
+    INTO v_consumed
+    FROM user_interactions ui
+    WHERE ui.user_id = p_user_id
+      AND ui.created_at >= v_today::timestamp AT TIME ZONE 'utc';
+
+    IF v_last_date = v_today THEN
+        RETURN QUERY SELECT 'already_credited'::text, v_streak, v_streak, v_consumed, 0, ARRAY[]::text[];
+        RETURN;
+    END IF;
+
+    IF v_consumed < p_threshold THEN
+        RETURN QUERY SELECT 'threshold_not_met'::text, v_streak, v_streak, v_consumed, 0, ARRAY[]::text[];
+        RETURN;
+    END IF;
+
+    -- Consecutive day continues the streak, anything else starts a new one
+    v_new_streak := CASE WHEN v_last_date = v_today - 1 THEN v_streak + 1 ELSE 1 END;
+
+    UPDATE profiles p
+    SET streak_days = v_new_streak,
+        last_streak_date = v_today
+    WHERE p.user_id = p_user_id;
+
+    IF v_new_streak % p_milestone_every = 0 THEN
+        SELECT t.applied
+        INTO v_applied
+        FROM apply_coin_transaction(
+            p_user_id,
+            p_milestone_coins,
+            p_milestone_every || '-day streak milestone (day ' || v_new_streak || ')',
+            'streak-milestone:' || v_today
+        ) t;
+        IF v_applied THEN
+            v_coins := p_milestone_coins;
+        END IF;
+    END IF;
+
+    -- Counters were updated by triggers above, so the checks see the new streak
+    SELECT COALESCE(array_agg(a.badge_id), ARRAY[]::text[])
+    INTO v_badges
+    FROM award_badges(p_badge_checks) a;
+
+    RETURN QUERY SELECT 'credited'::text, v_new_streak, v_streak, v_consumed, v_coins, v_badges;
+END;
+$$;
+
+COMMENT ON FUNCTION update_daily_streak IS 'Credit today''s streak once, award milestone coins and badges, in one transaction';
+
+REVOKE EXECUTE ON FUNCTION update_daily_streak(UUID, INTEGER, INTEGER, INTEGER, JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION update_daily_streak(UUID, INTEGER, INTEGER, INTEGER, JSONB) TO service_role;
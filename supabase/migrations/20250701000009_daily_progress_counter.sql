@@ -0,0 +1,196 @@
+-- Per-user, per-UTC-day distinct content counter.
+-- Daily progress (polled by the app) used to select all of today's
+-- interactions and dedupe content ids in the API. A trigger now records each
+-- (user, day, content) once and keeps a running count per day, so progress
+-- checks read a single row. Nothing reads past yesterday, so the first
+-- count of a user's new day drops their older rows, touching only that
+-- user's rows once a day.
+
+CREATE TABLE IF NOT EXISTS user_daily_contents (
+    user_id UUID NOT NULL,
+    day DATE NOT NULL,
+    content_id UUID NOT NULL,
+    PRIMARY KEY (user_id, day, content_id)
+);
+
+COMMENT ON TABLE user_daily_contents IS 'Contents each user interacted with per UTC day, maintained from user_interactions';
+
+CREATE TABLE IF NOT EXISTS user_daily_progress (
+    user_id UUID NOT NULL,
+    day DATE NOT NULL,
+    unique_contents INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+);
+
+COMMENT ON TABLE user_daily_progress IS 'Distinct contents each user interacted with per UTC day';
+
+-- Only the backend (service role) reads these
+ALTER TABLE user_daily_contents ENABLE ROW LEVEL SECURITY;
+ALTER TABLE user_daily_progress ENABLE ROW LEVEL SECURITY;
+
+CREATE OR REPLACE FUNCTION track_daily_content()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_day DATE := (COALESCE(NEW.created_at, NOW()) AT TIME ZONE 'utc')::date;
+    v_count INTEGER;
+BEGIN
+    INSERT INTO user_daily_contents (user_id, day, content_id)
+    VALUES (NEW.user_id, v_day, NEW.content_id)
+    ON CONFLICT (user_id, day, content_id) DO NOTHING;
+
+    IF FOUND THEN
+        INSERT INTO user_daily_progress (user_id, day, unique_contents)
+        VALUES (NEW.user_id, v_day, 1)
+        ON CONFLICT (user_id, day)
+        DO UPDATE SET unique_contents = user_daily_progress.unique_contents + 1
+        RETURNING unique_contents INTO v_count;
+
+        -- First content of the day: clear out the days nothing reads any more
+        IF v_count = 1 THEN
+            DELETE FROM user_daily_contents dc
+            WHERE dc.user_id = NEW.user_id AND dc.day < v_day - 1;
+
+            DELETE FROM user_daily_progress dp
+            WHERE dp.user_id = NEW.user_id AND dp.day < v_day - 1;
+        END IF;
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_user_interactions_daily_progress ON user_interactions;
+CREATE TRIGGER trg_user_interactions_daily_progress
+AFTER INSERT ON user_interactions
+FOR EACH ROW
+EXECUTE FUNCTION track_daily_content();
+
+-- Backfill today and yesterday; older days are never read
+INSERT INTO user_daily_contents (user_id, day, content_id)
+SELECT DISTINCT user_id, (created_at AT TIME ZONE 'utc')::date, content_id
+FROM user_interactions
+WHERE created_at >= (NOW() AT TIME ZONE 'utc')::date - 1
+ON CONFLICT (user_id, day, content_id) DO NOTHING;
+
+INSERT INTO user_daily_progress (user_id, day, unique_contents)
+SELECT user_id, day, COUNT(*)
+FROM user_daily_contents
+GROUP BY user_id, day
+ON CONFLICT (user_id, day) DO UPDATE SET unique_contents = EXCLUDED.unique_contents;
+
+-- Today's progress and streak state in one round-trip
+CREATE OR REPLACE FUNCTION get_daily_progress(p_user_id UUID)
+RETURNS TABLE (
+    day DATE,
+    unique_content_consumed INTEGER,
+    streak_days INTEGER,
+    last_streak_date DATE
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT today.day,
+           COALESCE((
+               SELECT dp.unique_contents
+               FROM user_daily_progress dp
+               WHERE dp.user_id = p_user_id AND dp.day = today.day
+           ), 0),
+           COALESCE(p.streak_days, 0)::integer,
+           p.last_streak_date::date
+    FROM (SELECT (NOW() AT TIME ZONE 'utc')::date AS day) today
+    LEFT JOIN profiles p ON p.user_id = p_user_id;
+$$;
+
+REVOKE EXECUTE ON FUNCTION get_daily_progress(UUID) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION get_daily_progress(UUID) TO service_role;
+
+-- update_daily_streak: same definition, reads today's count from the counter
+
+CREATE OR REPLACE FUNCTION update_daily_streak(
+    p_user_id UUID,
+    p_threshold INTEGER DEFAULT 4,
+    p_milestone_every INTEGER DEFAULT 7,
+    p_milestone_coins INTEGER DEFAULT 100,
+    p_badge_checks JSONB DEFAULT '[]'::jsonb
+)
+RETURNS TABLE (
+    status TEXT,
+    streak_days INTEGER,
+    previous_streak INTEGER,
+    unique_content_consumed INTEGER,
+    coins_earned INTEGER,
+    new_badges TEXT[]
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_today DATE := (NOW() AT TIME ZONE 'utc')::date;
+    v_streak INTEGER;
+    v_last_date DATE;
+    v_consumed INTEGER;
+    v_new_streak INTEGER;
+    v_coins INTEGER := 0;
+    v_applied BOOLEAN;
+    v_badges TEXT[];
+BEGIN
+    -- Serialises concurrent updates (client retries) for the same user
+    SELECT COALESCE(p.streak_days, 0), p.last_streak_date::date
+    INTO v_streak, v_last_date
+    FROM profiles p
+    WHERE p.user_id = p_user_id
+    FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'profile_not_found';
+    END IF;
+
+    SELECT COALESCE((
+        SELECT dp.unique_contents
+        FROM user_daily_progress dp
+        WHERE dp.user_id = p_user_id AND dp.day = v_today
+    ), 0)
+    INTO v_consumed;
+
+    IF v_last_date = v_today THEN
+        RETURN QUERY SELECT 'already_credited'::text, v_streak, v_streak, v_consumed, 0, ARRAY[]::text[];
+        RETURN;
+    END IF;
+
+    IF v_consumed < p_threshold THEN
+        RETURN QUERY SELECT 'threshold_not_met'::text, v_streak, v_streak, v_consumed, 0, ARRAY[]::text[];
+        RETURN;
+    END IF;
+
+    -- Consecutive day continues the streak, anything else starts a new one
+    v_new_streak := CASE WHEN v_last_date = v_today - 1 THEN v_streak + 1 ELSE 1 END;
+
+    UPDATE profiles p
+    SET streak_days = v_new_streak,
+        last_streak_date = v_today
+    WHERE p.user_id = p_user_id;
+
+    IF v_new_streak % p_milestone_every = 0 THEN
+        SELECT t.applied
+        INTO v_applied
+        FROM apply_coin_transaction(
+            p_user_id,
+            p_milestone_coins,
+            p_milestone_every || '-day streak milestone (day ' || v_new_streak || ')',
+            'streak-milestone:' || v_today
+        ) t;
+        IF v_applied THEN
+            v_coins := p_milestone_coins;
+        END IF;
+    END IF;
+
+    -- Counters were updated by triggers above, so the checks see the new streak
+    SELECT COALESCE(array_agg(a.badge_id), ARRAY[]::text[])
+    INTO v_badges
+    FROM award_badges(p_badge_checks) a;
+
+    RETURN QUERY SELECT 'credited'::text, v_new_streak, v_streak, v_consumed, v_coins, v_badges;
+END;
+$$;
@@ -0,0 +1,84 @@
+-- Shared rate limit counters (RATE_LIMIT_BACKEND=postgres).
+-- The API's rate limiters kept their counters in each worker's memory, so
+-- every limit was multiplied by the number of workers and reset on deploy.
+-- With this backend all workers check and increment the same counters
+-- through one rate_limit_acquire() call per request.
+
+-- Counters are disposable, skip the WAL
+CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_counters (
+    key TEXT NOT NULL,
+    window_index BIGINT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (key, window_index)
+);
+
+COMMENT ON TABLE rate_limit_counters IS 'Requests per rate limit key and fixed window, written by rate_limit_acquire()';
+
+ALTER TABLE rate_limit_counters ENABLE ROW LEVEL SECURITY;
+
+-- Sliding-window-counter check for several keys at once: usage is estimated
+-- as previous window * overlap + current window. Adds p_cost to every key
+-- only when none would exceed its limit. Returns whether the request was
+-- allowed and each key's estimated usage before it.
+CREATE OR REPLACE FUNCTION rate_limit_acquire(
+    p_keys TEXT[],
+    p_limits INTEGER[],
+    p_time_window INTEGER,
+    p_cost INTEGER,
+    p_now DOUBLE PRECISION
+)
+RETURNS TABLE (
+    allowed BOOLEAN,
+    used DOUBLE PRECISION[]
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_window BIGINT := floor(p_now / p_time_window)::bigint;
+    v_overlap DOUBLE PRECISION := ((v_window + 1) * p_time_window - p_now) / p_time_window;
+    v_allowed BOOLEAN := TRUE;
+    v_used DOUBLE PRECISION[] := ARRAY[]::double precision[];
+    v_current INTEGER;
+    v_previous INTEGER;
+    i INTEGER;
+BEGIN
+    FOR i IN 1 .. array_length(p_keys, 1) LOOP
+        -- Create and lock the current window's row so concurrent checks of
+        -- the same key queue up instead of both taking the last slot
+        INSERT INTO rate_limit_counters (key, window_index, count)
+        VALUES (p_keys[i], v_window, 0)
+        ON CONFLICT (key, window_index) DO NOTHING;
+
+        SELECT rc.count INTO v_current
+        FROM rate_limit_counters rc
+        WHERE rc.key = p_keys[i] AND rc.window_index = v_window
+        FOR UPDATE;
+
+        SELECT rc.count INTO v_previous
+        FROM rate_limit_counters rc
+        WHERE rc.key = p_keys[i] AND rc.window_index = v_window - 1;
+
+        v_used := v_used || (COALESCE(v_previous, 0) * v_overlap + v_current);
+        IF v_used[i] + p_cost > p_limits[i] THEN
+            v_allowed := FALSE;
+        END IF;
+    END LOOP;
+
+    IF v_allowed THEN
+        UPDATE rate_limit_counters rc
+        SET count = rc.count + p_cost
+        WHERE rc.key = ANY(p_keys) AND rc.window_index = v_window;
+    END IF;
+
+    -- Expire windows that can no longer affect an estimate
+    DELETE FROM rate_limit_counters rc
+    WHERE rc.key = ANY(p_keys) AND rc.window_index < v_window - 1;
+
+    RETURN QUERY SELECT v_allowed, v_used;
+END;
+$$;
+
+COMMENT ON FUNCTION rate_limit_acquire IS 'Atomic sliding-window-counter rate limit check and increment';
+
+REVOKE EXECUTE ON FUNCTION rate_limit_acquire(TEXT[], INTEGER[], INTEGER, INTEGER, DOUBLE PRECISION) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION rate_limit_acquire(TEXT[], INTEGER[], INTEGER, INTEGER, DOUBLE PRECISION) TO service_role;
@@ -0,0 +1,182 @@
+-- Support for the backend's in-memory topics catalogue.
+-- Topics change rarely (admins edit them), so the API keeps the whole table
+-- in memory. get_topics_version() is a cheap fingerprint the API polls to
+-- notice edits made outside its own write path (e.g. from the dashboard),
+-- and the feed functions now return each content's topic id so the API can
+-- name the topic from the catalogue without another query.
+
+CREATE OR REPLACE FUNCTION get_topics_version()
+RETURNS TABLE (
+    version TEXT
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT md5(COALESCE(string_agg(t::text, ',' ORDER BY t.id), ''))
+    FROM topics t;
+$$;
+
+COMMENT ON FUNCTION get_topics_version IS 'Fingerprint of the topics table, changes whenever any topic does';
+
+REVOKE EXECUTE ON FUNCTION get_topics_version() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION get_topics_version() TO service_role;
+
+-- Feed functions: same definitions plus topic_id (the content's first topic,
+-- NULL when it has none). The return type changes, so drop and recreate.
+
+DROP FUNCTION IF EXISTS get_personalized_feed(UUID, INTEGER, TEXT, TIMESTAMP WITH TIME ZONE, UUID, INTEGER);
+
+CREATE OR REPLACE FUNCTION get_personalized_feed(
+    p_user_id UUID,
+    p_limit INTEGER DEFAULT 20,
+    p_phase TEXT DEFAULT 'preferred',
+    p_after_created_at TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    p_after_id UUID DEFAULT NULL,
+    p_min_points INTEGER DEFAULT 50
+)
+RETURNS TABLE (
+    id UUID,
+    title TEXT,
+    summary TEXT,
+    content_type TEXT,
+    media_url TEXT,
+    source_url TEXT,
+    created_at TIMESTAMP WITH TIME ZONE,
+    phase TEXT,
+    topic_id UUID
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_returned INTEGER := 0;
+BEGIN
+    IF p_phase = 'preferred' THEN
+        RETURN QUERY
+        SELECT c.id::uuid, c.title::text, c.summary::text, c.content_type::text,
+               c.media_url::text, c.source_url::text, c.created_at::timestamptz,
+               'preferred'::text,
+               (SELECT ct.topic_id FROM content_topics ct
+                WHERE ct.content_id = c.id ORDER BY ct.topic_id LIMIT 1)::uuid
+        FROM contents c
+        WHERE EXISTS (
+                SELECT 1
+                FROM content_topics ct
+                JOIN user_topic_preferences utp ON utp.topic_id = ct.topic_id
+                WHERE ct.content_id = c.id
+                  AND utp.user_id = p_user_id
+                  AND utp.points >= p_min_points
+            )
+          AND NOT EXISTS (
+                SELECT 1 FROM user_seen_contents s
+                WHERE s.user_id = p_user_id AND s.content_id = c.id
+            )
+          AND NOT EXISTS (
+                SELECT 1 FROM user_feed_queue q
+                WHERE q.user_id = p_user_id AND q.content_id = c.id AND q.served_at IS NOT NULL
+            )
+          AND (p_after_created_at IS NULL OR (c.created_at, c.id) > (p_after_created_at, p_after_id))
+        ORDER BY c.created_at, c.id
+        LIMIT p_limit;
+
+        GET DIAGNOSTICS v_returned = ROW_COUNT;
+        IF v_returned >= p_limit THEN
+            RETURN;
+        END IF;
+
+        -- Preferred content is exhausted, continue with general content from the start
+        p_after_created_at := NULL;
+        p_after_id := NULL;
+    END IF;
+
+    RETURN QUERY
+    SELECT c.id::uuid, c.title::text, c.summary::text, c.content_type::text,
+           c.media_url::text, c.source_url::text, c.created_at::timestamptz,
+           'general'::text,
+           (SELECT ct.topic_id FROM content_topics ct
+            WHERE ct.content_id = c.id ORDER BY ct.topic_id LIMIT 1)::uuid
+    FROM contents c
+    WHERE NOT EXISTS (
+            SELECT 1
+            FROM content_topics ct
+            JOIN user_topic_preferences utp ON utp.topic_id = ct.topic_id
+            WHERE ct.content_id = c.id
+              AND utp.user_id = p_user_id
+              AND utp.points >= p_min_points
+        )
+      AND NOT EXISTS (
+            SELECT 1 FROM user_seen_contents s
+            WHERE s.user_id = p_user_id AND s.content_id = c.id
+        )
+      AND NOT EXISTS (
+            SELECT 1 FROM user_feed_queue q
+            WHERE q.user_id = p_user_id AND q.content_id = c.id AND q.served_at IS NOT NULL
+        )
+      AND (p_after_created_at IS NULL OR (c.created_at, c.id) > (p_after_created_at, p_after_id))
+    ORDER BY c.created_at, c.id
+    LIMIT p_limit - v_returned;
+END;
+$$;
+
+COMMENT ON FUNCTION get_personalized_feed IS 'One keyset page of unseen content for a user, preferred topics first';
+
+REVOKE EXECUTE ON FUNCTION get_personalized_feed(UUID, INTEGER, TEXT, TIMESTAMP WITH TIME ZONE, UUID, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION get_personalized_feed(UUID, INTEGER, TEXT, TIMESTAMP WITH TIME ZONE, UUID, INTEGER) TO service_role;
+
+DROP FUNCTION IF EXISTS pop_feed_queue(UUID, INTEGER);
+
+CREATE OR REPLACE FUNCTION pop_feed_queue(
+    p_user_id UUID,
+    p_limit INTEGER DEFAULT 20
+)
+RETURNS TABLE (
+    id UUID,
+    title TEXT,
+    summary TEXT,
+    content_type TEXT,
+    media_url TEXT,
+    source_url TEXT,
+    created_at TIMESTAMP WITH TIME ZONE,
+    queue_remaining INTEGER,
+    topic_id UUID
+)
+LANGUAGE sql
+AS $$
+    WITH next_items AS (
+        SELECT q.content_id, q.position
+        FROM user_feed_queue q
+        WHERE q.user_id = p_user_id
+          AND q.served_at IS NULL
+          AND NOT EXISTS (
+                SELECT 1 FROM user_seen_contents s
+                WHERE s.user_id = p_user_id AND s.content_id = q.content_id
+            )
+        ORDER BY q.position
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    ),
+    served AS (
+        UPDATE user_feed_queue q
+        SET served_at = NOW()
+        FROM next_items n
+        WHERE q.user_id = p_user_id AND q.content_id = n.content_id
+        RETURNING q.content_id, q.position
+    ),
+    remaining AS (
+        -- The snapshot still sees the popped rows as unserved
+        SELECT (COUNT(*) - (SELECT COUNT(*) FROM served))::integer AS n
+        FROM user_feed_queue q
+        WHERE q.user_id = p_user_id AND q.served_at IS NULL
+    )
+    SELECT c.id::uuid, c.title::text, c.summary::text, c.content_type::text,
+           c.media_url::text, c.source_url::text, c.created_at::timestamptz,
+           (SELECT n FROM remaining),
+           (SELECT ct.topic_id FROM content_topics ct
+            WHERE ct.content_id = c.id ORDER BY ct.topic_id LIMIT 1)::uuid
+    FROM served s
+    JOIN contents c ON c.id = s.content_id
+    ORDER BY s.position;
+$$;
+
+REVOKE EXECUTE ON FUNCTION pop_feed_queue(UUID, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION pop_feed_queue(UUID, INTEGER) TO service_role;
@@ -0,0 +1,56 @@
+-- Transactional replacement of a user's topic preferences.
+-- POST /api/user/preferences used to delete every preference and then insert
+-- the new ones one request at a time before flagging onboarding as done, so
+-- latency grew with the number of topics and a failure midway left the user
+-- with only part of their preferences. replace_topic_preferences() writes the
+-- whole set and the onboarding flag in one transaction.
+
+-- p_preferences is a JSON array of {topic_id, points}; if a topic appears
+-- more than once the last entry wins. Returns how many preferences were
+-- stored and whether a profile was flagged as onboarded.
+CREATE OR REPLACE FUNCTION replace_topic_preferences(
+    p_user_id UUID,
+    p_preferences JSONB,
+    p_complete_onboarding BOOLEAN DEFAULT TRUE
+)
+RETURNS TABLE (
+    preferences_saved INTEGER,
+    onboarding_completed BOOLEAN
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_saved INTEGER;
+    v_onboarded INTEGER := 0;
+BEGIN
+    DELETE FROM user_topic_preferences utp
+    WHERE utp.user_id = p_user_id;
+
+    INSERT INTO user_topic_preferences (user_id, topic_id, points)
+    SELECT DISTINCT ON (p.topic_id) p_user_id, p.topic_id, p.points
+    FROM (
+        SELECT (e.value->>'topic_id')::uuid AS topic_id,
+               COALESCE((e.value->>'points')::integer, 50) AS points,
+               e.ordinality
+        FROM jsonb_array_elements(p_preferences) WITH ORDINALITY AS e(value, ordinality)
+    ) p
+    ORDER BY p.topic_id, p.ordinality DESC;
+
+    GET DIAGNOSTICS v_saved = ROW_COUNT;
+
+    IF p_complete_onboarding THEN
+        UPDATE profiles pr
+        SET onboarding_completed = TRUE
+        WHERE pr.user_id = p_user_id;
+
+        GET DIAGNOSTICS v_onboarded = ROW_COUNT;
+    END IF;
+
+    RETURN QUERY SELECT v_saved, v_onboarded > 0;
+END;
+$$;
+
+COMMENT ON FUNCTION replace_topic_preferences IS 'Replace all of a user''s topic preferences and mark onboarding complete, atomically';
+
+REVOKE EXECUTE ON FUNCTION replace_topic_preferences(UUID, JSONB, BOOLEAN) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION replace_topic_preferences(UUID, JSONB, BOOLEAN) TO service_role;